@@ -0,0 +1,122 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from .Node import Graph, PathFinder
+from .SearchStats import SearchStats
+from .WorkerPool import WorkerPool
+
+#Algorithms a batch query can ask for
+BATCH_ALGORITHMS = ("dijkstra", "astar", "alt", "ch", "bidijkstra", "biastar")
+
+
+#BatchRouter answers many route queries of one building at once. The queries are grouped by source, routing profile
+#and algorithm, a Dijkstra group is answered by one search that stops when all of its goals are settled, the other
+#algorithms run query by query. Large batches are split by group between the processes of the WorkerPool. The results
+#keep the order of the queries, a query that can't be answered gets an error message instead of a path.
+class BatchRouter:
+    parallel_threshold = 256
+    workers = os.cpu_count() or 1
+
+    #Gives back one result per query: {"source", "goal", "path"} or {"source", "goal", "error"}. A query is an object
+    #with source and goal identifiers and the optional accessible (default true), use_closed_corridors (default false)
+    #and algorithm (default dijkstra) fields, like the arguments of PathFinder.find_path. With debug every query is
+    #answered on its own in this process and its result gets the "stats" of its search (see SearchStats).
+    @staticmethod
+    def find_paths(graph: Graph, queries: List[Any], dataset: Optional[str] = None,
+                   debug: bool = False) -> List[Dict[str, Any]]:
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        groups: Dict[Tuple[str, bool, bool, str], List[Tuple[int, str]]] = {}
+        for position, query in enumerate(queries):
+            parsed = BatchRouter._parse_query(graph, query)
+            if isinstance(parsed, dict):
+                results[position] = parsed
+                continue
+            source, goal, accessible, use_closed_corridors, algorithm = parsed
+            groups.setdefault((source, accessible, use_closed_corridors, algorithm), []).append((position, goal))
+
+        group_list = list(groups.items())
+        if (not debug and len(queries) >= BatchRouter.parallel_threshold and BatchRouter.workers > 1 and
+                len(group_list) > 1):
+            answered = BatchRouter._run_parallel(graph, group_list, dataset)
+        else:
+            answered = BatchRouter._run_groups(graph, group_list, dataset, debug)
+        for position, result in answered:
+            results[position] = result
+        return results
+
+    #Checks a query and gives back its (source, goal, accessible, use_closed_corridors, algorithm) tuple, or the error
+    #result of the query.
+    @staticmethod
+    def _parse_query(graph: Graph, query: Any):
+        if not isinstance(query, dict):
+            return {"error": "Query must be an object"}
+        source = query.get("source")
+        goal = query.get("goal")
+        result: Dict[str, Any] = {"source": source, "goal": goal}
+        accessible = query.get("accessible", True)
+        use_closed_corridors = query.get("use_closed_corridors", False)
+        algorithm = query.get("algorithm", "dijkstra")
+        if not isinstance(source, str) or not isinstance(goal, str):
+            result["error"] = "Source and goal must be strings"
+        elif not isinstance(accessible, bool) or not isinstance(use_closed_corridors, bool):
+            result["error"] = "Flags must be booleans"
+        elif not isinstance(algorithm, str) or algorithm.lower() not in BATCH_ALGORITHMS:
+            result["error"] = f"Unknown algorithm: {algorithm}"
+        elif source not in graph.get_id_to_index() or goal not in graph.get_id_to_index():
+            result["error"] = "Invalid source or goal identifier"
+        else:
+            return source, goal, accessible, use_closed_corridors, algorithm.lower()
+        return result
+
+    #Answers the groups, gives back (query position, result) pairs.
+    @staticmethod
+    def _run_groups(graph: Graph, groups, dataset: Optional[str],
+                    debug: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        answered = []
+        for (source, accessible, use_closed_corridors, algorithm), goals in groups:
+            try:
+                if debug:
+                    for position, goal in goals:
+                        stats = SearchStats()
+                        path = PathFinder.find_path(graph, source, goal, accessible, use_closed_corridors, algorithm,
+                                                    dataset=dataset, stats=stats)
+                        answered.append((position, {"source": source, "goal": goal, "path": path,
+                                                    "stats": stats.to_dict()}))
+                    continue
+                if algorithm == "dijkstra" and len(goals) > 1:
+                    paths = graph.dijkstra_many(source, [goal for _, goal in goals], accessible, use_closed_corridors)
+                    for position, goal in goals:
+                        answered.append((position, {"source": source, "goal": goal,
+                                                    "path": PathFinder.path_nodes_to_list(paths[goal])}))
+                    continue
+                for position, goal in goals:
+                    path = PathFinder.find_path(graph, source, goal, accessible, use_closed_corridors, algorithm,
+                                                dataset=dataset)
+                    answered.append((position, {"source": source, "goal": goal, "path": path}))
+            except Exception as e:
+                for position, goal in goals:
+                    answered.append((position, {"source": source, "goal": goal, "error": f"Route failed: {e}"}))
+        return answered
+
+    #Splits the groups between the worker processes, every worker gets about the same number of queries. If the workers
+    #can't answer (see WorkerPool.run) the groups are answered in this process.
+    @staticmethod
+    def _run_parallel(graph: Graph, groups, dataset: Optional[str]) -> List[Tuple[int, Dict[str, Any]]]:
+        worker_count = min(BatchRouter.workers, len(groups))
+        chunks: List[List[Any]] = [[] for _ in range(worker_count)]
+        sizes = [0] * worker_count
+        for group in sorted(groups, key=lambda group: len(group[1]), reverse=True):
+            smallest = sizes.index(min(sizes))
+            chunks[smallest].append(group)
+            sizes[smallest] += len(group[1])
+
+        chunk_answers = WorkerPool.run(graph, _run_chunk, chunks, dataset)
+        if chunk_answers is None:
+            return BatchRouter._run_groups(graph, groups, dataset)
+        answered = []
+        for answers in chunk_answers:
+            answered.extend(answers)
+        return answered
+
+
+def _run_chunk(graph: Graph, groups, dataset: Optional[str]):
+    return BatchRouter._run_groups(graph, groups, dataset)
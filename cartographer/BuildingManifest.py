@@ -0,0 +1,107 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from .JsonStream import JsonStream
+
+
+#A building of the manifest: its graph file, display name and the levels with their map images.
+class Building:
+    __slots__ = ("file", "name", "levels", "images")
+
+    def __init__(self, file: str, name: str, levels: List[int], images: List[str]):
+        self.file = file
+        self.name = name
+        self.levels = levels
+        self.images = images
+
+    def to_dict(self):
+        return {"file": self.file, "name": self.name, "levels": self.levels, "images": self.images}
+
+
+#BuildingManifest lists the buildings without loading their graphs. Every {stem}.json of data_path is a building, its
+#levels are the keys of the "levels" member of the file (read without decoding the rest of the file, and kept while
+#the file doesn't change) that have a map image named {stem}{level}.png in image_path (for example LE-1.png and
+#LE0.png for the levels -1 and 0 of LE.json). The display names come from names by file name, the stem is used for
+#the others. The directories are listed again when one of them changes.
+class BuildingManifest:
+    def __init__(self, data_path: str, image_path: str, names: Optional[Dict[str, str]] = None):
+        self.data_path = data_path
+        self.image_path = image_path
+        self.names = dict(names or {})
+        self._buildings: Dict[str, Building] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        #The levels of the building files by file name, with the (modification time, size) of the file they came from
+        self._levels: Dict[str, Tuple[Tuple[int, int], List[int]]] = {}
+        self._lock = threading.Lock()
+
+    #The buildings by file name, in file name order.
+    def buildings(self) -> Dict[str, Building]:
+        stamp = (self._directory_stamp(self.data_path), self._directory_stamp(self.image_path))
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._buildings = self._discover()
+                    self._stamp = stamp
+        return self._buildings
+
+    def get(self, dataset: str) -> Optional[Building]:
+        return self.buildings().get(dataset)
+
+    def _discover(self) -> Dict[str, Building]:
+        try:
+            files = sorted(name for name in os.listdir(self.data_path) if name.endswith(".json"))
+        except OSError:
+            return {}
+        try:
+            images = set(os.listdir(self.image_path))
+        except OSError:
+            images = set()
+
+        buildings = {}
+        for file in files:
+            stem = file[:-len(".json")]
+            levels = [(level, f"{stem}{level}.png") for level in self._file_levels(file)
+                      if f"{stem}{level}.png" in images]
+            buildings[file] = Building(file, self.names.get(file, stem), [level for level, _ in levels],
+                                       [image for _, image in levels])
+        self._levels = {file: self._levels[file] for file in files if file in self._levels}
+        return buildings
+
+    #The sorted levels of the building file, no levels if it can't be read.
+    def _file_levels(self, file: str) -> List[int]:
+        path = os.path.join(self.data_path, file)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return []
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._levels.get(file)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        levels = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stream = JsonStream(f)
+                for key in stream.members():
+                    if key == "levels":
+                        for level_key in stream.members():
+                            stream.value()
+                            levels.append(int(level_key))
+                        break
+                    if stream.peek() == "[":
+                        for _ in stream.elements():
+                            pass
+                    else:
+                        stream.value()
+        except (OSError, ValueError):
+            levels = []
+        levels.sort()
+        self._levels[file] = (stamp, levels)
+        return levels
+
+    @staticmethod
+    def _directory_stamp(path: str) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return -1
@@ -0,0 +1,327 @@
+import os
+import sys
+import mmap
+import heapq
+import math
+import struct
+from array import array
+from typing import Dict, List, Optional, Tuple
+from .GraphSnapshot import GraphSnapshot, SnapshotError, PROFILE_KEYS
+from .Node import Graph, GraphBuilder
+from .SearchStats import SearchStats
+
+HIERARCHY_MAGIC = b"PFHIER\x00\x00"
+HIERARCHY_VERSION = 3
+HIERARCHY_EXTENSION = ".ch"
+
+#magic, version, byte order, node count, source mtime, source size, section count
+HIERARCHY_HEADER = struct.Struct("<8sIc3xIqqI")
+
+#Witness searches settle at most this many nodes, if they give up the shortcut is added anyway, that is always correct
+WITNESS_SETTLE_LIMIT = 64
+
+
+#ContractionHierarchy is the preprocessed form of one routing profile. Every usable node gets a rank, the nodes are
+#contracted from the lowest rank up, and shortcuts replace the routes through the contracted node where no other route
+#is as short. The result is kept as upward arrays in compressed sparse row form: for every node the edges to higher
+#ranked neighbours, with the middle node of the shortcut (-1 for an original edge). A query searches upwards from both
+#ends and meets at the highest node of the route, so it settles only a few nodes. The graph is undirected, so one set
+#of upward arrays serves both directions.
+class ContractionHierarchy:
+    __slots__ = ("rank", "offsets", "targets", "weights", "middles")
+
+    def __init__(self, rank, offsets, targets, weights, middles):
+        self.rank = rank
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.middles = middles
+
+    #Contracts the usable nodes of the profile. The next node is the one with the smallest edge difference (shortcuts
+    #added minus edges removed) plus the number of its already contracted neighbours, the priorities are updated lazily.
+    @classmethod
+    def build(cls, graph: Graph, accessible: bool, use_closed_corridors: bool):
+        profile = graph.get_profile(accessible, use_closed_corridors)
+        usable, base_offsets, base_targets, base_weights = profile.usable, profile.offsets, profile.targets, \
+            profile.weights
+        node_quantity = len(usable)
+        neighbours: List[Dict[int, Tuple[float, int]]] = [{} for _ in range(node_quantity)]
+        for index in range(node_quantity):
+            if not usable[index]:
+                continue
+            for edge in range(base_offsets[index], base_offsets[index + 1]):
+                target = base_targets[edge]
+                if target != index and usable[target] and (target not in neighbours[index] or
+                                                           base_weights[edge] < neighbours[index][target][0]):
+                    neighbours[index][target] = (base_weights[edge], -1)
+
+        rank = array("i", [-1]) * node_quantity
+        contracted_neighbours = [0] * node_quantity
+        upward: List[List[Tuple[int, float, int]]] = [[] for _ in range(node_quantity)]
+        queue = [(cls._priority(neighbours, contracted_neighbours, index), index)
+                 for index in range(node_quantity) if usable[index]]
+        heapq.heapify(queue)
+        next_rank = 0
+
+        while queue:
+            _, index = heapq.heappop(queue)
+            if rank[index] != -1:
+                continue
+            priority = cls._priority(neighbours, contracted_neighbours, index)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, index))
+                continue
+            rank[index] = next_rank
+            next_rank += 1
+            for neighbour, (weight, middle) in neighbours[index].items():
+                upward[index].append((neighbour, weight, middle))
+            for source, target, weight in cls._shortcuts(neighbours, index):
+                if target not in neighbours[source] or weight < neighbours[source][target][0]:
+                    neighbours[source][target] = (weight, index)
+                    neighbours[target][source] = (weight, index)
+            for neighbour in neighbours[index]:
+                del neighbours[neighbour][index]
+                contracted_neighbours[neighbour] += 1
+            neighbours[index] = {}
+
+        offsets = array("i", [0])
+        targets = array("i")
+        weights = array("d")
+        middles = array("i")
+        for edges in upward:
+            for target, weight, middle in edges:
+                targets.append(target)
+                weights.append(weight)
+                middles.append(middle)
+            offsets.append(len(targets))
+        return cls(rank, offsets, targets, weights, middles)
+
+    @classmethod
+    def _priority(cls, neighbours, contracted_neighbours, index: int) -> int:
+        return len(cls._shortcuts(neighbours, index)) - len(neighbours[index]) + contracted_neighbours[index]
+
+    #The shortcuts contracting the node needs: for every pair of its neighbours the route through the node, unless a
+    #witness search finds another route that is not longer. Gives back (source, target, length) triples.
+    @staticmethod
+    def _shortcuts(neighbours, index: int) -> List[Tuple[int, int, float]]:
+        adjacent = list(neighbours[index].items())
+        shortcuts = []
+        for position, (source, (source_weight, _)) in enumerate(adjacent):
+            goals = {target: source_weight + target_weight for target, (target_weight, _) in adjacent[position + 1:]}
+            if not goals:
+                continue
+            limit = max(goals.values())
+            distance = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap and settled < WITNESS_SETTLE_LIMIT:
+                popped_distance, popped_index = heapq.heappop(heap)
+                if popped_distance > distance[popped_index]:
+                    continue
+                if popped_distance > limit:
+                    break
+                settled += 1
+                for adjacent_index, (weight, _) in neighbours[popped_index].items():
+                    if adjacent_index == index:
+                        continue
+                    new_distance = popped_distance + weight
+                    if new_distance < distance.get(adjacent_index, math.inf):
+                        distance[adjacent_index] = new_distance
+                        heapq.heappush(heap, (new_distance, adjacent_index))
+            for target, length in goals.items():
+                if distance.get(target, math.inf) > length:
+                    shortcuts.append((source, target, length))
+        return shortcuts
+
+    #Searches upwards from the source and the goal, the settled nodes of both sides meet at the top of the route. The
+    #source is exempt from the usability filter like in the other searches: if it isn't usable the forward search
+    #starts from its usable neighbours. Gives back the node indexes of the path and the number of settled nodes, the
+    #optional SearchStats collector counts the heap operations.
+    def search(self, graph: Graph, source_index: int, goal_index: int, accessible: bool, use_closed_corridors: bool,
+               stats: Optional[SearchStats] = None):
+        if source_index == goal_index:
+            return [source_index], 1
+        profile = graph.get_profile(accessible, use_closed_corridors)
+        if not profile.usable[goal_index]:
+            return [], 0
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        heappop, heappush = SearchStats.heap_functions(stats)
+        distances: Tuple[Dict[int, float], Dict[int, float]] = ({}, {goal_index: 0.0})
+        previous: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        heaps: Tuple[List[Tuple[float, int]], List[Tuple[float, int]]] = ([], [(0.0, goal_index)])
+        if profile.usable[source_index]:
+            distances[0][source_index] = 0.0
+            heaps[0].append((0.0, source_index))
+        else:
+            for edge in range(profile.offsets[source_index], profile.offsets[source_index + 1]):
+                target, weight = profile.targets[edge], profile.weights[edge]
+                if weight < distances[0].get(target, math.inf) and profile.usable[target]:
+                    distances[0][target] = weight
+                    heappush(heaps[0], (weight, target))
+        best_distance = math.inf
+        meeting_index = None
+        for index, distance in distances[0].items():
+            if index in distances[1] and distance + distances[1][index] < best_distance:
+                best_distance, meeting_index = distance + distances[1][index], index
+        settled = 0
+
+        while heaps[0] or heaps[1]:
+            if heaps[0] and (not heaps[1] or heaps[0][0][0] <= heaps[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            heap, distance, previous_side, other_distance = heaps[side], distances[side], previous[side], \
+                distances[1 - side]
+            popped_distance, popped_index = heappop(heap)
+            if popped_distance >= best_distance:
+                heap.clear()
+                continue
+            if popped_distance > distance[popped_index]:
+                continue
+            settled += 1
+            for edge in range(offsets[popped_index], offsets[popped_index + 1]):
+                node_index = targets[edge]
+                new_distance = popped_distance + weights[edge]
+                if new_distance < distance.get(node_index, math.inf):
+                    distance[node_index] = new_distance
+                    previous_side[node_index] = popped_index
+                    heappush(heap, (new_distance, node_index))
+                    total = new_distance + other_distance.get(node_index, math.inf)
+                    if total < best_distance:
+                        best_distance, meeting_index = total, node_index
+
+        if stats is not None:
+            stats.settled += settled
+        if meeting_index is None:
+            return [], settled
+        upward_path = [meeting_index]
+        while upward_path[-1] in previous[0]:
+            upward_path.append(previous[0][upward_path[-1]])
+        upward_path.reverse()
+        if upward_path[0] != source_index:
+            upward_path.insert(0, source_index)
+        current = meeting_index
+        while current in previous[1]:
+            current = previous[1][current]
+            upward_path.append(current)
+
+        path_indexes = [upward_path[0]]
+        for position in range(1, len(upward_path)):
+            self._unpack(upward_path[position - 1], upward_path[position], path_indexes)
+        return path_indexes, settled
+
+    #Appends the original nodes of the edge between the two nodes (without the first one) to the path.
+    def _unpack(self, first: int, second: int, path_indexes: List[int]):
+        stack = [(first, second)]
+        while stack:
+            first, second = stack.pop()
+            middle = self._middle(first, second)
+            if middle < 0:
+                path_indexes.append(second)
+            else:
+                stack.append((middle, second))
+                stack.append((first, middle))
+
+    #The middle node of the shortest hierarchy edge between the nodes, -1 if it's an original edge. An edge is stored at
+    #its lower ranked end, an edge from a node that isn't part of the hierarchy (an unusable source) is always original.
+    def _middle(self, first: int, second: int) -> int:
+        rank = self.rank
+        if rank[first] < 0 or rank[second] < 0:
+            return -1
+        lower, higher = (first, second) if rank[first] < rank[second] else (second, first)
+        best_weight = math.inf
+        best_middle = -1
+        for edge in range(self.offsets[lower], self.offsets[lower + 1]):
+            if self.targets[edge] == higher and self.weights[edge] < best_weight:
+                best_weight = self.weights[edge]
+                best_middle = self.middles[edge]
+        return best_middle
+
+
+#HierarchyFile keeps the contraction hierarchies of all routing profiles of a building in a binary file next to the
+#building JSON, in the section format of the graph snapshots. Loading maps the file, like a snapshot.
+class HierarchyFile:
+    @staticmethod
+    def path_for(json_path: str) -> str:
+        return os.path.splitext(json_path)[0] + HIERARCHY_EXTENSION
+
+    @staticmethod
+    def write(hierarchies: Dict[Tuple[bool, bool], ContractionHierarchy], node_count: int, path: str,
+              source_path: Optional[str] = None):
+        sections = []
+        for number, key in enumerate(PROFILE_KEYS):
+            hierarchy = hierarchies[key]
+            prefix = b"H%d" % number
+            for name, values in ((b"RK", hierarchy.rank), (b"OF", hierarchy.offsets), (b"TG", hierarchy.targets),
+                                 (b"WT", hierarchy.weights), (b"MD", hierarchy.middles)):
+                sections.append(GraphSnapshot._array_section(prefix + name, values))
+        source_mtime_ns, source_size = GraphSnapshot._source_stamp(source_path)
+        header = HIERARCHY_HEADER.pack(HIERARCHY_MAGIC, HIERARCHY_VERSION,
+                                       b"<" if sys.byteorder == "little" else b">", node_count, source_mtime_ns,
+                                       source_size, len(sections))
+        GraphSnapshot._write_sections(path, header, sections)
+
+    @staticmethod
+    def read(path: str) -> Dict[Tuple[bool, bool], ContractionHierarchy]:
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HierarchyFile._read_header(mapping)
+        sections = GraphSnapshot._map_sections(mapping, HIERARCHY_HEADER.size, header["section_count"], path)
+        return {
+            key: ContractionHierarchy(*(sections[b"H%d" % number + name] for name in (b"RK", b"OF", b"TG", b"WT", b"MD")))
+            for number, key in enumerate(PROFILE_KEYS)
+        }
+
+    #The hierarchy file is fresh if it has the current version and byte order and was built from the current source
+    #file.
+    @staticmethod
+    def is_fresh(path: str, source_path: str) -> bool:
+        try:
+            with open(path, "rb") as f:
+                header = HierarchyFile._read_header(f.read(HIERARCHY_HEADER.size))
+        except (OSError, SnapshotError):
+            return False
+        return (header["source_mtime_ns"], header["source_size"]) == GraphSnapshot._source_stamp(source_path)
+
+    #Gives back the hierarchies of the building if its hierarchy file is fresh and fits the graph, otherwise None.
+    @staticmethod
+    def load(json_path: str, graph: Graph) -> Optional[Dict[Tuple[bool, bool], ContractionHierarchy]]:
+        path = HierarchyFile.path_for(json_path)
+        if not HierarchyFile.is_fresh(path, json_path):
+            return None
+        try:
+            hierarchies = HierarchyFile.read(path)
+        except (OSError, ValueError, KeyError, SnapshotError):
+            return None
+        if any(len(hierarchy.rank) != graph.node_count() for hierarchy in hierarchies.values()):
+            return None
+        return hierarchies
+
+    #Builds the hierarchies of every routing profile of a building and writes them next to the JSON file, gives back
+    #the path of the hierarchy file.
+    @staticmethod
+    def build(json_path: str) -> str:
+        graph = GraphBuilder.from_file(json_path)
+        hierarchies = {key: ContractionHierarchy.build(graph, *key) for key in PROFILE_KEYS}
+        path = HierarchyFile.path_for(json_path)
+        HierarchyFile.write(hierarchies, graph.node_count(), path, source_path=json_path)
+        return path
+
+    @staticmethod
+    def _read_header(buffer):
+        if len(buffer) < HIERARCHY_HEADER.size:
+            raise SnapshotError("Hierarchy file is too short")
+        magic, version, byte_order, node_count, source_mtime_ns, source_size, section_count = \
+            HIERARCHY_HEADER.unpack_from(buffer, 0)
+        if magic != HIERARCHY_MAGIC:
+            raise SnapshotError("Not a contraction hierarchy file")
+        if version != HIERARCHY_VERSION:
+            raise SnapshotError(f"Unsupported hierarchy version {version}")
+        if byte_order != (b"<" if sys.byteorder == "little" else b">"):
+            raise SnapshotError("Hierarchy file was written with a different byte order")
+        return {
+            "node_count": node_count,
+            "source_mtime_ns": source_mtime_ns,
+            "source_size": source_size,
+            "section_count": section_count,
+        }
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+#DistanceMatrixCache keeps route lengths between stops of one Graph for the multi-stop tours. The lengths are stored
+#row by row: a row is keyed by (source index, accessible, use_closed_corridors) and maps goal indexes to route lengths,
+#math.inf for an unreachable goal. Every routing profile has its own rows, because the profiles have different routes.
+#When more than max_entries lengths are kept, the rows of the least recently used sources are evicted.
+class DistanceMatrixCache:
+    max_entries = 250000
+
+    def __init__(self, max_entries: Optional[int] = None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        self._rows: "OrderedDict[Tuple[int, bool, bool], Dict[int, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    #Gives back the cached lengths from the source to the goals and the goals that aren't cached yet.
+    def get(self, key: Tuple[int, bool, bool], goal_indexes: Iterable[int]) -> Tuple[Dict[int, float], List[int]]:
+        lengths: Dict[int, float] = {}
+        missing: List[int] = []
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                self._rows.move_to_end(key)
+            for goal_index in goal_indexes:
+                length = None if row is None else row.get(goal_index)
+                if length is None:
+                    missing.append(goal_index)
+                else:
+                    lengths[goal_index] = length
+            self.hits += len(lengths)
+            self.misses += len(missing)
+        return lengths, missing
+
+    #Gives back the goals that aren't cached yet, without counting them as hits or misses.
+    def missing(self, key: Tuple[int, bool, bool], goal_indexes: Iterable[int]) -> List[int]:
+        with self._lock:
+            row = self._rows.get(key, {})
+            return [goal_index for goal_index in goal_indexes if goal_index not in row]
+
+    #Adds the lengths to the row of the source, evicting the least recently used rows beyond max_entries.
+    def put(self, key: Tuple[int, bool, bool], lengths: Dict[int, float]):
+        if len(lengths) > self.max_entries:
+            return
+        with self._lock:
+            row = self._rows.setdefault(key, {})
+            self._size -= len(row)
+            row.update(lengths)
+            self._size += len(row)
+            self._rows.move_to_end(key)
+            while self._size > self.max_entries and len(self._rows) > 1:
+                _, evicted = self._rows.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    #Gives back a new cache with the same settings and rows, without the rows for which drop(key) is true.
+    def copy(self, drop: Callable[[Tuple[int, bool, bool]], bool]) -> "DistanceMatrixCache":
+        cache = DistanceMatrixCache(self.max_entries)
+        with self._lock:
+            cache.hits, cache.misses, cache.evictions = self.hits, self.misses, self.evictions
+            for key, row in self._rows.items():
+                if not drop(key):
+                    cache._rows[key] = dict(row)
+                    cache._size += len(row)
+        return cache
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rows": len(self._rows),
+                "size": self._size,
+                "max_entries": self.max_entries,
+            }
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,408 @@
+import contextlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from .Node import Graph, PathFinder
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+#The (modification time in nanoseconds, size) pair of a building file, a changed stamp means the file changed
+Stamp = Tuple[int, int]
+
+
+#One published graph of a dataset. A version never changes: reloading the building file or changing the closures
+#publishes a new version with a higher number (also after the graph was evicted and loaded again), the requests that
+#already hold the graph of an older version keep using it. base is the graph as it was loaded from the file, without
+#the closures made at runtime, closures_stamp is the stamp of the stored closures the version was made with.
+class GraphVersion:
+    __slots__ = ("dataset", "graph", "version", "loaded_at", "load_seconds", "source_stamp", "base", "closures_stamp")
+
+    def __init__(self, dataset: str, graph: Graph, version: int, loaded_at: float, load_seconds: float,
+                 source_stamp: Optional[Stamp], base: Graph, closures_stamp: Optional[Stamp] = None):
+        self.dataset = dataset
+        self.graph = graph
+        self.version = version
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+        self.source_stamp = source_stamp
+        self.base = base
+        self.closures_stamp = closures_stamp
+
+
+#GraphRegistry keeps the current version of the buildings of data_path and works like a dictionary of the graphs by
+#file name. A building is loaded with the loader when it is first requested, concurrent first requests of the same
+#building wait for one load. Iterating and len() only see the loaded buildings. Reading a loaded graph never locks: the
+#versions are kept in a dictionary that is never changed, publishing a version replaces the whole dictionary. A watcher
+#thread polls the modification times of the loaded files every poll_interval seconds and reloads the changed ones in
+#the background, the old version answers until the new one is published. A file that fails to load is logged and keeps
+#its previous version, it is tried again once it changes. The closures made at runtime are carried over to the reloaded
+#graph if their nodes and edges still exist. When the loaded graphs use more than memory_budget_bytes (0 for no
+#limit), the least recently used ones are evicted, except the graphs with runtime closures.
+#With a closures_path the closures made by modify are stored there as one JSON file per dataset (see
+#Graph.closure_delta), so every process of a multi-process server shares them: modify reads the stored closures before
+#it changes them, a load makes the stored closures on the loaded graph and the watcher publishes the closures that
+#another process stored, so the processes agree within poll_interval seconds.
+class GraphRegistry(MutableMapping):
+    poll_interval = 2.0
+    memory_budget_bytes = 0
+
+    def __init__(self, data_path: str, loader: Callable[[str], Graph], poll_interval: Optional[float] = None,
+                 memory_budget_bytes: Optional[int] = None, closures_path: Optional[str] = None):
+        if poll_interval is not None:
+            self.poll_interval = poll_interval
+        if memory_budget_bytes is not None:
+            self.memory_budget_bytes = memory_budget_bytes
+        self.data_path = data_path
+        self.loader = loader
+        self.closures_path = str(closures_path) if closures_path is not None else None
+        self._versions: Dict[str, GraphVersion] = {}
+        self._version_numbers: Dict[str, int] = {}
+        self._errors: Dict[str, Tuple[Stamp, str]] = {}
+        self._used: Dict[str, int] = {}
+        self._uses = itertools.count()
+        #Held while a version is published, a dataset is loaded holding its own lock, the watcher holds the check lock
+        self._lock = threading.Lock()
+        self._dataset_locks: Dict[str, threading.Lock] = {}
+        self._check_lock = threading.Lock()
+        self._started = False
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    #Gives back the graph of the dataset, loading it first if it isn't loaded. KeyError if there is no such building or
+    #it fails to load.
+    def __getitem__(self, dataset: str) -> Graph:
+        current = self._versions.get(dataset)
+        if current is None:
+            current = self._load_on_demand(dataset)
+            if current is None:
+                raise KeyError(dataset)
+        self._used[dataset] = next(self._uses)
+        return current.graph
+
+    #Publishes the graph as the next version of the dataset, as a runtime change of the current graph.
+    def __setitem__(self, dataset: str, graph: Graph):
+        with self._lock:
+            current = self._versions.get(dataset)
+            if current is None:
+                self._publish(dataset, graph, None, 0.0, graph)
+            else:
+                self._publish(dataset, graph, current.source_stamp, current.load_seconds, current.base,
+                              current.closures_stamp)
+
+    def __delitem__(self, dataset: str):
+        with self._lock:
+            versions = dict(self._versions)
+            del versions[dataset]
+            self._versions = versions
+            self._used.pop(dataset, None)
+
+    #True for the loaded datasets and for the building files that can be loaded, without loading them.
+    def __contains__(self, dataset) -> bool:
+        return dataset in self._versions or self._is_building(dataset)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._versions)
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    #Loads the preloaded datasets on the first call and starts watching the loaded files.
+    def start(self, preload: Iterable[str] = ()):
+        if not self._started:
+            self._started = True
+            for dataset in preload:
+                if self.get(dataset) is None:
+                    logger.warning("Preloaded graph not found: %s", dataset)
+        self.start_watching()
+
+    #The building files of data_path, loaded or not.
+    def datasets(self) -> List[str]:
+        return sorted(self._source_stamps())
+
+    #The current version of the dataset, None if it isn't loaded.
+    def version(self, dataset: str) -> Optional[GraphVersion]:
+        return self._versions.get(dataset)
+
+    #The current versions of the loaded datasets in dataset order, without marking them as used.
+    def versions(self) -> List[GraphVersion]:
+        return [current for _, current in sorted(self._versions.items())]
+
+    #Publishes change(graph) as the next version of the dataset, loading it first if needed. The change runs while
+    #publishing is locked, so concurrent changes and reloads don't lose each other. With a closures_path the change
+    #starts from the stored closures and its closures are stored, the other processes wait for it on a file lock.
+    #Gives back the new graph, None if the dataset can't be loaded.
+    def modify(self, dataset: str, change: Callable[[Graph], Graph]) -> Optional[Graph]:
+        if self.get(dataset) is None:
+            return None
+        with self._lock, self._closures_lock():
+            current = self._versions.get(dataset)
+            if current is None:
+                return None
+            graph, closures_stamp = current.graph, current.closures_stamp
+            if self.closures_path is not None:
+                closures_stamp = self._closures_stamp(dataset)
+                if closures_stamp != current.closures_stamp:
+                    graph = current.base.with_closure_delta(self._read_closures(dataset) or {})
+            graph = change(graph)
+            if self.closures_path is not None:
+                closures_stamp = self._write_closures(dataset, graph.closure_delta(current.base))
+            self._publish(dataset, graph, current.source_stamp, current.load_seconds, current.base, closures_stamp)
+            return graph
+
+    #Reloads the loaded datasets whose files changed and forgets the removed ones, gives back the reloaded datasets.
+    def check(self) -> List[str]:
+        with self._check_lock:
+            stamps = self._source_stamps()
+            reloaded = []
+            for dataset in sorted(self._versions):
+                stamp = stamps.get(dataset)
+                if stamp is None:
+                    continue
+                with self._dataset_lock(dataset):
+                    current = self._versions.get(dataset)
+                    if current is None or current.source_stamp == stamp:
+                        continue
+                    if dataset in self._errors and self._errors[dataset][0] == stamp:
+                        continue
+                    if self._load(dataset, stamp):
+                        reloaded.append(dataset)
+            if self.closures_path is not None:
+                for dataset in sorted(self._versions):
+                    with self._dataset_lock(dataset):
+                        if self._sync_closures(dataset) and dataset not in reloaded:
+                            reloaded.append(dataset)
+            for dataset in [dataset for dataset in self._errors if dataset not in stamps]:
+                self._errors.pop(dataset, None)
+            for dataset, current in list(self._versions.items()):
+                if current.source_stamp is not None and dataset not in stamps:
+                    logger.info("Removed graph: %s", dataset)
+                    self.pop(dataset, None)
+            if reloaded:
+                self._evict()
+            return reloaded
+
+    #The version, load time, size and memory estimate of every loaded dataset, with the error of its last failed load.
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        versions, errors = self._versions, dict(self._errors)
+        status = {}
+        for dataset, current in sorted(versions.items()):
+            status[dataset] = {
+                "version": current.version,
+                "loaded_at": current.loaded_at,
+                "load_seconds": current.load_seconds,
+                "nodes": current.graph.node_count(),
+                "memory_bytes": current.graph.memory_bytes(),
+                "error": errors[dataset][1] if dataset in errors else None,
+            }
+        for dataset, (_, error) in sorted(errors.items()):
+            if dataset not in status:
+                status[dataset] = {"version": None, "loaded_at": None, "load_seconds": None, "nodes": None,
+                                   "memory_bytes": None, "error": error}
+        return status
+
+    #The estimated memory of the loaded graphs in bytes.
+    def memory_bytes(self) -> int:
+        return sum(current.graph.memory_bytes() for current in self._versions.values())
+
+    def start_watching(self):
+        if self.poll_interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="graph-registry-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Checking the building files failed")
+
+    #True if the dataset names a building file of data_path (and not a path out of it).
+    def _is_building(self, dataset) -> bool:
+        return (isinstance(dataset, str) and dataset.endswith(".json") and os.path.basename(dataset) == dataset and
+                os.path.isfile(os.path.join(self.data_path, dataset)))
+
+    def _dataset_lock(self, dataset: str) -> threading.Lock:
+        with self._lock:
+            return self._dataset_locks.setdefault(dataset, threading.Lock())
+
+    #Loads a dataset that isn't loaded yet, the requests that come while it loads wait for the same load. A file that
+    #failed to load isn't tried again until it changes.
+    def _load_on_demand(self, dataset: str) -> Optional[GraphVersion]:
+        if not self._is_building(dataset):
+            return None
+        with self._dataset_lock(dataset):
+            current = self._versions.get(dataset)
+            if current is not None:
+                return current
+            try:
+                stat = os.stat(os.path.join(self.data_path, dataset))
+            except OSError:
+                return None
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if dataset in self._errors and self._errors[dataset][0] == stamp:
+                return None
+            if not self._load(dataset, stamp):
+                return None
+            self._used[dataset] = next(self._uses)
+        self._evict()
+        return self._versions.get(dataset)
+
+    #Evicts the least recently used graphs until the loaded ones fit into the memory budget. The graphs with runtime
+    #closures are kept, they couldn't be loaded again. An evicted graph is loaded again on its next request.
+    def _evict(self):
+        if self.memory_budget_bytes <= 0:
+            return
+        sizes = {dataset: current.graph.memory_bytes() for dataset, current in self._versions.items()}
+        total = sum(sizes.values())
+        if total <= self.memory_budget_bytes:
+            return
+        newest = max(self._versions, key=lambda dataset: self._used.get(dataset, -1))
+        for dataset in sorted(sizes, key=lambda dataset: self._used.get(dataset, -1)):
+            if total <= self.memory_budget_bytes:
+                break
+            current = self._versions.get(dataset)
+            if dataset == newest or current is None or current.graph is not current.base:
+                continue
+            self.pop(dataset, None)
+            PathFinder.route_cache.forget(dataset)
+            total -= sizes[dataset]
+            logger.info("Evicted graph: %s (%d bytes)", dataset, sizes[dataset])
+
+    def _source_stamps(self) -> Dict[str, Stamp]:
+        stamps = {}
+        try:
+            filenames = os.listdir(self.data_path)
+        except OSError:
+            logger.exception("Can't list the building files in %s", self.data_path)
+            return stamps
+        for filename in filenames:
+            if filename.endswith(".json"):
+                try:
+                    stat = os.stat(os.path.join(self.data_path, filename))
+                except OSError:
+                    continue
+                stamps[filename] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    #Must be called with the lock of the dataset held.
+    def _load(self, dataset: str, stamp: Stamp) -> bool:
+        start = time.perf_counter()
+        try:
+            graph = self.loader(os.path.join(self.data_path, dataset))
+        except Exception as e:
+            self._errors[dataset] = (stamp, str(e))
+            logger.exception("Failed to load graph: %s", dataset)
+            return False
+        load_seconds = time.perf_counter() - start
+        self._errors.pop(dataset, None)
+
+        with self._lock:
+            current = self._versions.get(dataset)
+            published, closures_stamp = graph, None
+            delta = None
+            if self.closures_path is not None:
+                closures_stamp = self._closures_stamp(dataset)
+                delta = self._read_closures(dataset)
+            if delta is None and current is not None and current.graph is not current.base:
+                delta = current.graph.closure_delta(current.base)
+            if delta is not None:
+                try:
+                    published = graph.with_closure_delta(delta)
+                except Exception:
+                    logger.exception("Failed to carry the closures of %s over to the loaded graph", dataset)
+            self._publish(dataset, published, stamp, load_seconds, graph, closures_stamp)
+        logger.info("Loaded graph: %s (version %d, %.3f s)", dataset, self._versions[dataset].version, load_seconds)
+        return True
+
+    #Must be called with the lock held.
+    def _publish(self, dataset: str, graph: Graph, stamp: Optional[Stamp], load_seconds: float, base: Graph,
+                 closures_stamp: Optional[Stamp] = None):
+        number = self._version_numbers.get(dataset, 0) + 1
+        self._version_numbers[dataset] = number
+        version = GraphVersion(dataset, graph, number, time.time(), load_seconds, stamp, base, closures_stamp)
+        versions = dict(self._versions)
+        versions[dataset] = version
+        self._versions = versions
+
+    #Publishes the stored closures of the dataset if another process changed them, gives back true if it did. Must be
+    #called with the lock of the dataset held.
+    def _sync_closures(self, dataset: str) -> bool:
+        current = self._versions.get(dataset)
+        closures_stamp = self._closures_stamp(dataset)
+        if current is None or closures_stamp == current.closures_stamp:
+            return False
+        try:
+            graph = current.base.with_closure_delta(self._read_closures(dataset) or {})
+        except Exception:
+            logger.exception("Failed to make the stored closures of %s", dataset)
+            return False
+        with self._lock:
+            if self._versions.get(dataset) is not current:
+                return False
+            self._publish(dataset, graph, current.source_stamp, current.load_seconds, current.base, closures_stamp)
+        logger.info("Updated closures: %s (version %d)", dataset, self._versions[dataset].version)
+        return True
+
+    #Locks the stored closures against the other processes while it is held, nothing without a closures_path or fcntl.
+    @contextlib.contextmanager
+    def _closures_lock(self):
+        if self.closures_path is None or fcntl is None:
+            yield
+            return
+        os.makedirs(self.closures_path, exist_ok=True)
+        with open(os.path.join(self.closures_path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _closures_file(self, dataset: str) -> str:
+        return os.path.join(self.closures_path, dataset)
+
+    def _closures_stamp(self, dataset: str) -> Optional[Stamp]:
+        try:
+            stat = os.stat(self._closures_file(dataset))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    #The stored closure delta of the dataset, None if there is none or it can't be read.
+    def _read_closures(self, dataset: str) -> Optional[Dict[str, List[Any]]]:
+        try:
+            with open(self._closures_file(dataset)) as f:
+                delta = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.exception("Can't read the stored closures of %s", dataset)
+            return None
+        return delta if isinstance(delta, dict) else None
+
+    #Stores the closure delta of the dataset and gives back the stamp of the stored file.
+    def _write_closures(self, dataset: str, delta: Dict[str, List[Any]]) -> Optional[Stamp]:
+        os.makedirs(self.closures_path, exist_ok=True)
+        path = self._closures_file(dataset)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(delta, f)
+        os.replace(temporary_path, path)
+        return self._closures_stamp(dataset)
@@ -0,0 +1,386 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from .Node import Graph, GraphBuilder, RoutingProfile
+from .Landmarks import LandmarkTable
+from .SearchIndex import SearchIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SNAPSHOT_MAGIC = b"PFGRAPH\x00"
+SNAPSHOT_VERSION = 8
+SNAPSHOT_EXTENSION = ".graph"
+
+#magic, version, byte order, coordinate typecode, node count, string count, floor height, source mtime, source size,
+#section count
+HEADER = struct.Struct("<8sIcc2xIIdqqI")
+#name, typecode, offset, item count
+SECTION = struct.Struct("<4sc3xQQ")
+ALIGNMENT = 8
+
+#Sections holding one compact Graph array each, the name of the section and the name of the Graph field
+ARRAY_SECTIONS = (
+    (b"XCOO", "x"), (b"YCOO", "y"), (b"LEVL", "level"),
+    (b"TARG", "targetable"), (b"ACCS", "accessible"), (b"CLSD", "closed"),
+    (b"REAX", "real_x"), (b"REAY", "real_y"),
+    (b"ROFF", "offsets"), (b"RTGT", "targets"), (b"RWGT", "weights"),
+)
+
+#Sections of the search index arrays
+SEARCH_INDEX_SECTIONS = (
+    (b"STGT", "targetables"), (b"SIDL", "identifier_lengths"), (b"SGRC", "gram_codes"), (b"SGRS", "gram_starts"),
+    (b"SPST", "postings"), (b"SFDO", "folded_offsets"),
+)
+#Section of the folded search text of the search index, in UTF-8
+SEARCH_INDEX_TEXT_SECTION = b"SFDS"
+
+#The routing profiles in the order of their section number, the P sections hold their usable nodes, component labels
+#and filtered adjacency (unless the profile uses the adjacency of the graph), the L sections their landmark tables
+PROFILE_KEYS = ((False, False), (False, True), (True, False), (True, True))
+
+
+class SnapshotError(Exception):
+    pass
+
+
+#StringTable gives back the strings of a string table section, the strings are decoded when they are accessed.
+class StringTable(Sequence):
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.raw(index).decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def raw(self, index: int) -> bytes:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return bytes(self._data[self._offsets[index]:self._offsets[index + 1]])
+
+
+#AliasTable gives back the aliases of a node as a tuple, read from the string table of the snapshot.
+class AliasTable(Sequence):
+    def __init__(self, alias_offsets, strings: StringTable):
+        self._alias_offsets = alias_offsets
+        self._strings = strings
+
+    def __len__(self):
+        return len(self._alias_offsets) - 1
+
+    def __getitem__(self, index: int) -> Tuple[str, ...]:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return tuple(self._strings[string] for string in
+                     range(self._alias_offsets[index], self._alias_offsets[index + 1]))
+
+
+#IdentifierIndex maps identifiers to node indexes like Graph's dictionary, but it binary searches the node indexes
+#sorted by identifier in the snapshot, so the mapping itself lives in the shared mapping and not in every worker.
+#Like the dictionary, a duplicated identifier gives back its last node and it is iterated at its first node.
+class IdentifierIndex(Mapping):
+    def __init__(self, identifiers: StringTable, sorted_order):
+        self._identifiers = identifiers
+        self._sorted_order = sorted_order
+        self._length: Optional[int] = None
+
+    def __getitem__(self, identifier: str) -> int:
+        try:
+            key = identifier.encode("utf-8")
+        except (AttributeError, UnicodeEncodeError):
+            raise KeyError(identifier)
+        low, high = 0, len(self._sorted_order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._identifiers.raw(self._sorted_order[middle]) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low and self._identifiers.raw(self._sorted_order[low - 1]) == key:
+            return self._sorted_order[low - 1]
+        raise KeyError(identifier)
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        for identifier in self._identifiers:
+            if identifier not in seen:
+                seen.add(identifier)
+                yield identifier
+
+    def __len__(self):
+        if self._length is None:
+            order, identifiers = self._sorted_order, self._identifiers
+            self._length = sum(1 for position in range(len(order))
+                               if position == 0 or identifiers.raw(order[position]) != identifiers.raw(order[position - 1]))
+        return self._length
+
+
+#GraphSnapshot writes a compacted Graph into a binary file and maps it back into memory. The file has a versioned
+#header, a section table and 8 byte aligned sections: the string table (identifiers, then aliases), the alias ranges
+#of the nodes, the identifier sort order, the node attribute arrays, the CSR adjacency arrays, the level metadata, the
+#search index, the filtered adjacency and the landmark tables of the routing profiles. Loading only maps the file,
+#the arrays of the Graph are memoryviews of the mapping, nothing is parsed or copied. Every process mapping the same
+#file shares its pages.
+class GraphSnapshot:
+    @staticmethod
+    def path_for(json_path: str) -> str:
+        return os.path.splitext(json_path)[0] + SNAPSHOT_EXTENSION
+
+    @staticmethod
+    def write(graph: Graph, path: str, source_path: Optional[str] = None):
+        data = graph.get_compact_data()
+        identifiers, aliases = data["identifiers"], data["aliases"]
+        strings: List[str] = list(identifiers)
+        alias_offsets = array("I", [len(strings)])
+        for node_aliases in aliases:
+            strings.extend(node_aliases)
+            alias_offsets.append(len(strings))
+        encoded_identifiers = [identifier.encode("utf-8") for identifier in identifiers]
+        sorted_order = array("i", sorted(range(len(identifiers)), key=lambda index: (encoded_identifiers[index], index)))
+
+        level_numbers = sorted(graph.levels)
+        sections: List[Tuple[bytes, str, bytes, int]] = []
+        sections += GraphSnapshot._string_sections(b"STRO", b"STRS", strings)
+        sections.append(GraphSnapshot._array_section(b"ALOF", alias_offsets))
+        sections.append(GraphSnapshot._array_section(b"IDSO", sorted_order))
+        sections.append(GraphSnapshot._array_section(b"LVID", array("i", level_numbers)))
+        for name, key, default in ((b"LVOX", "x", 0), (b"LVOY", "y", 0), (b"LVSC", "pixel_to_cm", 1.0)):
+            values = array("d", (graph.levels[level].get(key, default) for level in level_numbers))
+            sections.append(GraphSnapshot._array_section(name, values))
+        for name, field in ARRAY_SECTIONS:
+            sections.append(GraphSnapshot._array_section(name, data[field]))
+
+        search_arrays = graph.get_search_index().get_arrays()
+        for name, field in SEARCH_INDEX_SECTIONS:
+            sections.append(GraphSnapshot._array_section(name, search_arrays[field]))
+        folded = search_arrays["folded"].encode("utf-8")
+        sections.append((SEARCH_INDEX_TEXT_SECTION, "B", folded, len(folded)))
+
+        for number, (accessible, use_closed_corridors) in enumerate(PROFILE_KEYS):
+            profile = graph.get_profile(accessible, use_closed_corridors)
+            prefix = b"P%d" % number
+            sections.append(GraphSnapshot._array_section(prefix + b"US", profile.usable))
+            sections.append(GraphSnapshot._array_section(prefix + b"CC", profile.components))
+            if profile.targets is data["targets"]:
+                continue
+            sections.append(GraphSnapshot._array_section(prefix + b"OF", profile.offsets))
+            sections.append(GraphSnapshot._array_section(prefix + b"TG", profile.targets))
+            sections.append(GraphSnapshot._array_section(prefix + b"WT", profile.weights))
+        for number, (accessible, use_closed_corridors) in enumerate(PROFILE_KEYS):
+            landmarks = graph.get_landmarks(accessible, use_closed_corridors)
+            prefix = b"L%d" % number
+            sections.append(GraphSnapshot._array_section(prefix + b"LM", landmarks.landmarks))
+            sections.append(GraphSnapshot._array_section(prefix + b"DS", landmarks.distances))
+
+        source_mtime_ns, source_size = GraphSnapshot._source_stamp(source_path)
+        header = HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, b"<" if sys.byteorder == "little" else b">",
+            GraphSnapshot._typecode(data["x"]).encode(), len(identifiers), len(strings),
+            float(graph.floor_height_cm), source_mtime_ns, source_size, len(sections),
+        )
+        GraphSnapshot._write_sections(path, header, sections)
+
+    #Maps a snapshot file and gives back a Graph that works on the mapping. By default the identifiers and the search
+    #strings are decoded into private lists for the fastest lookups, with shared=True they are read from the mapping
+    #too, so a worker keeps almost nothing of the graph in its own memory.
+    @staticmethod
+    def read(path: str, shared: bool = False) -> Graph:
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = GraphSnapshot._read_header(mapping)
+        sections = GraphSnapshot._map_sections(mapping, HEADER.size, header["section_count"], path)
+
+        node_count = header["node_count"]
+        strings = StringTable(sections[b"STRO"], sections[b"STRS"])
+        identifiers = StringTable(sections[b"STRO"][:node_count + 1], sections[b"STRS"])
+        aliases = AliasTable(sections[b"ALOF"], strings)
+        search_arrays: Dict[str, Any] = {field: sections[name] for name, field in SEARCH_INDEX_SECTIONS}
+        search_arrays["folded"] = bytes(sections[SEARCH_INDEX_TEXT_SECTION]).decode("utf-8")
+        if shared:
+            data: Dict[str, Any] = {
+                "identifiers": identifiers,
+                "aliases": aliases,
+                "name_to_index": IdentifierIndex(identifiers, sections[b"IDSO"]),
+            }
+        else:
+            data = {"identifiers": list(identifiers), "aliases": list(aliases)}
+        for name, field in ARRAY_SECTIONS:
+            data[field] = sections[name]
+        data["search_index"] = SearchIndex.from_arrays(search_arrays, data["identifiers"], data["aliases"])
+        data["profiles"] = {}
+        for number, (accessible, use_closed_corridors) in enumerate(PROFILE_KEYS):
+            prefix = b"P%d" % number
+            adjacency = [prefix + b"OF", prefix + b"TG", prefix + b"WT"]
+            if adjacency[0] not in sections:
+                adjacency = [b"ROFF", b"RTGT", b"RWGT"]
+            data["profiles"][(accessible, use_closed_corridors)] = RoutingProfile.from_arrays(
+                accessible, use_closed_corridors, sections[prefix + b"US"], *(sections[name] for name in adjacency),
+                components=sections[prefix + b"CC"],
+            )
+        data["landmarks"] = {
+            key: LandmarkTable(sections[b"L%dLM" % number], sections[b"L%dDS" % number])
+            for number, key in enumerate(PROFILE_KEYS)
+        }
+
+        graph = Graph()
+        graph.floor_height_cm = header["floor_height_cm"]
+        for level, origin_x, origin_y, scale in zip(sections[b"LVID"], sections[b"LVOX"], sections[b"LVOY"],
+                                                    sections[b"LVSC"]):
+            graph.add_level_metadata(level, origin_x, origin_y, scale)
+        graph.set_compact_data(data)
+        graph.snapshot_mapping = mapping
+        return graph
+
+    #A snapshot is fresh if it has the current version and byte order and was compiled from the current source file.
+    @staticmethod
+    def is_fresh(path: str, source_path: str) -> bool:
+        try:
+            with open(path, "rb") as f:
+                header = GraphSnapshot._read_header(f.read(HEADER.size))
+        except (OSError, SnapshotError):
+            return False
+        return (header["source_mtime_ns"], header["source_size"]) == GraphSnapshot._source_stamp(source_path)
+
+    #Loads the snapshot next to the JSON file if it's fresh, otherwise parses the JSON file.
+    @staticmethod
+    def load_graph(json_path: str) -> Graph:
+        snapshot_path = GraphSnapshot.path_for(json_path)
+        if GraphSnapshot.is_fresh(snapshot_path, json_path):
+            try:
+                return GraphSnapshot._with_source(GraphSnapshot.read(snapshot_path), json_path)
+            except (OSError, ValueError, KeyError, SnapshotError):
+                pass
+        return GraphBuilder.from_file(json_path)
+
+    #Loads the graph in shared mode: the first process that finds the snapshot missing or stale compiles it (the others
+    #wait for it on a file lock), then every process maps the same read-only file.
+    @staticmethod
+    def load_shared(json_path: str) -> Graph:
+        snapshot_path = GraphSnapshot.path_for(json_path)
+        if not GraphSnapshot.is_fresh(snapshot_path, json_path):
+            with open(snapshot_path + ".lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if not GraphSnapshot.is_fresh(snapshot_path, json_path):
+                        GraphSnapshot.compile(json_path)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return GraphSnapshot._with_source(GraphSnapshot.read(snapshot_path, shared=True), json_path)
+
+    #Compiles a JSON building file into a snapshot next to it and gives back the snapshot's path.
+    @staticmethod
+    def compile(json_path: str) -> str:
+        snapshot_path = GraphSnapshot.path_for(json_path)
+        GraphSnapshot.write(GraphBuilder.from_file(json_path), snapshot_path, source_path=json_path)
+        return snapshot_path
+
+    @staticmethod
+    def _read_header(buffer) -> Dict[str, Any]:
+        if len(buffer) < HEADER.size:
+            raise SnapshotError("Snapshot is too short")
+        (magic, version, byte_order, coordinate_type, node_count, string_count, floor_height_cm, source_mtime_ns,
+         source_size, section_count) = HEADER.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError("Not a graph snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+        if byte_order != (b"<" if sys.byteorder == "little" else b">"):
+            raise SnapshotError("Snapshot was written with a different byte order")
+        return {
+            "coordinate_type": coordinate_type.decode(),
+            "node_count": node_count,
+            "string_count": string_count,
+            "floor_height_cm": floor_height_cm,
+            "source_mtime_ns": source_mtime_ns,
+            "source_size": source_size,
+            "section_count": section_count,
+        }
+
+    #Writes the header, the section table and the 8 byte aligned sections into a temporary file, then moves it to the
+    #path, so a reader never sees a half written file.
+    @staticmethod
+    def _write_sections(path: str, header: bytes, sections: List[Tuple[bytes, str, bytes, int]]):
+        offset = GraphSnapshot._align(len(header) + SECTION.size * len(sections))
+        table = []
+        for name, typecode, payload, count in sections:
+            table.append(SECTION.pack(name, typecode.encode(), offset, count))
+            offset = GraphSnapshot._align(offset + len(payload))
+
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(header)
+            f.write(b"".join(table))
+            for _, _, payload, _ in sections:
+                f.write(b"\x00" * (GraphSnapshot._align(f.tell()) - f.tell()))
+                f.write(payload)
+        os.replace(temporary_path, path)
+
+    #Gives back the sections of a mapped file by name, as memoryviews cast to the typecode of the section.
+    @staticmethod
+    def _map_sections(mapping, header_size: int, section_count: int, path: str) -> Dict[bytes, memoryview]:
+        view = memoryview(mapping)
+        sections: Dict[bytes, memoryview] = {}
+        for position in range(section_count):
+            name, typecode, offset, count = SECTION.unpack_from(mapping, header_size + position * SECTION.size)
+            itemsize = struct.calcsize(typecode.decode())
+            if offset + count * itemsize > len(mapping):
+                raise SnapshotError(f"Truncated section {name!r} in {path}")
+            section = view[offset:offset + count * itemsize]
+            sections[name] = section if typecode == b"B" else section.cast(typecode.decode())
+        return sections
+
+    @staticmethod
+    def _typecode(values) -> str:
+        if isinstance(values, (bytes, bytearray)):
+            return "B"
+        if isinstance(values, array):
+            return values.typecode
+        return values.format
+
+    @staticmethod
+    def _array_section(name: bytes, values) -> Tuple[bytes, str, bytes, int]:
+        typecode = GraphSnapshot._typecode(values)
+        return name, typecode, bytes(values) if typecode == "B" else array(typecode, values).tobytes(), len(values)
+
+    @staticmethod
+    def _string_sections(offsets_name: bytes, data_name: bytes, strings: Sequence[str]):
+        encoded = [string.encode("utf-8") for string in strings]
+        offsets = array("I", [0])
+        for string in encoded:
+            offsets.append(offsets[-1] + len(string))
+        return [
+            GraphSnapshot._array_section(offsets_name, offsets),
+            (data_name, "B", b"".join(encoded), offsets[-1]),
+        ]
+
+    #Records the building file of a graph read from its fresh snapshot, see Graph.source_file.
+    @staticmethod
+    def _with_source(graph: Graph, json_path: str) -> Graph:
+        graph.source_file = (json_path, GraphSnapshot._source_stamp(json_path))
+        return graph
+
+    @staticmethod
+    def _source_stamp(source_path: Optional[str]) -> Tuple[int, int]:
+        if source_path is None:
+            return 0, 0
+        stat = os.stat(source_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
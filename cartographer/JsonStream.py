@@ -0,0 +1,118 @@
+import json
+import re
+from typing import Any, Iterator, Optional, TextIO
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+#JsonStream reads a JSON document from a text file piece by piece, so a large document never has to be decoded at
+#once. The caller walks the structure: members() goes through the keys of an object, elements() decodes the elements of
+#an array one by one and value() decodes the next complete value. The file is read chunk_size characters at a time and
+#the decoded part of the buffer is dropped before the next chunk is added. The values are decoded by the raw_decode of
+#the json module.
+class JsonStream:
+    chunk_size = 65536
+
+    def __init__(self, file: TextIO, chunk_size: Optional[int] = None):
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        self._file = file
+        self._buffer = ""
+        self._position = 0
+        self._consumed = 0
+        self._end_of_file = False
+        self._decoder = json.JSONDecoder()
+
+    #The next character that isn't whitespace, without consuming it, "" at the end of the file.
+    def peek(self) -> str:
+        while True:
+            buffer = self._buffer
+            self._position = position = _WHITESPACE.match(buffer, self._position).end()
+            if position < len(buffer):
+                return buffer[position]
+            if not self._read():
+                return ""
+
+    #Consumes the character, ValueError if the next character that isn't whitespace is another one.
+    def expect(self, character: str):
+        if self.peek() != character:
+            raise self._error(f"Expecting {character!r}")
+        self._position += 1
+
+    #Decodes the next value. A value that ends at the end of the buffer is decoded again with more of the file, so a
+    #number split between two chunks isn't cut.
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+                if end < len(self._buffer) or self._end_of_file:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._end_of_file:
+                    raise self._error(e.msg, e.pos) from None
+            self._read()
+
+    #Goes through the members of the next object: consumes each key with its colon and gives it back, the caller has to
+    #consume the value (with value(), elements() or members()) before asking for the next key.
+    def members(self) -> Iterator[str]:
+        self.expect("{")
+        if self.peek() == "}":
+            self._position += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error("Expecting property name enclosed in double quotes")
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self._position += 1
+                continue
+            self.expect("}")
+            return
+
+    #Decodes the elements of the next array one by one.
+    def elements(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self._position += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self._position += 1
+                continue
+            self.expect("]")
+            return
+
+    #ValueError if anything but whitespace follows the decoded document.
+    def expect_end(self):
+        if self.peek() != "":
+            raise self._error("Extra data")
+
+    #Reads the next chunk, doubling the chunk size while a single value doesn't fit into the buffer. Gives back false at
+    #the end of the file.
+    def _read(self) -> bool:
+        if self._end_of_file:
+            return False
+        self._discard()
+        size = max(self.chunk_size, len(self._buffer))
+        chunk = self._file.read(size)
+        if not chunk:
+            self._end_of_file = True
+            return False
+        self._buffer += chunk
+        return True
+
+    #Drops the decoded part of the buffer.
+    def _discard(self):
+        if self._position:
+            self._consumed += self._position
+            self._buffer = self._buffer[self._position:]
+            self._position = 0
+
+    def _error(self, message: str, position: Optional[int] = None) -> ValueError:
+        position = self._position if position is None else position
+        return ValueError(f"{message}: character {self._consumed + position}")
@@ -0,0 +1,70 @@
+import math
+from array import array
+from typing import Dict, List, Tuple
+
+#Number of landmarks of a routing profile, more landmarks give tighter estimates but cost memory and time per node
+LANDMARK_COUNT = 8
+
+
+#LandmarkTable keeps the shortest route lengths from a few landmark nodes to every node of one routing profile. The
+#graph is undirected, so for any landmark L the triangle inequality gives |d(L, goal) - d(L, node)| <= d(node, goal).
+#The largest of these bounds is the ALT heuristic, it never overestimates and it is consistent, so an A* search with
+#it always finds the shortest route. The distances are stored node by node: distances[node * count + landmark].
+class LandmarkTable:
+    __slots__ = ("landmarks", "distances")
+
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.distances = distances
+
+    #Picks the landmarks with farthest point selection inside the largest connected part of the profile: the first one
+    #is the farthest node from an arbitrary node, every next one is the node farthest from all landmarks so far.
+    @classmethod
+    def build(cls, graph, accessible: bool, use_closed_corridors: bool, count: int = LANDMARK_COUNT):
+        profile = graph.get_profile(accessible, use_closed_corridors)
+        candidates = cls._largest_component(profile)
+        landmarks = array("i")
+        rows: List[List[float]] = []
+        if candidates:
+            nearest, _ = graph._shortest_path_tree(candidates[0], accessible, use_closed_corridors)
+            while len(landmarks) < min(count, len(candidates)):
+                landmark = max(candidates, key=lambda index: nearest[index])
+                if nearest[landmark] <= 0:
+                    break
+                distances, _ = graph._shortest_path_tree(landmark, accessible, use_closed_corridors)
+                landmarks.append(landmark)
+                rows.append(distances)
+                nearest = distances if len(rows) == 1 else [min(a, b) for a, b in zip(nearest, distances)]
+
+        table = array("d", bytes(8 * len(profile.usable) * len(landmarks)))
+        landmark_count = len(landmarks)
+        for landmark_position, distances in enumerate(rows):
+            table[landmark_position::landmark_count] = array("d", distances)
+        return cls(landmarks, table)
+
+    #The usable nodes of the largest connected component of the profile.
+    @staticmethod
+    def _largest_component(profile) -> List[int]:
+        components = profile.components
+        sizes: Dict[int, int] = {}
+        for label in components:
+            if label >= 0:
+                sizes[label] = sizes.get(label, 0) + 1
+        if not sizes:
+            return []
+        largest = max(sizes, key=sizes.get)
+        return [index for index, label in enumerate(components) if label == largest]
+
+    #The landmarks that reach the goal with their distance to it, as (landmark position, distance) pairs.
+    def goal_bounds(self, goal_index: int) -> List[Tuple[int, float]]:
+        count = len(self.landmarks)
+        row = goal_index * count
+        return [(position, self.distances[row + position]) for position in range(count)
+                if not math.isinf(self.distances[row + position])]
+
+    #Lower bound of the shortest route length from the node to the goal.
+    def estimate(self, node_index: int, goal_index: int) -> float:
+        row = node_index * len(self.landmarks)
+        distances = self.distances
+        return max((abs(distances[row + position] - goal_distance)
+                    for position, goal_distance in self.goal_bounds(goal_index)), default=0.0)
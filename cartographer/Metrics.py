@@ -0,0 +1,133 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+#Upper bounds of the latency buckets in seconds, from half a millisecond to ten seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+#Histogram counts the observed values (latencies in seconds) in fixed buckets for every set of label values. An
+#observation is a bisect and a few additions under the histogram's lock, so it is cheap enough to stay on and the
+#counts of concurrent threads add up exactly.
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        #For every label value tuple: the count of each bucket (the last one is +Inf), the sum and the count
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects the labels {self.label_names}")
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    #The count and sum of the observations with the label values.
+    def get(self, *labels: str) -> Tuple[int, float]:
+        with self._lock:
+            series = self._series.get(labels)
+            return (series[2], series[1]) if series is not None else (0, 0.0)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(counts), total, count) for labels, (counts, total, count)
+                            in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+#CallbackMetric is a gauge or counter read when the metrics are rendered, for values that are already kept elsewhere
+#(cache counters, graph memory). The function gives back (label values, value) pairs.
+class CallbackMetric:
+    def __init__(self, name: str, metric_type: str, documentation: str, label_names: Sequence[str],
+                 function: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]):
+        self.name = name
+        self.metric_type = metric_type
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.function = function
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.function():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+#MetricsRegistry keeps the metrics of the process and renders them in the Prometheus text format. The metrics are
+#per process, every worker of a multi-process server is scraped on its own.
+class MetricsRegistry:
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str],
+              function: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, "gauge", documentation, label_names, function))
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str],
+                function: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, "counter", documentation, label_names, function))
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
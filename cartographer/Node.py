@@ -1,11 +1,25 @@
 import json
 import math
+import os
+import sys
+import time
 import heapq
+import threading
+from array import array
 from abc import ABC, abstractmethod
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, Iterator, FrozenSet, Iterable
+from .RouteCache import RouteCache
+from .SearchIndex import SearchIndex
+from .Landmarks import LandmarkTable
+from .ShortestPathTreeCache import ShortestPathTreeCache
+from .DistanceMatrixCache import DistanceMatrixCache
+from .JsonStream import JsonStream
+from .SearchStats import SearchStats
 
 
 class Node(ABC):
+    __slots__ = ("_x_coordinate", "_y_coordinate", "_identifier", "_closed_corridor", "_accessibility", "_level")
+
     def __init__(self, x_coordinate, y_coordinate, identifier, closed_corridor, accessibility, level):
         self._x_coordinate = x_coordinate
         self._y_coordinate = y_coordinate
@@ -65,6 +79,8 @@ class Node(ABC):
 
 #This class contains nodes that can be searched, and have specific name/names too.
 class Targetable(Node):
+    __slots__ = ("__aliases",)
+
     def __init__(self, x_coordinate, y_coordinate, identifier, closed_corridor, accessibility, level, *aliases):
         super().__init__(x_coordinate, y_coordinate, identifier, closed_corridor, accessibility, level)
         self.__aliases = aliases
@@ -85,52 +101,181 @@ class Targetable(Node):
 
 #This class containes leading Nodes, that helps connect Targetable nodes.
 class NotTargetable(Node):
+    __slots__ = ()
+
     def __init__(self, x_coordinate, y_coordinate, identifier, closed_corridor, accessibility, level):
         super().__init__(x_coordinate, y_coordinate, identifier, closed_corridor, accessibility, level)
-        self.__closed_corridor = closed_corridor
-        self.__accessibility = accessibility
 
     def is_visible_to_client(self) -> bool:
         return False
 
-#Graph class contains a building's nodes in a list, and edges in a adjacency list witch will help faster search results.
+#RoutingProfile is a view of a compacted Graph for one accessible/use_closed_corridors combination. While at most
+#share_fraction of the nodes are unusable and none of the edges is closed for it, the profile uses the adjacency arrays
+#of the graph itself, otherwise it gets filtered copies that only contain the edges to usable nodes. Either way the
+#searches skip the targets that aren't usable. The usable nodes are labelled by connected component (-1 for the
+#unusable ones), so a pair without a route is known before any search starts.
+class RoutingProfile:
+    __slots__ = ("accessible", "use_closed_corridors", "usable", "offsets", "targets", "weights", "components")
+    share_fraction = 0.1
+
+    def __init__(self, graph: "Graph", accessible: bool, use_closed_corridors: bool):
+        self.accessible = accessible
+        self.use_closed_corridors = use_closed_corridors
+        self.usable = bytes(
+            1 if (not accessible or is_accessible) and (use_closed_corridors or not is_closed) else 0
+            for is_accessible, is_closed in zip(graph._accessible, graph._closed)
+        )
+        closed_edges = () if use_closed_corridors else graph._closed_edges
+        if not closed_edges and self.usable.count(0) <= RoutingProfile.share_fraction * len(self.usable):
+            self.offsets, self.targets, self.weights = graph._offsets, graph._targets, graph._weights
+        else:
+            usable = self.usable
+            base_offsets, base_targets, base_weights = graph._offsets, graph._targets, graph._weights
+            offsets = array("i", [0])
+            targets = array("i")
+            weights = array("d")
+            for index in range(len(base_offsets) - 1):
+                for edge in range(base_offsets[index], base_offsets[index + 1]):
+                    target = base_targets[edge]
+                    if usable[target] and (not closed_edges or (min(index, target), max(index, target))
+                                           not in closed_edges):
+                        targets.append(target)
+                        weights.append(base_weights[edge])
+                offsets.append(len(targets))
+            self.offsets = offsets
+            self.targets = targets
+            self.weights = weights
+        self.components = RoutingProfile.label_components(self.usable, graph._offsets, graph._targets, closed_edges)
+
+    #Creates a profile from already filtered arrays (for example from the memoryviews of a graph snapshot).
+    @classmethod
+    def from_arrays(cls, accessible: bool, use_closed_corridors: bool, usable, offsets, targets, weights,
+                    components=None):
+        profile = cls.__new__(cls)
+        profile.accessible = accessible
+        profile.use_closed_corridors = use_closed_corridors
+        profile.usable = usable
+        profile.offsets = offsets
+        profile.targets = targets
+        profile.weights = weights
+        if components is None:
+            components = RoutingProfile.label_components(usable, offsets, targets)
+        profile.components = components
+        return profile
+
+    #Labels the usable nodes with a breadth first search from every usable node that isn't labelled yet. The search
+    #walks the given adjacency arrays (the unfiltered ones of the graph are fine) and skips the unusable targets and the
+    #closed edges, the graph is undirected, so every search covers exactly one component.
+    @staticmethod
+    def label_components(usable, offsets, targets, closed_edges=()):
+        components = array("i", [-1]) * len(usable)
+        label = 0
+        for start in range(len(usable)):
+            if components[start] != -1 or not usable[start]:
+                continue
+            components[start] = label
+            queue = [start]
+            for index in queue:
+                for edge in range(offsets[index], offsets[index + 1]):
+                    target = targets[edge]
+                    if components[target] == -1 and usable[target] and (
+                            not closed_edges or (min(index, target), max(index, target)) not in closed_edges):
+                        components[target] = label
+                        queue.append(target)
+            label += 1
+        return components
+
+    #Gives back true if a route exists from the source to the goal. The source is exempt from the usability filter like
+    #in the searches, an unusable source reaches the components of its usable neighbours.
+    def can_reach(self, source_index: int, goal_index: int) -> bool:
+        if source_index == goal_index:
+            return True
+        label = self.components[goal_index]
+        if label < 0:
+            return False
+        if self.usable[source_index]:
+            return self.components[source_index] == label
+        components, targets = self.components, self.targets
+        return any(components[targets[edge]] == label
+                   for edge in range(self.offsets[source_index], self.offsets[source_index + 1]))
+
+
+#Names of the packed arrays of a compacted Graph (without the leading underscore of the attributes)
+COMPACT_FIELDS = ("identifiers", "aliases", "x", "y", "level", "targetable", "accessible", "closed",
+                  "real_x", "real_y", "offsets", "targets", "weights")
+
+
+#Graph class contains a building's nodes and edges. While it is being built the nodes are kept in a list and the
+#edges in an adjacency list, compact() packs them into flat arrays (compressed sparse row adjacency and parallel node
+#attribute arrays), so a loaded graph needs much less memory and the searches don't call methods per node and edge.
 class Graph:
     def __init__(self):
-        self._nodes: List[Node] = []
+        self._nodes: Optional[List[Node]] = []
         self._name_to_index: Dict[str, int] = {}
-        self._adjacency_list: List[List[Tuple[int, float]]] = []
+        self._adjacency_list: Optional[List[List[Tuple[int, float]]]] = []
         self.levels: Dict[int, Dict[str, float]] = {}
         self.floor_height_cm = 1000
+        self._compact_lock = threading.Lock()
+        self._identifiers: List[str] = []
+        self._aliases: List[Tuple[str, ...]] = []
+        self._x = None
+        self._y = None
+        self._level = None
+        self._targetable = None
+        self._accessible = None
+        self._closed = None
+        self._real_x = None
+        self._real_y = None
+        self._offsets = None
+        self._targets = None
+        self._weights = None
+        self._profiles: Dict[Tuple[bool, bool], RoutingProfile] = {}
+        self._landmarks: Dict[Tuple[bool, bool], LandmarkTable] = {}
+        self._hierarchies: Dict[Tuple[bool, bool], Any] = {}
+        self.tree_cache = ShortestPathTreeCache()
+        self.distance_cache = DistanceMatrixCache()
+        self._search_index: Optional[SearchIndex] = None
+        self._consistent_heuristic: Optional[Tuple[float, float]] = None
+        #The closed edges used by the routing profiles, by their (smaller, larger) node indexes
+        self._closed_edges: FrozenSet[Tuple[int, int]] = frozenset()
+        #The building file the graph was loaded from: (path, (modification time in nanoseconds, size)), worker
+        #processes load the same graph from it, see WorkerPool
+        self.source_file: Optional[Tuple[str, Tuple[int, int]]] = None
 
     #This function search for targetables by the search_text in the identifier and aliases attribute, so more result
-    #will be genereated.
+    #will be genereated. The search index only gives back the first 10 matches in node order.
     def search_for_targetables(self, search_text):
-        targetable_list = []
-        for node in self._nodes:
-            appended = False
-            if len(targetable_list) > 9:
-                break
-            if node.is_visible_to_client() and node.is_text_in_identifier(search_text):
-                appended = True
-                targetable_list.append(node)
+        return [self.get_node(index) for index in self.get_search_index().search(search_text)]
 
-            if node.is_visible_to_client() and node.is_text_in_aliases(search_text) and not appended:
-                targetable_list.append(node)
-        return targetable_list
+    #Gives back at most limit targetables ordered by how well they match the search_text: exact, prefix and substring
+    #identifier matches, alias matches and finally identifiers or aliases with a few typos.
+    def rank_targetables(self, search_text, limit=10):
+        return [self.get_node(index) for index in self.get_search_index().rank(search_text, limit)]
 
     def get_id_to_index(self):
         return self._name_to_index
 
+    def is_compact(self) -> bool:
+        return self._nodes is None
+
+    def node_count(self) -> int:
+        if self._nodes is not None:
+            return len(self._nodes)
+        return len(self._identifiers)
+
     def add_level_metadata(self, level: int, origin_x: float, origin_y: float, pixel_to_cm: float):
+        self._ensure_mutable()
         self.levels[int(level)] = {"x": origin_x, "y": origin_y, "pixel_to_cm": float(pixel_to_cm)}
 
     def add_node(self, node: Node):
+        self._ensure_mutable()
         index = len(self._nodes)
         self._nodes.append(node)
         self._name_to_index[node.get_identifier()] = index
         self._adjacency_list.append([])
 
     def add_edge_by_indices(self, sourceIndex: int, goalIndex: int, weight: float):
+        self._ensure_mutable()
         self._adjacency_list[sourceIndex].append((goalIndex, weight))
         self._adjacency_list[goalIndex].append((sourceIndex, weight))
 
@@ -140,175 +285,1075 @@ class Graph:
         self.add_edge_by_indices(sourceIndex, goalIndex, weight)
 
     def get_node(self, index: int) -> Node:
-        return self._nodes[index]
+        if self._nodes is not None:
+            return self._nodes[index]
+        return self._materialize_node(index)
 
     def get_index(self, identifier: str) -> int:
         return self._name_to_index[identifier]
 
+    #Packs the node objects and the adjacency list into arrays. The search algorithms call it themselves if needed,
+    #GraphBuilder calls it once after loading, so the objects of the building phase can be freed.
+    def compact(self):
+        with self._compact_lock:
+            nodes = self._nodes
+            if nodes is None:
+                return
+            integer_coordinates = all(
+                isinstance(node.get_x_coordinate(), int) and isinstance(node.get_y_coordinate(), int)
+                for node in nodes
+            )
+            coordinate_type = "q" if integer_coordinates else "d"
+            self._identifiers = [node.get_identifier() for node in nodes]
+            self._aliases = [node.get_aliases() if isinstance(node, Targetable) else () for node in nodes]
+            self._x = array(coordinate_type, (node.get_x_coordinate() for node in nodes))
+            self._y = array(coordinate_type, (node.get_y_coordinate() for node in nodes))
+            self._level = array("i", (node.get_level() for node in nodes))
+            self._targetable = bytearray(1 if node.is_visible_to_client() else 0 for node in nodes)
+            self._accessible = bytearray(1 if node.is_accessible() else 0 for node in nodes)
+            self._closed = bytearray(1 if node.is_closed_corridor() else 0 for node in nodes)
+
+            offsets = array("i", [0])
+            targets = array("i")
+            weights = array("d")
+            for neighbors in self._adjacency_list:
+                for target, weight in neighbors:
+                    targets.append(target)
+                    weights.append(weight)
+                offsets.append(len(targets))
+            self._offsets = offsets
+            self._targets = targets
+            self._weights = weights
+            self._compute_real_coordinates()
+            self._adjacency_list = None
+            self._nodes = None
+
+    #The packed arrays of a compacted graph by name, they are written into graph snapshots.
+    def get_compact_data(self) -> Dict[str, Any]:
+        self._ensure_compact()
+        return {name: getattr(self, "_" + name) for name in COMPACT_FIELDS}
+
+    #An estimate of the memory kept by the compacted graph in bytes: its arrays, the identifier lookup, the filtered
+    #arrays of the routing profiles and the cached shortest path trees and route lengths. Arrays mapped from a snapshot
+    #are counted too, they become part of the process's memory once they are read.
+    def memory_bytes(self) -> int:
+        self._ensure_compact()
+        counted = set()
+
+        def size(value) -> int:
+            if value is None or id(value) in counted:
+                return 0
+            counted.add(id(value))
+            if isinstance(value, (array, memoryview, bytes, bytearray)):
+                return memoryview(value).nbytes
+            if isinstance(value, (list, tuple)):
+                return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+            if isinstance(value, dict):
+                return sys.getsizeof(value) + sum(sys.getsizeof(key) for key in value)
+            return sys.getsizeof(value)
+
+        total = sum(size(getattr(self, "_" + name)) for name in COMPACT_FIELDS) + size(self._name_to_index)
+        for profile in self._profiles.values():
+            total += (size(profile.offsets) + size(profile.targets) + size(profile.weights) + size(profile.usable) +
+                      size(profile.components))
+        total += self.tree_cache.stats()["size_bytes"]
+        total += len(self.distance_cache) * 2 * sys.getsizeof(0.0)
+        return total
+
+    #Fills an empty graph with packed arrays (for example memory mapped arrays of a snapshot) instead of nodes.
+    #The identifiers and aliases are sequences indexed by node, the other fields are arrays or memoryviews.
+    #Optionally the identifier lookup mapping, prebuilt routing profiles, landmark tables and the search index can be
+    #given too.
+    def set_compact_data(self, data: Dict[str, Any]):
+        with self._compact_lock:
+            for name in COMPACT_FIELDS:
+                setattr(self, "_" + name, data[name])
+            name_to_index = data.get("name_to_index")
+            if name_to_index is None:
+                name_to_index = {identifier: index for index, identifier in enumerate(self._identifiers)}
+            self._name_to_index = name_to_index
+            self._profiles = dict(data.get("profiles", {}))
+            self._landmarks = dict(data.get("landmarks", {}))
+            self._search_index = data.get("search_index")
+            self._consistent_heuristic = None
+            self.tree_cache.clear()
+            self.distance_cache.clear()
+            self._adjacency_list = None
+            self._nodes = None
+
+    def _ensure_compact(self):
+        if self._nodes is not None:
+            self.compact()
+
+    #Turns a compacted graph back into node objects and adjacency lists, so it can be extended again.
+    def _ensure_mutable(self):
+        if self._nodes is not None:
+            return
+        with self._compact_lock:
+            if self._nodes is not None:
+                return
+            offsets, targets, weights = self._offsets, self._targets, self._weights
+            self._adjacency_list = [
+                [(targets[k], weights[k]) for k in range(offsets[index], offsets[index + 1])]
+                for index in range(len(self._identifiers))
+            ]
+            self._nodes = [self._materialize_node(index) for index in range(len(self._identifiers))]
+            self._profiles = {}
+            self._landmarks = {}
+            self._hierarchies = {}
+            self.tree_cache.clear()
+            self.distance_cache.clear()
+            self._search_index = None
+            self._consistent_heuristic = None
+
+    def _materialize_node(self, index: int) -> Node:
+        if self._targetable[index]:
+            return Targetable(self._x[index], self._y[index], self._identifiers[index], bool(self._closed[index]),
+                              bool(self._accessible[index]), self._level[index], *self._aliases[index])
+        return NotTargetable(self._x[index], self._y[index], self._identifiers[index], bool(self._closed[index]),
+                             bool(self._accessible[index]), self._level[index])
+
+    def _compute_real_coordinates(self):
+        real_x = array("d")
+        real_y = array("d")
+        for x_coordinate, y_coordinate, level in zip(self._x, self._y, self._level):
+            level_data = self.levels.get(level)
+            if level_data:
+                global_origin_x = level_data.get("x", 0)
+                global_origin_y = level_data.get("y", 0)
+                scale = level_data.get("pixel_to_cm", 1.0)
+            else:
+                global_origin_x = 0
+                global_origin_y = 0
+                scale = 1.0
+            real_x.append((x_coordinate - global_origin_x) * scale)
+            real_y.append((y_coordinate - global_origin_y) * scale)
+        self._real_x = real_x
+        self._real_y = real_y
+
+    #The closed edges as (smaller, larger) node index pairs, only routes that may use closed corridors go through them.
+    def get_closed_edges(self) -> FrozenSet[Tuple[int, int]]:
+        return self._closed_edges
+
+    #The identifiers of the closed nodes and the identifier pairs of the closed edges.
+    def get_closures(self) -> Dict[str, List[Any]]:
+        self._ensure_compact()
+        identifiers = self._identifiers
+        return {
+            "closed_nodes": [identifiers[index] for index, closed in enumerate(self._closed) if closed],
+            "closed_edges": [[identifiers[first], identifiers[second]] for first, second in sorted(self._closed_edges)],
+        }
+
+    #Gives back a copy of the compacted graph with the given nodes and edges (pairs of identifiers) closed or reopened,
+    #for example during cleaning. A closed node is a closed corridor, a closed edge is only used by the routes that may
+    #use closed corridors, so only the routing profiles that avoid closed corridors change and only they are built
+    #again. The copy shares every array that doesn't change and takes over what stays valid from the caches: closing
+    #only makes routes longer, so the landmark tables stay lower bounds and only the shortest path trees reaching a
+    #newly closed node or edge are dropped. A reopening drops the trees, landmark tables and route lengths of the
+    #changed profiles. The graph itself doesn't change, its readers keep a consistent view until the copy replaces it.
+    #KeyError if a node or edge doesn't exist.
+    def with_closures(self, close_nodes: Iterable[str] = (), reopen_nodes: Iterable[str] = (),
+                      close_edges: Iterable[Tuple[str, str]] = (),
+                      reopen_edges: Iterable[Tuple[str, str]] = ()) -> "Graph":
+        self._ensure_compact()
+        close_indexes = [self.get_index(identifier) for identifier in close_nodes]
+        reopen_indexes = [self.get_index(identifier) for identifier in reopen_nodes]
+        close_pairs = {self._edge_key(first, second) for first, second in close_edges}
+        reopen_pairs = {self._edge_key(first, second) for first, second in reopen_edges}
+
+        closed = bytearray(self._closed)
+        for index in close_indexes:
+            closed[index] = 1
+        for index in reopen_indexes:
+            closed[index] = 0
+        data: Dict[str, Any] = {name: getattr(self, "_" + name) for name in COMPACT_FIELDS}
+        data["closed"] = closed
+        graph = Graph()
+        graph.floor_height_cm = self.floor_height_cm
+        graph.levels = self.levels
+        graph.set_compact_data(data)
+        graph._name_to_index = self._name_to_index
+        graph._search_index = self._search_index
+        graph._closed_edges = (self._closed_edges | close_pairs) - reopen_pairs
+        graph._consistent_heuristic = self._consistent_heuristic
+        if hasattr(self, "snapshot_mapping"):
+            graph.snapshot_mapping = self.snapshot_mapping
+        graph.source_file = self.source_file
+
+        closed_nodes, closed_edges, reopened = self.closure_changes(graph)
+        graph._profiles = {key: profile for key, profile in self._profiles.items() if key[1]}
+        graph._landmarks = {key: table for key, table in self._landmarks.items() if key[1] or not reopened}
+        graph._hierarchies = {key: hierarchy for key, hierarchy in self._hierarchies.items() if key[1]}
+        for accessible in (False, True):
+            graph.get_profile(accessible, False)
+
+        def stale_tree(key, tree):
+            if key[2]:
+                return False
+            distances, previous = tree
+            return reopened or any(not math.isinf(distances[index]) for index in closed_nodes) or any(
+                previous[second] == first or previous[first] == second for first, second in closed_edges)
+
+        graph.tree_cache = self.tree_cache.copy(stale_tree)
+        graph.distance_cache = self.distance_cache.copy(lambda key: not key[2])
+        return graph
+
+    #Compares the closures of the graph with those of its copy from with_closures, gives back the node indexes and the
+    #edges that are closed only in the copy, and true if anything closed in this graph is open in the copy.
+    def closure_changes(self, other: "Graph") -> Tuple[List[int], List[Tuple[int, int]], bool]:
+        closed_nodes = [index for index, (before, after) in enumerate(zip(self._closed, other._closed))
+                        if after and not before]
+        reopened = (any(before and not after for before, after in zip(self._closed, other._closed)) or
+                    not self._closed_edges <= other._closed_edges)
+        return closed_nodes, sorted(other._closed_edges - self._closed_edges), reopened
+
+    #The runtime closures that turn the base graph (the same building without them) into this one:
+    #{"close_nodes", "reopen_nodes", "close_edges", "reopen_edges"}, the edges as identifier pairs in sorted order.
+    def closure_delta(self, base: "Graph") -> Dict[str, List[Any]]:
+        return Graph.closures_difference(base.get_closures(), self.get_closures())
+
+    #The closure delta that turns the closures before into the closures after, both in the format of get_closures.
+    @staticmethod
+    def closures_difference(before: Dict[str, List[Any]], after: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        nodes_before, nodes_after = set(before["closed_nodes"]), set(after["closed_nodes"])
+        edges_before = {tuple(sorted(edge)) for edge in before["closed_edges"]}
+        edges_after = {tuple(sorted(edge)) for edge in after["closed_edges"]}
+        return {
+            "close_nodes": sorted(nodes_after - nodes_before),
+            "reopen_nodes": sorted(nodes_before - nodes_after),
+            "close_edges": [list(edge) for edge in sorted(edges_after - edges_before)],
+            "reopen_edges": [list(edge) for edge in sorted(edges_before - edges_after)],
+        }
+
+    #Makes the closures of a closure_delta on this graph, skipping the nodes and edges that don't exist in it. Gives
+    #back the graph itself if nothing changes.
+    def with_closure_delta(self, delta: Dict[str, List[Any]]) -> "Graph":
+        closures = self.get_closures()
+        closed_nodes = set(closures["closed_nodes"])
+        closed_edges = {tuple(sorted(edge)) for edge in closures["closed_edges"]}
+        close_nodes = [node for node in delta.get("close_nodes", ())
+                       if node not in closed_nodes and self.has_node(node)]
+        reopen_nodes = [node for node in delta.get("reopen_nodes", ()) if node in closed_nodes]
+        close_edges = [tuple(edge) for edge in delta.get("close_edges", ())
+                       if tuple(sorted(edge)) not in closed_edges and self.has_edge(*edge)]
+        reopen_edges = [tuple(edge) for edge in delta.get("reopen_edges", ()) if tuple(sorted(edge)) in closed_edges]
+        if not (close_nodes or reopen_nodes or close_edges or reopen_edges):
+            return self
+        return self.with_closures(close_nodes, reopen_nodes, close_edges, reopen_edges)
+
+    #Gives back a copy with exactly the closures given in the format of get_closures, the graph itself if it has them.
+    def with_closure_state(self, closures: Dict[str, List[Any]]) -> "Graph":
+        return self.with_closure_delta(Graph.closures_difference(self.get_closures(), closures))
+
+    #True if the node exists.
+    def has_node(self, identifier: str) -> bool:
+        return identifier in self.get_id_to_index()
+
+    #True if the two nodes exist and are connected by an edge.
+    def has_edge(self, first_id: str, second_id: str) -> bool:
+        try:
+            self._edge_key(first_id, second_id)
+        except KeyError:
+            return False
+        return True
+
+    #The (smaller, larger) index pair of the edge between the two nodes, KeyError if there is no such edge.
+    def _edge_key(self, first_id: str, second_id: str) -> Tuple[int, int]:
+        first, second = self.get_index(first_id), self.get_index(second_id)
+        if second not in self._targets[self._offsets[first]:self._offsets[first + 1]]:
+            raise KeyError(f"No edge between {first_id} and {second_id}")
+        return min(first, second), max(first, second)
+
+    #Gives back the filtered view of the graph for the given settings, it is built on first use and kept afterwards.
+    def get_profile(self, accessible: bool, use_closed_corridors: bool) -> RoutingProfile:
+        key = (bool(accessible), bool(use_closed_corridors))
+        profile = self._profiles.get(key)
+        if profile is not None:
+            return profile
+        self._ensure_compact()
+        with self._compact_lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = RoutingProfile(self, *key)
+                self._profiles[key] = profile
+        return profile
+
+    #Gives back true if the goal can be reached from the source with the given settings, without searching.
+    def can_reach(self, source_index: int, goal_index: int, accessible: bool, use_closed_corridors: bool) -> bool:
+        return self.get_profile(accessible, use_closed_corridors).can_reach(source_index, goal_index)
+
+    #Gives back the landmark distance table of the profile for the ALT heuristic. Graph snapshots contain the tables,
+    #for graphs loaded from JSON it is built on first use and kept afterwards.
+    def get_landmarks(self, accessible: bool, use_closed_corridors: bool) -> LandmarkTable:
+        key = (bool(accessible), bool(use_closed_corridors))
+        landmarks = self._landmarks.get(key)
+        if landmarks is not None:
+            return landmarks
+        self.get_profile(*key)
+        landmarks = LandmarkTable.build(self, *key)
+        with self._compact_lock:
+            return self._landmarks.setdefault(key, landmarks)
+
+    #Attaches prebuilt contraction hierarchies (see ContractionHierarchy.HierarchyFile) by routing profile key.
+    def set_hierarchies(self, hierarchies: Dict[Tuple[bool, bool], Any]):
+        self._ensure_compact()
+        self._hierarchies = dict(hierarchies)
+
+    #Gives back the contraction hierarchy of the profile, or None if it wasn't built for this graph.
+    def get_hierarchy(self, accessible: bool, use_closed_corridors: bool):
+        return self._hierarchies.get((bool(accessible), bool(use_closed_corridors)))
+
+    #Gives back the trigram index of the targetable nodes, it is built on the first search and kept afterwards. Graph
+    #snapshots contain the index.
+    def get_search_index(self) -> SearchIndex:
+        search_index = self._search_index
+        if search_index is not None:
+            return search_index
+        self._ensure_compact()
+        with self._compact_lock:
+            if self._search_index is None:
+                self._search_index = SearchIndex(self._identifiers, self._aliases, self._targetable)
+            return self._search_index
+
     #Gives back true if the Node can be used as a part of a route.
     def is_usable_index(self, index: int, accessibility: bool, use_closed_corridors: bool) -> bool:
-        node = self._nodes[index]
+        self._ensure_compact()
         return (
-                (not accessibility or node.is_accessible()) and
-                (use_closed_corridors or not node.is_closed_corridor())
+                (not accessibility or bool(self._accessible[index])) and
+                (use_closed_corridors or not self._closed[index])
         )
 
-    #Calculates the shortest path in a graph between two points
-    def dijkstra(self, source_id: str, goal_id: str, accessible=True, use_closed_corridors=False):
+    #Calculates the shortest path in a graph between two points. Sources that are requested often get a complete
+    #shortest path tree in the tree cache, their routes are read from the tree without searching. Like the other
+    #searches it fills the optional SearchStats collector.
+    def dijkstra(self, source_id: str, goal_id: str, accessible=True, use_closed_corridors=False,
+                 stats: Optional[SearchStats] = None):
         source_index = self.get_index(source_id)
         goal_index = self.get_index(goal_id)
-        node_quantity = len(self._nodes)
+        key = (source_index, bool(accessible), bool(use_closed_corridors))
+        tree = self.tree_cache.get(key)
+        if tree is None and self.tree_cache.wants(key, len(self._identifiers)):
+            distances, previous_list = self._shortest_path_tree(source_index, accessible, use_closed_corridors, stats)
+            self.tree_cache.put(key, distances, previous_list)
+            return self._reconstruct_path(previous_list, source_index, goal_index, stats)
+        if tree is not None:
+            if stats is not None:
+                stats.answered_by = "tree_cache"
+            previous = tree[1]
+            if previous[goal_index] < 0 and source_index != goal_index:
+                return []
+            path_index = [goal_index]
+            while path_index[-1] != source_index:
+                path_index.append(previous[path_index[-1]])
+            path_index.reverse()
+            return self._path_nodes(path_index, stats)
+        previous_list, _ = self._dijkstra_search(source_index, goal_index, accessible, use_closed_corridors, stats)
+        return self._reconstruct_path(previous_list, source_index, goal_index, stats)
+
+    #Calculates the shortest paths from one source to many goals with a single Dijkstra search that stops when every
+    #reachable goal is settled, gives back the node lists by goal identifier.
+    def dijkstra_many(self, source_id: str, goal_ids: List[str], accessible=True, use_closed_corridors=False):
+        source_index = self.get_index(source_id)
+        goal_indexes = {goal_id: self.get_index(goal_id) for goal_id in goal_ids}
+        reachable = {goal_index for goal_index in goal_indexes.values()
+                     if self.can_reach(source_index, goal_index, accessible, use_closed_corridors)}
+        previous_list, _ = self._dijkstra_search_many(source_index, reachable, accessible, use_closed_corridors)
+        return {
+            goal_id: self._reconstruct_path(previous_list, source_index, goal_index) if goal_index in reachable else []
+            for goal_id, goal_index in goal_indexes.items()
+        }
+
+    #Gives back the route lengths from the source to the goals by goal index (math.inf for an unreachable goal). The
+    #lengths that aren't in the distance cache yet are found by one Dijkstra search that stops when every reachable
+    #missing goal is settled.
+    def route_lengths(self, source_index: int, goal_indexes, accessible=True,
+                      use_closed_corridors=False) -> Dict[int, float]:
+        key = (source_index, bool(accessible), bool(use_closed_corridors))
+        lengths, missing = self.distance_cache.get(key, goal_indexes)
+        if missing:
+            reachable = {goal_index for goal_index in missing
+                         if self.can_reach(source_index, goal_index, accessible, use_closed_corridors)}
+            found, _, _ = self._nearest_search(source_index, reachable, len(reachable), accessible,
+                                               use_closed_corridors)
+            computed = dict.fromkeys(missing, math.inf)
+            computed.update(found)
+            self.distance_cache.put(key, computed)
+            lengths.update(computed)
+        return lengths
+
+    #Finds the k nearest targetables whose identifier or alias contains the text with a single Dijkstra search that
+    #stops when the k-th matching node is settled. Gives back (node, route length, path) triples, the nearest first.
+    def nearest_targetables(self, source_id: str, search_text: str, k: int = 1, accessible=True,
+                            use_closed_corridors=False) -> List[Tuple[Node, float, List[Node]]]:
+        source_index = self.get_index(source_id)
+        candidates = {index for index in self.get_search_index().search(search_text, limit=None)
+                      if self.can_reach(source_index, index, accessible, use_closed_corridors)}
+        nearest, previous_list, _ = self._nearest_search(source_index, candidates, k, accessible, use_closed_corridors)
+        return [(self.get_node(index), distance, self._reconstruct_path(previous_list, source_index, index))
+                for index, distance in nearest]
+
+    #Runs Dijkstra until k of the candidates are settled, gives back the settled candidates with their distances in
+    #settling order, the predecessor list and the number of settled nodes.
+    def _nearest_search(self, source_index: int, candidates, k: int, accessible: bool, use_closed_corridors: bool):
+        profile = self.get_profile(accessible, use_closed_corridors)
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        heappop, heappush = heapq.heappop, heapq.heappush
+        node_quantity = len(self._identifiers)
         distance = [math.inf]*node_quantity
         previous_list: List[Optional[int]] = [None]*node_quantity
         distance[source_index] = 0
         heap = [(0, source_index)]
-        visited = [False]*node_quantity
+        nearest: List[Tuple[int, float]] = []
+        wanted = min(k, len(candidates))
+        settled = 0
+
+        while heap and len(nearest) < wanted:
+            popped_distance, popped_node_index = heappop(heap)
+            if popped_distance > distance[popped_node_index]:
+                continue
+            settled += 1
+            if popped_node_index in candidates:
+                nearest.append((popped_node_index, popped_distance))
+            for edge in range(offsets[popped_node_index], offsets[popped_node_index + 1]):
+                adjacent_node_index = targets[edge]
+                new_distance = popped_distance + weights[edge]
+                if new_distance < distance[adjacent_node_index] and usable[adjacent_node_index]:
+                    distance[adjacent_node_index] = new_distance
+                    previous_list[adjacent_node_index] = popped_node_index
+                    heappush(heap, (new_distance, adjacent_node_index))
+        return nearest, previous_list, settled
+
+    #Yields the targetables within max_distance of the source (without the source itself) as (node, route length)
+    #pairs, the nearest first.
+    def targetables_within(self, source_id: str, max_distance: float, accessible=True,
+                           use_closed_corridors=False) -> Iterator[Tuple[Node, float]]:
+        source_index = self.get_index(source_id)
+        targetable = self._targetable
+        for index, distance in self._bounded_search(source_index, max_distance, accessible, use_closed_corridors):
+            if targetable[index] and index != source_index:
+                yield self.get_node(index), distance
+
+    #Runs Dijkstra from the source and yields every node as (node index, distance) when it is settled, the search
+    #stops at the first node past max_distance. Only the reached nodes are kept in dictionaries, so a small radius
+    #costs little in a large graph.
+    def _bounded_search(self, source_index: int, max_distance: float, accessible: bool,
+                        use_closed_corridors: bool) -> Iterator[Tuple[int, float]]:
+        profile = self.get_profile(accessible, use_closed_corridors)
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        heappop, heappush = heapq.heappop, heapq.heappush
+        distance = {source_index: 0.0}
+        heap = [(0.0, source_index)]
 
         while heap:
-            popped_distance, popped_node_index = heapq.heappop(heap)
-            if visited[popped_node_index]:
+            popped_distance, popped_node_index = heappop(heap)
+            if popped_distance > max_distance:
+                return
+            if popped_distance > distance[popped_node_index]:
                 continue
-            visited[popped_node_index] = True
+            yield popped_node_index, popped_distance
+            for edge in range(offsets[popped_node_index], offsets[popped_node_index + 1]):
+                adjacent_node_index = targets[edge]
+                new_distance = popped_distance + weights[edge]
+                if (new_distance <= max_distance and new_distance < distance.get(adjacent_node_index, math.inf) and
+                        usable[adjacent_node_index]):
+                    distance[adjacent_node_index] = new_distance
+                    heappush(heap, (new_distance, adjacent_node_index))
+
+    #The sources that have a cached shortest path tree, with their identifiers, request counts and hit rates.
+    def tree_cache_stats(self) -> Dict[str, Any]:
+        stats = self.tree_cache.stats()
+        for source in stats["sources"]:
+            source["source"] = self._identifiers[source["source_index"]]
+        return stats
+
+    #Runs Dijkstra on the filtered arrays of the profile, gives back the predecessor list and the number of settled nodes.
+    def _dijkstra_search(self, source_index: int, goal_index: int, accessible: bool, use_closed_corridors: bool,
+                         stats: Optional[SearchStats] = None):
+        profile = self.get_profile(accessible, use_closed_corridors)
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        heappop, heappush = SearchStats.heap_functions(stats)
+        node_quantity = len(self._identifiers)
+        distance = [math.inf]*node_quantity
+        previous_list: List[Optional[int]] = [None]*node_quantity
+        distance[source_index] = 0
+        heap = [(0, source_index)]
+        settled = 0
+
+        while heap:
+            popped_distance, popped_node_index = heappop(heap)
+            if popped_distance > distance[popped_node_index]:
+                continue
+            settled += 1
             if popped_node_index == goal_index:
                 break
-            for adjacent_node_index, adjacent_weight in self._adjacency_list[popped_node_index]:
-                if not self.is_usable_index(adjacent_node_index, accessible, use_closed_corridors):
-                    continue
-                new_distance = popped_distance + adjacent_weight
-                if new_distance < distance[adjacent_node_index]:
+            for edge in range(offsets[popped_node_index], offsets[popped_node_index + 1]):
+                adjacent_node_index = targets[edge]
+                new_distance = popped_distance + weights[edge]
+                if new_distance < distance[adjacent_node_index] and usable[adjacent_node_index]:
                     distance[adjacent_node_index] = new_distance
                     previous_list[adjacent_node_index] = popped_node_index
-                    heapq.heappush(heap, (new_distance, adjacent_node_index))
-        return self._reconstruct_path(previous_list, source_index, goal_index)
+                    heappush(heap, (new_distance, adjacent_node_index))
+        if stats is not None:
+            stats.settled += settled
+        return previous_list, settled
+
+    #Runs Dijkstra until every goal is settled, gives back the predecessor list and the number of settled nodes.
+    def _dijkstra_search_many(self, source_index: int, goal_indexes, accessible: bool, use_closed_corridors: bool):
+        profile = self.get_profile(accessible, use_closed_corridors)
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        heappop, heappush = heapq.heappop, heapq.heappush
+        node_quantity = len(self._identifiers)
+        distance = [math.inf]*node_quantity
+        previous_list: List[Optional[int]] = [None]*node_quantity
+        distance[source_index] = 0
+        heap = [(0, source_index)]
+        remaining = set(goal_indexes)
+        settled = 0
+
+        while heap and remaining:
+            popped_distance, popped_node_index = heappop(heap)
+            if popped_distance > distance[popped_node_index]:
+                continue
+            settled += 1
+            remaining.discard(popped_node_index)
+            for edge in range(offsets[popped_node_index], offsets[popped_node_index + 1]):
+                adjacent_node_index = targets[edge]
+                new_distance = popped_distance + weights[edge]
+                if new_distance < distance[adjacent_node_index] and usable[adjacent_node_index]:
+                    distance[adjacent_node_index] = new_distance
+                    previous_list[adjacent_node_index] = popped_node_index
+                    heappush(heap, (new_distance, adjacent_node_index))
+        return previous_list, settled
+
+    #Runs Dijkstra from the source until every reachable node is settled, gives back the distance and the predecessor
+    #list of all nodes.
+    def _shortest_path_tree(self, source_index: int, accessible: bool, use_closed_corridors: bool,
+                            stats: Optional[SearchStats] = None):
+        profile = self.get_profile(accessible, use_closed_corridors)
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        heappop, heappush = SearchStats.heap_functions(stats)
+        node_quantity = len(self._identifiers)
+        distance = [math.inf]*node_quantity
+        previous_list: List[Optional[int]] = [None]*node_quantity
+        distance[source_index] = 0.0
+        heap = [(0.0, source_index)]
+
+        while heap:
+            popped_distance, popped_node_index = heappop(heap)
+            if popped_distance > distance[popped_node_index]:
+                continue
+            for edge in range(offsets[popped_node_index], offsets[popped_node_index + 1]):
+                adjacent_node_index = targets[edge]
+                new_distance = popped_distance + weights[edge]
+                if new_distance < distance[adjacent_node_index] and usable[adjacent_node_index]:
+                    distance[adjacent_node_index] = new_distance
+                    previous_list[adjacent_node_index] = popped_node_index
+                    heappush(heap, (new_distance, adjacent_node_index))
+        if stats is not None:
+            stats.settled += sum(1 for node_distance in distance if node_distance != math.inf)
+        return distance, previous_list
+
+    #Finds up to k different routes from the source to the goal with the penalty method: after every route the weights
+    #of its edges are multiplied by penalty and the next route is searched on the penalized weights. The searches are
+    #A* with the exact distances to the goal as heuristic, taken from one shortest path tree of the goal. Penalties only
+    #make edges longer, so the tree stays a lower bound, and the first search walks straight along the shortest route.
+    #A route is kept if it's at most max_stretch times as long as the shortest one and at most max_overlap of its
+    #length is shared with any kept route. Gives back the node lists of the kept routes, the shortest first.
+    def alternative_routes(self, source_id: str, goal_id: str, k: int = 3, accessible=True,
+                           use_closed_corridors=False, penalty: float = 1.5, max_overlap: float = 0.7,
+                           max_stretch: float = 1.5) -> List[List[Node]]:
+        source_index = self.get_index(source_id)
+        goal_index = self.get_index(goal_id)
+        if source_index == goal_index:
+            return [[self.get_node(source_index)]]
+        if not self.can_reach(source_index, goal_index, accessible, use_closed_corridors):
+            return []
+        profile = self.get_profile(accessible, use_closed_corridors)
+        offsets, targets, weights = profile.offsets, profile.targets, profile.weights
+        to_goal, _ = self._shortest_path_tree(goal_index, accessible, use_closed_corridors)
+        penalties: Dict[int, float] = {}
+        kept: List[Tuple[List[int], float, Dict[Tuple[int, int], float]]] = []
+
+        for _ in range(3 * k):
+            route = self._penalized_search(source_index, goal_index, profile, to_goal, penalties)
+            if route is None:
+                break
+            path_indexes, edges = route
+            shared_edges = {}
+            for edge, node_index in zip(edges, path_indexes):
+                shared_edges[min(node_index, targets[edge]), max(node_index, targets[edge])] = weights[edge]
+            length = sum(weights[edge] for edge in edges)
+            if not kept:
+                kept.append((path_indexes, length, shared_edges))
+            elif length <= max_stretch * kept[0][1] and all(
+                    sum(weight for pair, weight in shared_edges.items() if pair in other[2]) <= max_overlap * length
+                    for other in kept):
+                kept.append((path_indexes, length, shared_edges))
+            if len(kept) == k:
+                break
+            for edge, node_index in zip(edges, path_indexes):
+                penalties[edge] = penalties.get(edge, 1.0) * penalty
+                target = targets[edge]
+                for reverse_edge in range(offsets[target], offsets[target + 1]):
+                    if targets[reverse_edge] == node_index:
+                        penalties[reverse_edge] = penalties.get(reverse_edge, 1.0) * penalty
+
+        return [self._path_nodes(path_indexes) for path_indexes, _, _ in kept]
+
+    #Runs A* on the penalized weights of the profile with the distances to the goal as heuristic. Gives back the node
+    #indexes of the route and the edge positions it uses, or None if there is no route.
+    def _penalized_search(self, source_index: int, goal_index: int, profile: RoutingProfile, to_goal,
+                          penalties: Dict[int, float]):
+        offsets, targets, weights = profile.offsets, profile.targets, profile.weights
+        heappop, heappush = heapq.heappop, heapq.heappush
+        route_cost = {source_index: 0.0}
+        previous_edges: Dict[int, Tuple[int, int]] = {}
+        closed_nodes = set()
+        source_estimate = to_goal[source_index]
+        heap = [(0.0 if math.isinf(source_estimate) else source_estimate, source_index)]
+
+        while heap:
+            _, popped_index = heappop(heap)
+            if popped_index in closed_nodes:
+                continue
+            if popped_index == goal_index:
+                path_indexes = [goal_index]
+                edges = []
+                while path_indexes[-1] != source_index:
+                    previous_index, edge = previous_edges[path_indexes[-1]]
+                    path_indexes.append(previous_index)
+                    edges.append(edge)
+                path_indexes.reverse()
+                edges.reverse()
+                return path_indexes, edges
+            closed_nodes.add(popped_index)
+            popped_cost = route_cost[popped_index]
+            for edge in range(offsets[popped_index], offsets[popped_index + 1]):
+                node_index = targets[edge]
+                estimate = to_goal[node_index]
+                if math.isinf(estimate):
+                    continue
+                new_cost = popped_cost + weights[edge] * penalties.get(edge, 1.0)
+                if new_cost < route_cost.get(node_index, math.inf):
+                    route_cost[node_index] = new_cost
+                    previous_edges[node_index] = (popped_index, edge)
+                    heappush(heap, (new_cost + estimate, node_index))
+        return None
 
     #Recalculates a Node coordinates, so during a route finding process the nodes in different levels can be compared.
     def node_real_coords_cm(self, node_index: int) -> Tuple[float, float]:
-        node = self._nodes[node_index]
-        level_number = int(node.get_level())
-        level_data = self.levels.get(level_number)
-        if level_data:
-            global_origin_x = level_data.get("x", 0)
-            global_origin_y = level_data.get("y", 0)
-            scale = level_data.get("pixel_to_cm", 1.0)
-        else:
-            global_origin_x = 0
-            global_origin_y = 0
-            scale = 1.0
-        real_x_coordinate = node.get_x_coordinate() - global_origin_x
-        real_y_coordinate = node.get_y_coordinate() - global_origin_y
-        return real_x_coordinate * scale, real_y_coordinate * scale
+        self._ensure_compact()
+        return self._real_x[node_index], self._real_y[node_index]
 
     #Caluclates the estimated distnace between two Node
     def heuristic(self, node_a_index: int, node_b_index: int) -> float:
-        node_a_real_x, node_a_real_y = self.node_real_coords_cm(node_a_index)
-        node_b_real_x, node_b_real_y = self.node_real_coords_cm(node_b_index)
-        z_axis_difference = self.floor_height_cm * abs(self._nodes[node_a_index].get_level() - self._nodes[node_b_index].get_level())
-        return math.hypot(node_a_real_x - node_b_real_x, node_a_real_y - node_b_real_y, z_axis_difference)
+        self._ensure_compact()
+        z_axis_difference = self.floor_height_cm * abs(self._level[node_a_index] - self._level[node_b_index])
+        return math.hypot(self._real_x[node_a_index] - self._real_x[node_b_index],
+                          self._real_y[node_a_index] - self._real_y[node_b_index], z_axis_difference)
 
     # Calculates a short path between two nodes if the heuristic is good.
     # If the graph contains many more edges than nodes, this algorithm may be faster,
     # but the resulting path will not necessarily be the shortest.
-    def astar(self, source_name: str, goal_name: str, accessible=True, use_closed_corridors=False):
+    def astar(self, source_name: str, goal_name: str, accessible=True, use_closed_corridors=False,
+              stats: Optional[SearchStats] = None):
         source_index = self._name_to_index[source_name]
         goal_index = self._name_to_index[goal_name]
-        node_quantity = len(self._nodes)
+        previous_indexes, _ = self._astar_search(source_index, goal_index, accessible, use_closed_corridors, stats)
+        return self._reconstruct_path(previous_indexes, source_index, goal_index, stats)
+
+    #Runs A* on the filtered arrays of the profile with the heuristic inlined, gives back the predecessor list and the
+    #number of settled nodes.
+    def _astar_search(self, source_index: int, goal_index: int, accessible: bool, use_closed_corridors: bool,
+                      stats: Optional[SearchStats] = None):
+        profile = self.get_profile(accessible, use_closed_corridors)
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        real_x, real_y, levels = self._real_x, self._real_y, self._level
+        goal_x, goal_y, goal_level = real_x[goal_index], real_y[goal_index], levels[goal_index]
+        floor_height_cm = self.floor_height_cm
+        hypot = math.hypot
+        heappop, heappush = SearchStats.heap_functions(stats)
+        node_quantity = len(self._identifiers)
         route_cost = [math.inf] * node_quantity
-        total_estimated_cost = [math.inf] * node_quantity
         previous_indexes: List[Optional[int]] = [None] * node_quantity
         route_cost[source_index] = 0.0
-        total_estimated_cost[source_index] = self.heuristic(source_index, goal_index)
-        heap = [(total_estimated_cost[source_index], source_index)]
-        closed_nodes = [False] * node_quantity
+        heap = [(self.heuristic(source_index, goal_index), source_index)]
+        closed_nodes = bytearray(node_quantity)
+        settled = 0
 
         while heap:
-            _, popped_index = heapq.heappop(heap)
+            _, popped_index = heappop(heap)
             if closed_nodes[popped_index]:
                 continue
+            settled += 1
             if popped_index == goal_index:
                 break
-            closed_nodes[popped_index] = True
-            for node_index, weight in self._adjacency_list[popped_index]:
-                if not self.is_usable_index(node_index, accessible, use_closed_corridors):
-                    continue
+            closed_nodes[popped_index] = 1
+            popped_cost = route_cost[popped_index]
+            for edge in range(offsets[popped_index], offsets[popped_index + 1]):
+                node_index = targets[edge]
+                new_cost = popped_cost + weights[edge]
+                if new_cost < route_cost[node_index] and usable[node_index]:
+                    previous_indexes[node_index] = popped_index
+                    route_cost[node_index] = new_cost
+                    estimate = hypot(real_x[node_index] - goal_x, real_y[node_index] - goal_y,
+                                     floor_height_cm * abs(levels[node_index] - goal_level))
+                    heappush(heap, (new_cost + estimate, node_index))
+        if stats is not None:
+            stats.settled += settled
+        return previous_indexes, settled
 
-                new_cost = route_cost[popped_index] + weight
-                if new_cost < route_cost[node_index]:
+    #Calculates the shortest path with A* and the landmark (ALT) heuristic, the result is always the shortest path
+    def alt(self, source_id: str, goal_id: str, accessible=True, use_closed_corridors=False,
+            stats: Optional[SearchStats] = None):
+        source_index = self.get_index(source_id)
+        goal_index = self.get_index(goal_id)
+        previous_indexes, _ = self._alt_search(source_index, goal_index, accessible, use_closed_corridors, stats)
+        return self._reconstruct_path(previous_indexes, source_index, goal_index, stats)
+
+    #Runs A* with the landmark lower bounds of the profile, a node's bound is calculated when it's first reached. Gives
+    #back the predecessor list and the number of settled nodes.
+    def _alt_search(self, source_index: int, goal_index: int, accessible: bool, use_closed_corridors: bool,
+                    stats: Optional[SearchStats] = None):
+        profile = self.get_profile(accessible, use_closed_corridors)
+        landmarks = self.get_landmarks(accessible, use_closed_corridors)
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        table, landmark_count = landmarks.distances, len(landmarks.landmarks)
+        goal_bounds = landmarks.goal_bounds(goal_index)
+        heappop, heappush = SearchStats.heap_functions(stats)
+        node_quantity = len(self._identifiers)
+        route_cost = [math.inf] * node_quantity
+        estimates: List[Optional[float]] = [None] * node_quantity
+        previous_indexes: List[Optional[int]] = [None] * node_quantity
+        route_cost[source_index] = 0.0
+        heap = [(0.0, source_index)]
+        closed_nodes = bytearray(node_quantity)
+        settled = 0
+
+        while heap:
+            _, popped_index = heappop(heap)
+            if closed_nodes[popped_index]:
+                continue
+            settled += 1
+            if popped_index == goal_index:
+                break
+            closed_nodes[popped_index] = 1
+            popped_cost = route_cost[popped_index]
+            for edge in range(offsets[popped_index], offsets[popped_index + 1]):
+                node_index = targets[edge]
+                new_cost = popped_cost + weights[edge]
+                if new_cost < route_cost[node_index] and usable[node_index]:
                     previous_indexes[node_index] = popped_index
                     route_cost[node_index] = new_cost
-                    total_estimated_cost[node_index] = new_cost + self.heuristic(node_index, goal_index)
-                    heapq.heappush(heap, (total_estimated_cost[node_index], node_index))
-        return self._reconstruct_path(previous_indexes, source_index, goal_index)
+                    estimate = estimates[node_index]
+                    if estimate is None:
+                        row = node_index * landmark_count
+                        estimate = 0.0
+                        for position, goal_distance in goal_bounds:
+                            bound = table[row + position] - goal_distance
+                            if bound < 0:
+                                bound = -bound
+                            if bound > estimate:
+                                estimate = bound
+                        estimates[node_index] = estimate
+                    if estimate != math.inf:
+                        heappush(heap, (new_cost + estimate, node_index))
+        if stats is not None:
+            stats.settled += settled
+        return previous_indexes, settled
+
+    #Calculates the shortest path with the contraction hierarchy of the profile, or with dijkstra if there is none
+    def ch(self, source_id: str, goal_id: str, accessible=True, use_closed_corridors=False,
+           stats: Optional[SearchStats] = None):
+        hierarchy = self.get_hierarchy(accessible, use_closed_corridors)
+        if hierarchy is None:
+            return self.dijkstra(source_id, goal_id, accessible, use_closed_corridors, stats)
+        path_indexes, _ = hierarchy.search(self, self.get_index(source_id), self.get_index(goal_id), accessible,
+                                           use_closed_corridors, stats)
+        return self._path_nodes(path_indexes, stats)
+
+    #Calculates the shortest path with a Dijkstra search from both ends that meet in the middle
+    def bidijkstra(self, source_id: str, goal_id: str, accessible=True, use_closed_corridors=False,
+                   stats: Optional[SearchStats] = None):
+        source_index = self.get_index(source_id)
+        goal_index = self.get_index(goal_id)
+        path_indexes, _ = self._bidirectional_search(source_index, goal_index, accessible, use_closed_corridors,
+                                                     stats=stats)
+        return self._path_nodes(path_indexes, stats)
+
+    #Calculates the shortest path with an A* search from both ends. Unlike astar the result is always the shortest path,
+    #because it uses a heuristic that never overestimates an edge.
+    def biastar(self, source_id: str, goal_id: str, accessible=True, use_closed_corridors=False,
+                stats: Optional[SearchStats] = None):
+        source_index = self.get_index(source_id)
+        goal_index = self.get_index(goal_id)
+        path_indexes, _ = self._bidirectional_search(source_index, goal_index, accessible, use_closed_corridors,
+                                                     self.get_consistent_heuristic(), stats)
+        return self._path_nodes(path_indexes, stats)
+
+    #Gives back the horizontal scale and the height of a floor for a heuristic that never overestimates any edge: the
+    #horizontal scale is the smallest edge length per horizontal distance, the floor height is the largest one that
+    #still fits under every edge between levels. The heuristic is a distance in space, so with these values it is
+    #consistent and the bidirectional A* stays optimal. The plain heuristic overestimates the stairs a lot, because their
+    #edges are much shorter than floor_height_cm.
+    def get_consistent_heuristic(self) -> Tuple[float, float]:
+        consistent_heuristic = self._consistent_heuristic
+        if consistent_heuristic is not None:
+            return consistent_heuristic
+        self._ensure_compact()
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        real_x, real_y, levels = self._real_x, self._real_y, self._level
+        edges = []
+        for index in range(len(offsets) - 1):
+            for edge in range(offsets[index], offsets[index + 1]):
+                target = targets[edge]
+                edges.append((weights[edge], math.hypot(real_x[index] - real_x[target], real_y[index] - real_y[target]),
+                              abs(levels[index] - levels[target])))
+        horizontal_scale = min((weight / horizontal for weight, horizontal, _ in edges if horizontal > 0),
+                               default=0.0)
+        floor_height_cm = min((math.sqrt(max(0.0, weight ** 2 - (horizontal_scale * horizontal) ** 2)) / level_difference
+                               for weight, horizontal, level_difference in edges if level_difference),
+                              default=float(self.floor_height_cm))
+        self._consistent_heuristic = consistent_heuristic = (horizontal_scale, floor_height_cm)
+        return consistent_heuristic
+
+    #Runs a forward search from the source and a backward search from the goal, always expanding the side with the
+    #smaller key. Without a heuristic it is a bidirectional Dijkstra, with the (horizontal scale, floor height) pair of
+    #get_consistent_heuristic it is a bidirectional A* with the average of the forward and backward heuristics as
+    #potential. The graph is undirected, so the backward search uses the same arrays of the routing profile. The search
+    #stops when the two smallest keys together reach the best meeting distance, then no shorter route can exist. Gives
+    #back the node indexes of the path and the number of settled nodes.
+    def _bidirectional_search(self, source_index: int, goal_index: int, accessible: bool, use_closed_corridors: bool,
+                              heuristic: Optional[Tuple[float, float]] = None, stats: Optional[SearchStats] = None):
+        if source_index == goal_index:
+            return [source_index], 1
+        profile = self.get_profile(accessible, use_closed_corridors)
+        if not profile.usable[goal_index]:
+            return [], 0
+        offsets, targets, weights, usable = profile.offsets, profile.targets, profile.weights, profile.usable
+        heappop, heappush = SearchStats.heap_functions(stats)
+        node_quantity = len(self._identifiers)
+        if heuristic is not None:
+            horizontal_scale, floor_height_cm = heuristic
+            real_x, real_y, levels = self._real_x, self._real_y, self._level
+            source_x, source_y, source_level = real_x[source_index], real_y[source_index], levels[source_index]
+            goal_x, goal_y, goal_level = real_x[goal_index], real_y[goal_index], levels[goal_index]
+            hypot = math.hypot
+            potential: List[Optional[float]] = [None] * node_quantity
+        else:
+            potential = [0.0] * node_quantity
+
+        distances = ([math.inf] * node_quantity, [math.inf] * node_quantity)
+        previous = ([None] * node_quantity, [None] * node_quantity)
+        closed = (bytearray(node_quantity), bytearray(node_quantity))
+        distances[0][source_index] = 0.0
+        distances[1][goal_index] = 0.0
+        heaps = ([(0.0, source_index)], [(0.0, goal_index)])
+        best_distance = math.inf
+        meeting_index = None
+        settled = 0
+
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best_distance:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            heap, distance, previous_list, closed_nodes = heaps[side], distances[side], previous[side], closed[side]
+            other_distance = distances[1 - side]
+            sign = 1 if side == 0 else -1
+            _, popped_index = heappop(heap)
+            if closed_nodes[popped_index]:
+                continue
+            closed_nodes[popped_index] = 1
+            settled += 1
+            popped_distance = distance[popped_index]
+            for edge in range(offsets[popped_index], offsets[popped_index + 1]):
+                node_index = targets[edge]
+                new_distance = popped_distance + weights[edge]
+                if new_distance < distance[node_index] and usable[node_index]:
+                    distance[node_index] = new_distance
+                    previous_list[node_index] = popped_index
+                    node_potential = potential[node_index]
+                    if node_potential is None:
+                        node_x, node_y, node_level = real_x[node_index], real_y[node_index], levels[node_index]
+                        node_potential = (
+                            hypot(horizontal_scale * (node_x - goal_x), horizontal_scale * (node_y - goal_y),
+                                  floor_height_cm * abs(node_level - goal_level)) -
+                            hypot(horizontal_scale * (node_x - source_x), horizontal_scale * (node_y - source_y),
+                                  floor_height_cm * abs(node_level - source_level))
+                        ) / 2
+                        potential[node_index] = node_potential
+                    heappush(heap, (new_distance + sign * node_potential, node_index))
+                    if new_distance + other_distance[node_index] < best_distance:
+                        best_distance = new_distance + other_distance[node_index]
+                        meeting_index = node_index
+
+        if stats is not None:
+            stats.settled += settled
+        if meeting_index is None:
+            return [], settled
+        path_indexes = []
+        current = meeting_index
+        while current is not None:
+            path_indexes.append(current)
+            current = previous[0][current]
+        path_indexes.reverse()
+        current = previous[1][meeting_index]
+        while current is not None:
+            path_indexes.append(current)
+            current = previous[1][current]
+        return path_indexes, settled
 
     #This function gives back the node list by the gives Node indexes
-    def _reconstruct_path(self, previous_indexes: List[Optional[int]], source: int, goal: int):
+    def _reconstruct_path(self, previous_indexes: List[Optional[int]], source: int, goal: int,
+                          stats: Optional[SearchStats] = None):
         if previous_indexes[goal] is None and source != goal:
             return []
         path_index = []
         current = goal
         while current is not None:
-            path_index.insert(0, current)
+            path_index.append(current)
             current = previous_indexes[current]
+        path_index.reverse()
 
-        return [self._nodes[i] for i in path_index]
+        return self._path_nodes(path_index, stats)
+
+    #The length of a path given by its node indexes: the sum of the shortest edges between its consecutive nodes.
+    def path_length(self, path_indexes) -> float:
+        self._ensure_compact()
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        length = 0.0
+        for first, second in zip(path_indexes, path_indexes[1:]):
+            length += min(weights[edge] for edge in range(offsets[first], offsets[first + 1]) if targets[edge] == second)
+        return length
+
+    #Gives back the nodes of a path by their indexes, the length of the path is given to the stats collector.
+    def _path_nodes(self, path_indexes, stats: Optional[SearchStats] = None) -> List[Node]:
+        if stats is not None:
+            stats.path_length = self.path_length(path_indexes)
+        return [self.get_node(index) for index in path_indexes]
 
     def count_edges(self):
+        if self._adjacency_list is None:
+            return len(self._targets)
         edges = 0
         for neighbors in self._adjacency_list:
             edges += len(neighbors)
 
         return edges
 
-#Graphbuilder can make a Graph out of JSON datafiles
+#Graphbuilder can make a Graph out of JSON datafiles. from_file decodes the files larger than stream_threshold_bytes
+#(GRAPH_STREAM_THRESHOLD_BYTES, set when the app starts) with from_stream, the smaller ones are decoded at once, which
+#is faster.
 class GraphBuilder:
+    stream_threshold_bytes = 64 * 1024 * 1024
+
     @staticmethod
-    def from_json(data: Dict[str, Any], floor_height_cm: float = 1000) -> Graph:
+    def from_json(data: Dict[str, Any], floor_height_cm: float = 1000, compact: bool = True) -> Graph:
         graph = Graph()
         graph.floor_height_cm = float(floor_height_cm)
 
         for level_key, level_value in data.get("levels", {}).items():
-            graph.add_level_metadata(int(level_key), level_value.get("x", 0), level_value.get("y", 0),
-            level_value.get("pixel_to_cm", 1.0))
-
-        for node in data.get("points", []):
-            level = int(node.get("level", 0))
-            if node.get("targetable", False):
-                node = Targetable(
-                    node["x"], node["y"], node["identifier"],
-                    node.get("closedCorridor", False),
-                    node.get("accessible", True),
-                    level,
-                    *node.get("aliases", [])
-                )
-            else:
-                node = NotTargetable(
-                    node["x"], node["y"], node["identifier"],
-                    node.get("closedCorridor", False),
-                    node.get("accessible", True),
-                    level
-                )
-            graph.add_node(node)
-
+            GraphBuilder._add_level(graph, level_key, level_value)
+        for point in data.get("points", []):
+            GraphBuilder._add_point(graph, point)
         for edge in data.get("edges", []):
-            source_name = edge["from"]
-            goal_name = edge["to"]
-            if source_name not in graph.get_id_to_index() or goal_name not in graph.get_id_to_index():
-                continue
-            distance = edge.get("distance", None)
-            if distance is None:
-                continue
+            GraphBuilder._add_edge(graph, edge["from"], edge["to"], edge.get("distance", None))
+        return GraphBuilder._finish(graph, compact)
+
+    @staticmethod
+    def from_file(path: str, floor_height_cm: float = 1000, compact: bool = True, stream: Optional[bool] = None):
+        with open(path, "r", encoding="utf-8") as f:
+            stat = os.fstat(f.fileno())
+            if stream is None:
+                stream = stat.st_size > GraphBuilder.stream_threshold_bytes
+            if stream:
+                graph = GraphBuilder.from_stream(f, floor_height_cm=floor_height_cm, compact=compact)
             else:
-                graph.add_edge_by_name(source_name, goal_name, float(distance))
+                graph = GraphBuilder.from_json(json.load(f), floor_height_cm=floor_height_cm, compact=compact)
+        if floor_height_cm == 1000:
+            graph.source_file = (path, (stat.st_mtime_ns, stat.st_size))
         return graph
 
+    #Builds the same graph as from_json from a file object without decoding the whole document: the levels, points
+    #and edges are decoded one by one and only the nodes are kept. The edges that come before the points are kept as
+    #(from, to, distance) tuples and added once the points are read.
     @staticmethod
-    def from_file(path: str, floor_height_cm: float = 1000):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return GraphBuilder.from_json(data, floor_height_cm=floor_height_cm)
+    def from_stream(file, floor_height_cm: float = 1000, compact: bool = True,
+                    chunk_size: Optional[int] = None) -> Graph:
+        graph = Graph()
+        graph.floor_height_cm = float(floor_height_cm)
+        stream = JsonStream(file, chunk_size)
+        waiting_edges: List[Tuple[Any, Any, Any]] = []
+        points_read = False
+
+        for key in stream.members():
+            if key == "levels":
+                for level_key in stream.members():
+                    GraphBuilder._add_level(graph, level_key, stream.value())
+            elif key == "points":
+                for point in stream.elements():
+                    GraphBuilder._add_point(graph, point)
+                points_read = True
+            elif key == "edges":
+                for edge in stream.elements():
+                    if points_read:
+                        GraphBuilder._add_edge(graph, edge["from"], edge["to"], edge.get("distance", None))
+                    else:
+                        waiting_edges.append((edge["from"], edge["to"], edge.get("distance", None)))
+            else:
+                stream.value()
+        stream.expect_end()
+
+        for source_name, goal_name, distance in waiting_edges:
+            GraphBuilder._add_edge(graph, source_name, goal_name, distance)
+        return GraphBuilder._finish(graph, compact)
+
+    @staticmethod
+    def _add_level(graph: Graph, level_key: str, level_value: Dict[str, Any]):
+        graph.add_level_metadata(int(level_key), level_value.get("x", 0), level_value.get("y", 0),
+        level_value.get("pixel_to_cm", 1.0))
+
+    @staticmethod
+    def _add_point(graph: Graph, node: Dict[str, Any]):
+        level = int(node.get("level", 0))
+        if node.get("targetable", False):
+            node = Targetable(
+                node["x"], node["y"], node["identifier"],
+                node.get("closedCorridor", False),
+                node.get("accessible", True),
+                level,
+                *node.get("aliases", [])
+            )
+        else:
+            node = NotTargetable(
+                node["x"], node["y"], node["identifier"],
+                node.get("closedCorridor", False),
+                node.get("accessible", True),
+                level
+            )
+        graph.add_node(node)
+
+    #Edges with unknown ends or without a distance are skipped.
+    @staticmethod
+    def _add_edge(graph: Graph, source_name: Any, goal_name: Any, distance: Any):
+        if source_name not in graph.get_id_to_index() or goal_name not in graph.get_id_to_index():
+            return
+        if distance is None:
+            return
+        graph.add_edge_by_name(source_name, goal_name, float(distance))
+
+    @staticmethod
+    def _finish(graph: Graph, compact: bool) -> Graph:
+        if compact:
+            graph.compact()
+        return graph
 
 
 #Pathfinder can search for routes in a Graph and gives back the coordinates to the client
 class PathFinder:
+    #Routes are cached by (dataset, source, goal, accessible, use_closed_corridors, algorithm) if a dataset is given
+    route_cache = RouteCache()
+
     @staticmethod
     def path_nodes_to_list(nodes):
         if not nodes:
@@ -325,6 +1370,60 @@ class PathFinder:
             )
         return list
 
+    #Gives back the k nearest targetables matching the search_text as dictionaries with the identifier, the route length
+    #and the route, or False if the source is invalid.
+    @staticmethod
+    def find_nearest(graph: Graph,
+                     source_id: str,
+                     search_text: str,
+                     k: int = 1,
+                     accessible: bool = True,
+                     use_closed_corridors: bool = False,
+                     ):
+        try:
+            graph.get_index(source_id)
+        except Exception as e:
+            return False
+
+        return [
+            {
+                "identifier": node.get_identifier(),
+                "distance": distance,
+                "path": PathFinder.path_nodes_to_list(path_nodes),
+            }
+            for node, distance, path_nodes in graph.nearest_targetables(source_id, search_text, k, accessible,
+                                                                        use_closed_corridors)
+        ]
+
+    #Closes or reopens nodes and edges of the dataset's graph (see Graph.with_closures) and gives back the new graph
+    #that should replace it. The cached routes of the dataset move to the new graph, except the ones avoiding closed
+    #corridors that pass a newly closed node or both ends of a newly closed edge (all of these after a reopening).
+    @staticmethod
+    def apply_closures(graph: Graph, dataset: str, close_nodes=(), reopen_nodes=(), close_edges=(),
+                       reopen_edges=()) -> Graph:
+        new_graph = graph.with_closures(close_nodes, reopen_nodes, close_edges, reopen_edges)
+        closed_nodes, closed_edges, reopened = graph.closure_changes(new_graph)
+
+        def point(index):
+            node = graph.get_node(index)
+            return node.get_x_coordinate(), node.get_y_coordinate(), node.get_level()
+
+        closed_points = {point(index) for index in closed_nodes}
+        closed_pairs = [(point(first), point(second)) for first, second in closed_edges]
+
+        def stale_route(key, points):
+            if key[4]:
+                return False
+            points = set(points)
+            return reopened or not closed_points.isdisjoint(points) or any(
+                first in points and second in points for first, second in closed_pairs)
+
+        PathFinder.route_cache.rebind(dataset, graph, new_graph, stale_route)
+        return new_graph
+
+    #The optional stats collector is filled with the work of the query (see SearchStats) and the time of its phases:
+    #"lookup" (identifiers, reachability and route cache), "search" (the search with the path reconstruction), "path"
+    #(the conversion to the point list) and "total".
     @staticmethod
     def find_path(graph: Graph,
                   source_id: str,
@@ -332,24 +1431,106 @@ class PathFinder:
                   accessible: bool = True,
                   use_closed_corridors: bool = False,
                   algorithm: str = "dijkstra",
+                  dataset: Optional[str] = None,
+                  stats: Optional[SearchStats] = None,
                   ):
 
         algorithm = algorithm.lower()
+        if stats is not None:
+            stats.algorithm = algorithm
+            start = phase_start = time.perf_counter()
 
         try:
-            _ = graph.get_index(source_id)
-            _ = graph.get_index(goal_id)
+            source_index = graph.get_index(source_id)
+            goal_index = graph.get_index(goal_id)
         except Exception as e:
             return False
 
+        if not graph.can_reach(source_index, goal_index, accessible, use_closed_corridors):
+            if stats is not None:
+                stats.answered_by = "unreachable"
+                stats.add_time("lookup", phase_start)
+                stats.add_time("total", start)
+            return []
+
+        cache_key = None
+        if dataset is not None:
+            cache_key = (dataset, source_id, goal_id, bool(accessible), bool(use_closed_corridors), algorithm)
+            cached_path = PathFinder.route_cache.get(graph, cache_key)
+            if cached_path is not None:
+                if stats is not None:
+                    stats.answered_by = "route_cache"
+                    stats.path_nodes = len(cached_path)
+                    stats.add_time("lookup", phase_start)
+                    stats.add_time("total", start)
+                return cached_path
+        if stats is not None:
+            stats.add_time("lookup", phase_start)
+            phase_start = time.perf_counter()
+
         if algorithm == "astar":
-            path_nodes = graph.astar(source_id, goal_id, accessible, use_closed_corridors)
+            path_nodes = graph.astar(source_id, goal_id, accessible, use_closed_corridors, stats)
+        elif algorithm == "alt":
+            path_nodes = graph.alt(source_id, goal_id, accessible, use_closed_corridors, stats)
+        elif algorithm == "ch":
+            path_nodes = graph.ch(source_id, goal_id, accessible, use_closed_corridors, stats)
+        elif algorithm == "bidijkstra":
+            path_nodes = graph.bidijkstra(source_id, goal_id, accessible, use_closed_corridors, stats)
+        elif algorithm == "biastar":
+            path_nodes = graph.biastar(source_id, goal_id, accessible, use_closed_corridors, stats)
         else:
-            path_nodes = graph.dijkstra(source_id, goal_id, accessible, use_closed_corridors)
+            path_nodes = graph.dijkstra(source_id, goal_id, accessible, use_closed_corridors, stats)
+        if stats is not None:
+            stats.add_time("search", phase_start)
+            phase_start = time.perf_counter()
 
         path_list = PathFinder.path_nodes_to_list(path_nodes)
 
         if path_list is None:
             path_list = []
 
+        if cache_key is not None:
+            PathFinder.route_cache.put(graph, cache_key, path_list)
+
+        if stats is not None:
+            stats.path_nodes = len(path_list)
+            stats.add_time("path", phase_start)
+            stats.add_time("total", start)
         return path_list
+
+    #Gives back up to count different routes (see Graph.alternative_routes) in the format of find_path, the shortest
+    #first, an empty list if there is no route and False if an identifier is invalid.
+    @staticmethod
+    def find_alternatives(graph: Graph,
+                          source_id: str,
+                          goal_id: str,
+                          count: int,
+                          accessible: bool = True,
+                          use_closed_corridors: bool = False,
+                          stats: Optional[SearchStats] = None,
+                          ):
+        if stats is not None:
+            stats.algorithm = "alternatives"
+            start = phase_start = time.perf_counter()
+
+        try:
+            source_index = graph.get_index(source_id)
+            goal_index = graph.get_index(goal_id)
+        except Exception as e:
+            return False
+
+        if not graph.can_reach(source_index, goal_index, accessible, use_closed_corridors):
+            if stats is not None:
+                stats.answered_by = "unreachable"
+                stats.add_time("lookup", phase_start)
+                stats.add_time("total", start)
+            return []
+        if stats is not None:
+            stats.add_time("lookup", phase_start)
+
+        routes = [PathFinder.path_nodes_to_list(path_nodes) for path_nodes in
+                  graph.alternative_routes(source_id, goal_id, count, accessible, use_closed_corridors)]
+        if stats is not None:
+            stats.path_nodes = len(routes[0]) if routes else 0
+            stats.add_time("total", start)
+        return routes
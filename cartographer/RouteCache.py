@@ -0,0 +1,97 @@
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+#RouteCache stores the finished routes of PathFinder.find_path with least recently used eviction. The first element of
+#every key is the dataset name, the cache remembers which Graph object answered for each dataset, and drops the
+#dataset's routes as soon as a different Graph object is used for it (for example after a reload).
+class RouteCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[Tuple[Any, Any, int], ...]]" = OrderedDict()
+        self._graphs: Dict[str, weakref.ref] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    #Gives back a new copy of the cached route, or None if the route is not cached for this graph.
+    def get(self, graph, key: Tuple[Hashable, ...]) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            self._check_graph(key[0], graph)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return [{"x": x, "y": y, "level": level} for x, y, level in entry]
+
+    def put(self, graph, key: Tuple[Hashable, ...], path_list: List[Dict[str, Any]]):
+        if self.maxsize <= 0:
+            return
+        entry = tuple((point["x"], point["y"], point["level"]) for point in path_list)
+        with self._lock:
+            self._check_graph(key[0], graph)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    #Moves the cached routes of the dataset from old_graph to new_graph, except the routes for which
+    #drop(key, points) is true, the points are (x, y, level) tuples. Nothing moves if the dataset's routes weren't
+    #cached for old_graph.
+    def rebind(self, dataset: str, old_graph, new_graph, drop: Callable[[Tuple[Hashable, ...], Tuple], bool]):
+        with self._lock:
+            reference = self._graphs.get(dataset)
+            if reference is None or reference() is not old_graph:
+                return
+            stale_keys = [key for key, entry in self._entries.items() if key[0] == dataset and drop(key, entry)]
+            for key in stale_keys:
+                del self._entries[key]
+            self.invalidations += len(stale_keys)
+            self._graphs[dataset] = weakref.ref(new_graph)
+
+    #Drops the cached routes of the dataset, for example when its graph is unloaded.
+    def forget(self, dataset: str):
+        with self._lock:
+            stale_keys = [key for key in self._entries if key[0] == dataset]
+            for key in stale_keys:
+                del self._entries[key]
+            self.invalidations += len(stale_keys)
+            self._graphs.pop(dataset, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._graphs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    #Must be called with the lock held.
+    def _check_graph(self, dataset: str, graph):
+        reference = self._graphs.get(dataset)
+        if reference is not None and reference() is graph:
+            return
+        if reference is not None:
+            stale_keys = [key for key in self._entries if key[0] == dataset]
+            for key in stale_keys:
+                del self._entries[key]
+            self.invalidations += len(stale_keys)
+        self._graphs[dataset] = weakref.ref(graph)
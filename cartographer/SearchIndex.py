@@ -0,0 +1,289 @@
+import heapq
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+GRAM_LENGTH = 3
+MAX_EDIT_DISTANCE = 2
+
+#Ranks of the suggestion match types, a smaller rank is a better suggestion
+EXACT_MATCH = 0
+PREFIX_MATCH = 1
+SUBSTRING_MATCH = 2
+ALIAS_MATCH = 3
+FUZZY_MATCH = 4
+
+
+#Lower cases the text and removes the accents, so "LÉ" and "le" give the same grams.
+def fold_text(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(character for character in decomposed if not unicodedata.combining(character)).casefold()
+
+
+def text_grams(text: str) -> set:
+    return {text[i:i + GRAM_LENGTH] for i in range(len(text) - GRAM_LENGTH + 1)}
+
+
+#Bit masks of the character positions of the pattern, used by the bit-parallel edit distance.
+def pattern_masks(pattern: str) -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for position, character in enumerate(pattern):
+        masks[character] = masks.get(character, 0) | (1 << position)
+    return masks
+
+
+#Levenshtein distance of a pattern (given by its length and pattern_masks) and a text, computed with Myers'
+#bit-parallel algorithm: one column of the dynamic programming table is updated with a few integer operations.
+def masked_edit_distance(masks: Dict[str, int], pattern_length: int, text: str) -> int:
+    if pattern_length == 0:
+        return len(text)
+    all_bits = (1 << pattern_length) - 1
+    last_bit = 1 << (pattern_length - 1)
+    positive_vertical = all_bits
+    negative_vertical = 0
+    distance = pattern_length
+    for character in text:
+        equal = masks.get(character, 0)
+        vertical = equal | negative_vertical
+        horizontal = (((equal & positive_vertical) + positive_vertical) ^ positive_vertical) | equal
+        positive_horizontal = negative_vertical | ~(horizontal | positive_vertical)
+        negative_horizontal = positive_vertical & horizontal
+        if positive_horizontal & last_bit:
+            distance += 1
+        elif negative_horizontal & last_bit:
+            distance -= 1
+        positive_horizontal = ((positive_horizontal << 1) | 1) & all_bits
+        negative_horizontal = (negative_horizontal << 1) & all_bits
+        positive_vertical = (negative_horizontal | ~(vertical | positive_horizontal)) & all_bits
+        negative_vertical = positive_horizontal & vertical
+    return distance
+
+
+#Levenshtein distance of two strings.
+def edit_distance(first: str, second: str) -> int:
+    return masked_edit_distance(pattern_masks(first), len(first), second)
+
+
+#Gives back how many typos are tolerated in the text, short texts have to be typed correctly.
+def allowed_edit_distance(folded_text: str) -> int:
+    return min(MAX_EDIT_DISTANCE, len(folded_text) // 4)
+
+
+#BKTree stores words in a metric tree by edit distance, so the words near a query can be found without comparing
+#the query to every word: by the triangle inequality only the children within the tolerance have to be visited.
+class BKTree:
+    def __init__(self):
+        self._root: Optional[Tuple[str, Dict[int, tuple]]] = None
+        self._values: Dict[str, List[int]] = {}
+
+    def add(self, word: str, value: int):
+        values = self._values.get(word)
+        if values is not None:
+            values.append(value)
+            return
+        self._values[word] = [value]
+        if self._root is None:
+            self._root = (word, {})
+            return
+        node_word, children = self._root
+        while True:
+            distance = edit_distance(word, node_word)
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (word, {})
+                return
+            node_word, children = child
+
+    #Gives back (distance, word, values) for every word at most max_distance edits from the query.
+    def search(self, query: str, max_distance: int) -> Iterator[Tuple[int, str, List[int]]]:
+        if self._root is None:
+            return
+        masks = pattern_masks(query)
+        stack = [self._root]
+        while stack:
+            node_word, children = stack.pop()
+            distance = masked_edit_distance(masks, len(query), node_word)
+            if distance <= max_distance:
+                yield distance, node_word, self._values[node_word]
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+
+
+def gram_code(gram: str) -> int:
+    code = 0
+    for character in gram:
+        code = (code << 21) | ord(character)
+    return code
+
+
+def _contains(postings, position: int) -> bool:
+    found = bisect_left(postings, position)
+    return found < len(postings) and postings[found] == position
+
+
+#Names of the flat arrays of a SearchIndex, they are written into graph snapshots.
+SEARCH_INDEX_FIELDS = ("targetables", "identifier_lengths", "gram_codes", "gram_starts", "postings", "folded_offsets",
+                       "folded")
+
+#Separates the identifier and the aliases in the joined search strings, the texts can't match across it.
+SEPARATOR = "\x00"
+
+
+#SearchIndex is an inverted trigram index over the identifiers and aliases of the targetable nodes of a graph.
+#The grams are case-folded and accent-insensitive, they only select the candidate nodes, the candidates are checked
+#with the same case-insensitive substring test as before, so the results don't change, only fewer nodes are touched.
+#Everything is kept in flat arrays: the sorted gram codes point into one postings array of targetable positions (two
+#bytes each while there are fewer than 65536 targetables), and the folded identifier and aliases of every targetable
+#are one record of a single string, each record ends with the separator. The substring test reads the identifiers and
+#aliases of the graph itself, they aren't copied.
+class SearchIndex:
+    def __init__(self, identifiers: Sequence[str], aliases: Sequence[Tuple[str, ...]], targetable: Sequence[int]):
+        targetables = array("i")
+        identifier_lengths = array("i")
+        folded_offsets = array("i", [0])
+        folded: List[str] = []
+        gram_positions: Dict[int, List[int]] = {}
+        for index, identifier in enumerate(identifiers):
+            if not targetable[index]:
+                continue
+            position = len(targetables)
+            targetables.append(index)
+            folded_names = [fold_text(name) for name in (identifier,) + tuple(aliases[index])]
+            folded.append(SEPARATOR.join(folded_names) + SEPARATOR)
+            folded_offsets.append(folded_offsets[-1] + len(folded[-1]))
+            identifier_lengths.append(len(folded_names[0]))
+            grams = set()
+            for folded_name in folded_names:
+                grams |= text_grams(folded_name)
+            for gram in grams:
+                gram_positions.setdefault(gram_code(gram), []).append(position)
+
+        gram_codes = array("q", sorted(gram_positions))
+        gram_starts = array("i", [0])
+        postings = array("H" if len(targetables) <= 0xFFFF else "i")
+        for code in gram_codes:
+            postings.extend(gram_positions[code])
+            gram_starts.append(len(postings))
+        self._set_arrays({
+            "targetables": targetables, "identifier_lengths": identifier_lengths, "gram_codes": gram_codes,
+            "gram_starts": gram_starts, "postings": postings, "folded_offsets": folded_offsets,
+            "folded": "".join(folded),
+        }, identifiers, aliases)
+
+    #Creates an index from the arrays of get_arrays (for example from the memoryviews of a graph snapshot) and the
+    #identifiers and aliases of the graph.
+    @classmethod
+    def from_arrays(cls, data: Dict[str, Any], identifiers: Sequence[str],
+                    aliases: Sequence[Tuple[str, ...]]) -> "SearchIndex":
+        search_index = cls.__new__(cls)
+        search_index._set_arrays(data, identifiers, aliases)
+        return search_index
+
+    def get_arrays(self) -> Dict[str, Any]:
+        return {name: getattr(self, "_" + name) for name in SEARCH_INDEX_FIELDS}
+
+    def _set_arrays(self, data: Dict[str, Any], identifiers: Sequence[str], aliases: Sequence[Tuple[str, ...]]):
+        for name in SEARCH_INDEX_FIELDS:
+            setattr(self, "_" + name, data[name])
+        self._identifiers = identifiers
+        self._aliases = aliases
+        self._postings_view = memoryview(self._postings)
+        self._fuzzy_tree: Optional[BKTree] = None
+        self._fuzzy_lock = threading.Lock()
+
+    #Gives back the positions (in the targetables array) of the targetables which can contain the text, in order.
+    def candidates(self, text: str):
+        folded = fold_text(text)
+        if len(folded) < GRAM_LENGTH:
+            return range(len(self._targetables))
+        gram_postings = []
+        for gram in text_grams(folded):
+            code = gram_code(gram)
+            found = bisect_left(self._gram_codes, code)
+            if found == len(self._gram_codes) or self._gram_codes[found] != code:
+                return ()
+            gram_postings.append(self._postings_view[self._gram_starts[found]:self._gram_starts[found + 1]])
+        gram_postings.sort(key=len)
+        shortest, others = gram_postings[0], gram_postings[1:]
+        if not others:
+            return shortest
+        return (position for position in shortest if all(_contains(postings, position) for postings in others))
+
+    #Gives back at most limit (all if it's None) node indexes whose identifier or one of its aliases contains the text,
+    #in node order.
+    def search(self, text: str, limit: Optional[int] = 10) -> List[int]:
+        result: List[int] = []
+        if text == "" or SEPARATOR in text:
+            return result
+        lowered_text = text.lower()
+        identifiers, aliases, targetables = self._identifiers, self._aliases, self._targetables
+        for position in self.candidates(text):
+            index = targetables[position]
+            if lowered_text in identifiers[index].lower() or any(lowered_text in alias.lower()
+                                                                 for alias in aliases[index]):
+                result.append(index)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    #Gives back at most limit node indexes ordered by match quality: exact identifier, identifier prefix, identifier
+    #substring, alias substring and at last identifiers or aliases within a few typos. Matching is case and accent
+    #insensitive. Only the best limit matches are kept on a heap, the other matches are never sorted.
+    def rank(self, text: str, limit: int = 10) -> List[int]:
+        folded_text = fold_text(text.strip())
+        if not folded_text or limit <= 0 or SEPARATOR in folded_text:
+            return []
+        ranked = heapq.nsmallest(limit, self._ranked_matches(folded_text))
+        if len(ranked) < limit:
+            max_distance = allowed_edit_distance(folded_text)
+            if max_distance:
+                found = {match[-1] for match in ranked}
+                fuzzy = {}
+                for distance, word, indexes in self.get_fuzzy_tree().search(folded_text, max_distance):
+                    for index in indexes:
+                        if index not in found and distance < fuzzy.get(index, (max_distance + 1,))[0]:
+                            fuzzy[index] = (distance, len(word))
+                ranked += heapq.nsmallest(
+                    limit - len(ranked),
+                    ((FUZZY_MATCH, distance, word_length, index) for index, (distance, word_length) in fuzzy.items())
+                )
+        return [match[-1] for match in ranked]
+
+    #The BK-tree is only needed by typo tolerant searches, so it is built on first use.
+    def get_fuzzy_tree(self) -> BKTree:
+        fuzzy_tree = self._fuzzy_tree
+        if fuzzy_tree is not None:
+            return fuzzy_tree
+        with self._fuzzy_lock:
+            if self._fuzzy_tree is None:
+                fuzzy_tree = BKTree()
+                folded, folded_offsets = self._folded, self._folded_offsets
+                for position, index in enumerate(self._targetables):
+                    names = folded[folded_offsets[position]:folded_offsets[position + 1] - 1]
+                    for folded_name in names.split(SEPARATOR):
+                        fuzzy_tree.add(folded_name, index)
+                self._fuzzy_tree = fuzzy_tree
+            return self._fuzzy_tree
+
+    def _ranked_matches(self, folded_text: str) -> Iterator[Tuple[int, int, int, int]]:
+        folded, folded_offsets = self._folded, self._folded_offsets
+        identifier_lengths, targetables = self._identifier_lengths, self._targetables
+        for position in self.candidates(folded_text):
+            start = folded_offsets[position]
+            identifier_length = identifier_lengths[position]
+            found = folded.find(folded_text, start, folded_offsets[position + 1])
+            if found < 0:
+                continue
+            index = targetables[position]
+            if found - start + len(folded_text) <= identifier_length:
+                if found > start:
+                    yield SUBSTRING_MATCH, found - start, identifier_length, index
+                elif len(folded_text) == identifier_length:
+                    yield EXACT_MATCH, 0, identifier_length, index
+                else:
+                    yield PREFIX_MATCH, 0, identifier_length, index
+            else:
+                yield ALIAS_MATCH, found - folded.rfind(SEPARATOR, start, found) - 1, identifier_length, index
@@ -0,0 +1,65 @@
+import heapq
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+#SearchStats collects what one route query cost: the nodes the searches settled, the heap operations, the length of
+#the found path and the time of every phase of PathFinder.find_path. The searches take it as an optional argument and
+#count the heap operations through heap_functions, without a collector they use the heapq functions and count nothing,
+#so the statistics cost nothing when they are off. Every pushed entry is an improved route to a node, so the relaxed
+#edges are the pushes, and the popped entries of already settled nodes are the stale pops.
+class SearchStats:
+    def __init__(self):
+        self.algorithm: Optional[str] = None
+        #Where the route came from: "search", "tree_cache", "route_cache" or "unreachable" (the connected components
+        #showed that there is no route)
+        self.answered_by = "search"
+        self.settled = 0
+        self.heap_pushes = 0
+        self.heap_pops = 0
+        self.path_nodes = 0
+        self.path_length = 0.0
+        self.timings: Dict[str, float] = {}
+
+    #Gives back the heappop and heappush functions of a search, counting ones with a collector.
+    @staticmethod
+    def heap_functions(stats: Optional["SearchStats"]) -> Tuple[Callable, Callable]:
+        if stats is None:
+            return heapq.heappop, heapq.heappush
+        heappop, heappush = heapq.heappop, heapq.heappush
+
+        def counted_pop(heap: List[Any]):
+            stats.heap_pops += 1
+            return heappop(heap)
+
+        def counted_push(heap: List[Any], item: Any):
+            stats.heap_pushes += 1
+            heappush(heap, item)
+
+        return counted_pop, counted_push
+
+    @property
+    def edges_relaxed(self) -> int:
+        return self.heap_pushes
+
+    @property
+    def stale_pops(self) -> int:
+        return max(0, self.heap_pops - self.settled)
+
+    #Adds the seconds since start (a time.perf_counter value) to the time of the phase.
+    def add_time(self, phase: str, start: float):
+        self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "algorithm": self.algorithm,
+            "answered_by": self.answered_by,
+            "settled": self.settled,
+            "edges_relaxed": self.edges_relaxed,
+            "heap_pushes": self.heap_pushes,
+            "heap_pops": self.heap_pops,
+            "stale_pops": self.stale_pops,
+            "path_nodes": self.path_nodes,
+            "path_length": self.path_length,
+            "timings_ms": {phase: seconds * 1000 for phase, seconds in self.timings.items()},
+        }
@@ -0,0 +1,125 @@
+import threading
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+#A cached tree: the distance and the predecessor (-1 for none) of every node
+Tree = Tuple[array, array]
+
+
+#ShortestPathTreeCache keeps complete shortest path trees of one Graph for its most requested sources. Every request
+#is counted by (source index, accessible, use_closed_corridors), a source gets a tree once it was requested
+#min_requests times. When the trees would use more than budget_bytes, the trees of the least requested sources are
+#evicted, a source that is requested less than every cached one doesn't get a tree.
+class ShortestPathTreeCache:
+    budget_bytes = 4 * 1024 * 1024
+    min_requests = 3
+
+    def __init__(self, budget_bytes: Optional[int] = None, min_requests: Optional[int] = None):
+        if budget_bytes is not None:
+            self.budget_bytes = budget_bytes
+        if min_requests is not None:
+            self.min_requests = min_requests
+        self._trees: Dict[Tuple[int, bool, bool], Tree] = {}
+        self._requests: Dict[Tuple[int, bool, bool], int] = {}
+        self._hits: Dict[Tuple[int, bool, bool], int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    #Counts a request of the source and gives back its tree, or None if it isn't cached.
+    def get(self, key: Tuple[int, bool, bool]) -> Optional[Tree]:
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+            tree = self._trees.get(key)
+            if tree is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._hits[key] = self._hits.get(key, 0) + 1
+            return tree
+
+    #Gives back true if a tree of the source with the given node count should be built and cached.
+    def wants(self, key: Tuple[int, bool, bool], node_count: int) -> bool:
+        with self._lock:
+            requests = self._requests.get(key, 0)
+            if key in self._trees or requests < self.min_requests:
+                return False
+            needed = self.tree_bytes(node_count) - (self.budget_bytes - self._size)
+            if needed <= 0:
+                return True
+            for cached_key in sorted(self._trees, key=self._requests.__getitem__):
+                if self._requests[cached_key] >= requests:
+                    return False
+                needed -= self.tree_bytes(len(self._trees[cached_key][0]))
+                if needed <= 0:
+                    return True
+            return False
+
+    #Caches the tree, evicting the trees of the least requested sources until it fits into the budget.
+    def put(self, key: Tuple[int, bool, bool], distances: List[float], previous: List[Optional[int]]):
+        tree = (array("d", distances), array("i", (-1 if index is None else index for index in previous)))
+        size = self.tree_bytes(len(distances))
+        with self._lock:
+            if key in self._trees or size > self.budget_bytes:
+                return
+            for cached_key in sorted(self._trees, key=self._requests.__getitem__):
+                if self._size + size <= self.budget_bytes:
+                    break
+                self._size -= self.tree_bytes(len(self._trees.pop(cached_key)[0]))
+                self.evictions += 1
+            if self._size + size <= self.budget_bytes:
+                self._trees[key] = tree
+                self._size += size
+
+    #Gives back a new cache with the same settings, request counts and trees, without the trees for which
+    #drop(key, tree) is true.
+    def copy(self, drop: Callable[[Tuple[int, bool, bool], Tree], bool]) -> "ShortestPathTreeCache":
+        cache = ShortestPathTreeCache(self.budget_bytes, self.min_requests)
+        with self._lock:
+            cache._requests = dict(self._requests)
+            cache._hits = dict(self._hits)
+            cache.hits, cache.misses, cache.evictions = self.hits, self.misses, self.evictions
+            for key, tree in self._trees.items():
+                if not drop(key, tree):
+                    cache._trees[key] = tree
+                    cache._size += self.tree_bytes(len(tree[0]))
+        return cache
+
+    def clear(self):
+        with self._lock:
+            self._trees.clear()
+            self._requests.clear()
+            self._hits.clear()
+            self._size = 0
+
+    #The cached sources with their request and hit counts, the most requested first.
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sources = [
+                {
+                    "source_index": key[0],
+                    "accessible": key[1],
+                    "use_closed_corridors": key[2],
+                    "requests": self._requests[key],
+                    "hits": self._hits.get(key, 0),
+                    "hit_rate": self._hits.get(key, 0) / self._requests[key],
+                }
+                for key in sorted(self._trees, key=self._requests.__getitem__, reverse=True)
+            ]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size_bytes": self._size,
+                "budget_bytes": self.budget_bytes,
+                "sources": sources,
+            }
+
+    def __len__(self):
+        return len(self._trees)
+
+    @staticmethod
+    def tree_bytes(node_count: int) -> int:
+        return node_count * (array("d").itemsize + array("i").itemsize)
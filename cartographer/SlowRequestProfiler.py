@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+
+#StackSampler samples the call stacks of the registered threads every interval seconds from a single background
+#thread. A request registers its thread when it starts and takes the counted stacks when it ends, a request that is
+#shorter than the interval is never sampled. The sampler thread waits without sampling while no thread is registered.
+class StackSampler:
+    max_depth = 64
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._stacks: Dict[int, Counter] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: int):
+        with self._condition:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    #Stops sampling the thread and gives back its stacks (root first, joined by ";") with their sample counts.
+    def stop(self, thread_id: int) -> Counter:
+        with self._condition:
+            return self._stacks.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stacks:
+                    self._condition.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._condition:
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._collapse(frame)] += 1
+            del frames
+
+    @classmethod
+    def _collapse(cls, frame) -> str:
+        names = []
+        while frame is not None and len(names) < cls.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+#ProfileRing keeps the traces as JSON files of a directory and deletes the oldest ones above capacity. The file names
+#start with the time of the trace in nanoseconds, so the name order is the time order, and a trace is written to a
+#temporary file first, so the readers never see half a trace.
+class ProfileRing:
+    def __init__(self, directory: str, capacity: int = 100):
+        self.directory = str(directory)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+    def write(self, trace: Dict[str, Any]) -> str:
+        name = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+        path = os.path.join(self.directory, name + ".json")
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary_path = f"{path}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(dict(trace, id=name), f)
+            os.replace(temporary_path, path)
+            names = self.names()
+            for old in names[:max(0, len(names) - max(1, self.capacity))]:
+                try:
+                    os.remove(os.path.join(self.directory, old + ".json"))
+                except OSError:
+                    pass
+        return name
+
+    #The names of the kept traces, the oldest first.
+    def names(self) -> List[str]:
+        try:
+            files = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(file[:-len(".json")] for file in files if file.endswith(".json"))
+
+    #The trace with the name, None if it was deleted already.
+    def read(self, name: str) -> Optional[Dict[str, Any]]:
+        if os.path.basename(name) != name:
+            return None
+        try:
+            with open(os.path.join(self.directory, name + ".json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+#SlowRequestProfilerMiddleware samples the call stacks of the PROFILE_PATHS requests and keeps the trace of the ones
+#slower than PROFILE_SLOW_SECONDS, and of a PROFILE_SAMPLE_RATE share of all of them, in the PROFILE_DIRECTORY ring
+#with their query parameters. The profile_requests command lists the traces and replays their queries under cProfile.
+class SlowRequestProfilerMiddleware:
+    max_stacks = 200
+    max_parameter_length = 200
+
+    def __init__(self, get_response):
+        self.slow_seconds = getattr(settings, "PROFILE_SLOW_SECONDS", None)
+        self.sample_rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+        if self.slow_seconds is None and self.sample_rate <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.paths = tuple(getattr(settings, "PROFILE_PATHS", ["/map_result/"]))
+        self.sampler = StackSampler(getattr(settings, "PROFILE_SAMPLE_INTERVAL", 0.005))
+        self.ring = ProfileRing(getattr(settings, "PROFILE_DIRECTORY", os.path.join(settings.BASE_DIR, "profiles")),
+                                getattr(settings, "PROFILE_RING_SIZE", 100))
+
+    def __call__(self, request):
+        if not request.path_info.startswith(self.paths):
+            return self.get_response(request)
+
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        thread_id = threading.get_ident()
+        self.sampler.start(thread_id)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            seconds = time.perf_counter() - start
+            stacks = self.sampler.stop(thread_id)
+        slow = self.slow_seconds is not None and seconds >= self.slow_seconds
+        if slow or sampled:
+            try:
+                self.ring.write(self._trace(request, response, seconds, "slow" if slow else "sampled", stacks))
+            except OSError:
+                logger.exception("Could not write the profile of %s", request.path)
+        return response
+
+    def _trace(self, request, response, seconds: float, reason: str, stacks: Counter) -> Dict[str, Any]:
+        return {
+            "time": time.time(),
+            "reason": reason,
+            "method": request.method,
+            "path": request.path,
+            "params": {key: value[:self.max_parameter_length] for key, value in request.GET.items()},
+            "status": response.status_code,
+            "seconds": seconds,
+            "interval": self.sampler.interval,
+            "samples": sum(stacks.values()),
+            "stacks": stacks.most_common(self.max_stacks),
+        }
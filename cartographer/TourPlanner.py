@@ -0,0 +1,193 @@
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence
+from .Node import Graph, PathFinder
+from .WorkerPool import WorkerPool
+
+
+#TourPlanner orders the stops of a round (for example the rooms facility staff visit) and gives back the whole route.
+#The route lengths between the start and the stops come from one-to-many Dijkstra searches, one per stop, that are
+#kept in the distance cache of the graph for each routing profile. With many uncached rows the searches are split
+#between the processes of the WorkerPool. Up to exact_limit stops the order is optimal (Held-Karp dynamic
+#programming), larger rounds are ordered by the nearest neighbour rule improved with 2-opt and Or-opt moves until no
+#move shortens the tour.
+class TourPlanner:
+    exact_limit = 10
+    parallel_threshold = 32
+    workers = os.cpu_count() or 1
+
+    #Gives back {"order", "distance", "unreachable", "path"}, or False if an identifier is invalid. The order lists the
+    #reachable stops in visiting order, the distance is the length of the whole route and the path is in the format of
+    #PathFinder.path_nodes_to_list, the points where the start and the stops are reached are marked with their "stop"
+    #identifier and "stop_number" (0 for the start). Stops that can't be reached (or left to get back to the start with
+    #return_to_start) are listed in unreachable and skipped.
+    @staticmethod
+    def plan(graph: Graph,
+             start_id: str,
+             stop_ids: Sequence[str],
+             accessible: bool = True,
+             use_closed_corridors: bool = False,
+             return_to_start: bool = False,
+             dataset: Optional[str] = None,
+             ):
+        try:
+            start = graph.get_index(start_id)
+            stops = list(dict.fromkeys(graph.get_index(stop_id) for stop_id in stop_ids))
+        except Exception as e:
+            return False
+        stops = [stop for stop in stops if stop != start]
+
+        matrix = TourPlanner.distance_matrix(graph, [start] + stops, accessible, use_closed_corridors)
+        reachable = [position for position in range(1, len(stops) + 1)
+                     if not math.isinf(matrix[0][position]) and
+                     not (return_to_start and math.isinf(matrix[position][0]))]
+        if reachable:
+            #An unusable start can reach stops that can't reach each other, the ones of the nearest stop are kept
+            nearest = min(reachable, key=matrix[0].__getitem__)
+            reachable = [position for position in reachable if not math.isinf(matrix[nearest][position])]
+        unreachable = [graph.get_node(stops[position - 1]).get_identifier()
+                       for position in range(1, len(stops) + 1) if position not in reachable]
+        if len(reachable) != len(stops):
+            kept = [0] + reachable
+            matrix = [[matrix[row][column] for column in kept] for row in kept]
+            stops = [stops[position - 1] for position in reachable]
+
+        order = TourPlanner.order_stops(matrix, return_to_start)
+        visits = [start] + [stops[position - 1] for position in order]
+        if return_to_start and stops:
+            visits.append(start)
+        identifiers = [graph.get_node(index).get_identifier() for index in visits]
+
+        path: List[Dict[str, Any]] = []
+        for number, identifier in enumerate(identifiers):
+            if number == 0:
+                leg = PathFinder.path_nodes_to_list([graph.get_node(start)])
+            else:
+                leg = PathFinder.find_path(graph, identifiers[number - 1], identifier, accessible,
+                                           use_closed_corridors, dataset=dataset)[1:]
+            leg[-1]["stop"] = identifier
+            leg[-1]["stop_number"] = 0 if number == len(stops) + 1 else number
+            path.extend(leg)
+
+        return {
+            "order": identifiers[1:len(stops) + 1],
+            "distance": TourPlanner.tour_length(matrix, order, return_to_start),
+            "unreachable": unreachable,
+            "path": path,
+        }
+
+    #The route lengths between the given nodes: matrix[i][j] is the length from nodes[i] to nodes[j], math.inf if there
+    #is no route. The rows that aren't cached are searched in the worker processes if there are at least
+    #parallel_threshold, the rows the workers couldn't give back are searched here.
+    @staticmethod
+    def distance_matrix(graph: Graph, nodes: List[int], accessible: bool, use_closed_corridors: bool):
+        key = (bool(accessible), bool(use_closed_corridors))
+        uncached = [source for source in nodes if graph.distance_cache.missing((source,) + key, nodes)]
+        if len(uncached) >= TourPlanner.parallel_threshold and TourPlanner.workers > 1:
+            worker_count = min(TourPlanner.workers, len(uncached))
+            chunks = [uncached[worker::worker_count] for worker in range(worker_count)]
+            for rows in WorkerPool.run(graph, _search_rows, chunks, nodes, accessible, use_closed_corridors) or []:
+                for source, lengths in rows:
+                    graph.distance_cache.put((source,) + key, lengths)
+
+        matrix = []
+        for source in nodes:
+            lengths = graph.route_lengths(source, nodes, accessible, use_closed_corridors)
+            matrix.append([lengths[goal] for goal in nodes])
+        return matrix
+
+    #Gives back the visiting order of the stops as positions of the matrix (1..n, the start is position 0).
+    @staticmethod
+    def order_stops(matrix: List[List[float]], return_to_start: bool = False) -> List[int]:
+        count = len(matrix) - 1
+        if count <= 1:
+            return list(range(1, count + 1))
+        if count <= TourPlanner.exact_limit:
+            return TourPlanner._held_karp(matrix, return_to_start)
+        order = TourPlanner._nearest_neighbour(matrix)
+        return TourPlanner._improve(matrix, order, return_to_start)
+
+    @staticmethod
+    def tour_length(matrix: List[List[float]], order: List[int], return_to_start: bool = False) -> float:
+        visits = [0] + order + ([0] if return_to_start and order else [])
+        return sum(matrix[visits[step]][visits[step + 1]] for step in range(len(visits) - 1))
+
+    #Exact order by dynamic programming over the subsets of stops: best[subset][last] is the length of the shortest
+    #route from the start through the stops of the subset that ends at last.
+    @staticmethod
+    def _held_karp(matrix: List[List[float]], return_to_start: bool) -> List[int]:
+        count = len(matrix) - 1
+        full = (1 << count) - 1
+        best = [[math.inf] * count for _ in range(full + 1)]
+        parent = [[-1] * count for _ in range(full + 1)]
+        for stop in range(count):
+            best[1 << stop][stop] = matrix[0][stop + 1]
+
+        for subset in range(1, full + 1):
+            row = best[subset]
+            for last in range(count):
+                length = row[last]
+                if math.isinf(length) or not subset & (1 << last):
+                    continue
+                distances = matrix[last + 1]
+                for following in range(count):
+                    bit = 1 << following
+                    if subset & bit:
+                        continue
+                    new_length = length + distances[following + 1]
+                    if new_length < best[subset | bit][following]:
+                        best[subset | bit][following] = new_length
+                        parent[subset | bit][following] = last
+
+        closing = [matrix[last + 1][0] if return_to_start else 0 for last in range(count)]
+        last = min(range(count), key=lambda stop: best[full][stop] + closing[stop])
+        order = []
+        subset = full
+        while last >= 0:
+            order.append(last + 1)
+            subset, last = subset ^ (1 << last), parent[subset][last]
+        order.reverse()
+        return order
+
+    @staticmethod
+    def _nearest_neighbour(matrix: List[List[float]]) -> List[int]:
+        remaining = set(range(1, len(matrix)))
+        order = []
+        current = 0
+        while remaining:
+            current = min(remaining, key=matrix[current].__getitem__)
+            remaining.remove(current)
+            order.append(current)
+        return order
+
+    #Applies improving 2-opt moves (reversing a part of the order) and Or-opt moves (moving a run of up to three stops
+    #elsewhere) until none is left. The lengths may be asymmetric, so a reversed part is measured again.
+    @staticmethod
+    def _improve(matrix: List[List[float]], order: List[int], return_to_start: bool) -> List[int]:
+        best_length = TourPlanner.tour_length(matrix, order, return_to_start)
+        improved = True
+        while improved:
+            improved = False
+            for first in range(len(order) - 1):
+                for last in range(first + 1, len(order)):
+                    candidate = order[:first] + order[first:last + 1][::-1] + order[last + 1:]
+                    length = TourPlanner.tour_length(matrix, candidate, return_to_start)
+                    if length < best_length - 1e-9:
+                        order, best_length, improved = candidate, length, True
+            for run in (1, 2, 3):
+                for first in range(len(order) - run + 1):
+                    moved = order[first:first + run]
+                    rest = order[:first] + order[first + run:]
+                    for position in range(len(rest) + 1):
+                        if position == first:
+                            continue
+                        candidate = rest[:position] + moved + rest[position:]
+                        length = TourPlanner.tour_length(matrix, candidate, return_to_start)
+                        if length < best_length - 1e-9:
+                            order, best_length, improved = candidate, length, True
+                            break
+        return order
+
+
+def _search_rows(graph: Graph, sources: List[int], nodes: List[int], accessible: bool, use_closed_corridors: bool):
+    return [(source, graph.route_lengths(source, nodes, accessible, use_closed_corridors)) for source in sources]
@@ -0,0 +1,151 @@
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from .Node import Graph
+from .GraphSnapshot import GraphSnapshot
+from .ContractionHierarchy import HierarchyFile
+
+logger = logging.getLogger(__name__)
+
+
+#What a worker process needs to load the same graph as the server: the building file with its stamp, whether
+#contraction hierarchies are attached and the closures of the graph.
+class GraphSource(NamedTuple):
+    path: str
+    stamp: Tuple[int, int]
+    hierarchies: bool
+    node_count: int
+    closures: Dict[str, List[Any]]
+
+
+#WorkerPool spreads the searches of large batches and tours over one long lived pool of spawned worker processes. The
+#pool is created at its first use and kept. Spawned workers don't inherit the threads and locks of the server, they
+#load the graph from its building file (a fresh snapshot is mapped, see GraphSnapshot) and keep the last few graphs.
+#A run that doesn't finish within timeout seconds stops the pool's workers, the next run starts new ones. When a run
+#can't use the pool, it gives back None and the caller searches in its own process.
+class WorkerPool:
+    workers = os.cpu_count() or 1
+    timeout = 60.0
+    _executor: Optional[ProcessPoolExecutor] = None
+    #The workers of the executor put their process ids here when they start
+    _worker_pids: Any = None
+    _lock = threading.Lock()
+
+    #Calls function(graph, chunk, *arguments) for every chunk in a worker process and gives back the results in chunk
+    #order, or None if the graph wasn't loaded from a building file or the workers failed or timed out.
+    @staticmethod
+    def run(graph: Graph, function, chunks: List[Any], *arguments) -> Optional[List[Any]]:
+        source = WorkerPool.source_of(graph)
+        if source is None:
+            return None
+        executor = WorkerPool._get_executor()
+        deadline = time.monotonic() + WorkerPool.timeout
+        futures = []
+        try:
+            futures = [executor.submit(_call_worker, source, function, chunk, *arguments) for chunk in chunks]
+            return [future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures]
+        except TimeoutError:
+            logger.error("Worker processes didn't answer within %g seconds, they are stopped", WorkerPool.timeout)
+            WorkerPool._reset(executor, terminate=True)
+        except BrokenProcessPool:
+            logger.exception("Worker processes failed")
+            WorkerPool._reset(executor)
+        except Exception:
+            logger.exception("Worker processes couldn't search %s", source.path)
+        for future in futures:
+            future.cancel()
+        return None
+
+    #The GraphSource of the graph, None if it wasn't loaded from a building file.
+    @staticmethod
+    def source_of(graph: Graph) -> Optional[GraphSource]:
+        if graph.source_file is None:
+            return None
+        path, stamp = graph.source_file
+        return GraphSource(path, stamp, graph.get_hierarchy(True, False) is not None, graph.node_count(),
+                           graph.get_closures())
+
+    #Stops the worker processes, for example when the tests are done.
+    @staticmethod
+    def shutdown():
+        with WorkerPool._lock:
+            executor = WorkerPool._executor
+        if executor is not None:
+            WorkerPool._reset(executor)
+
+    @staticmethod
+    def _get_executor() -> ProcessPoolExecutor:
+        with WorkerPool._lock:
+            if WorkerPool._executor is None:
+                context = multiprocessing.get_context("spawn")
+                WorkerPool._worker_pids = context.SimpleQueue()
+                WorkerPool._executor = ProcessPoolExecutor(max_workers=max(1, WorkerPool.workers), mp_context=context,
+                                                           initializer=_record_worker,
+                                                           initargs=(WorkerPool._worker_pids,))
+            return WorkerPool._executor
+
+    #Drops the executor, unless another run replaced it already. A stuck worker never finishes its task, so with
+    #terminate the workers that recorded their process ids are killed instead of waited for.
+    @staticmethod
+    def _reset(executor: ProcessPoolExecutor, terminate: bool = False):
+        worker_pids = None
+        with WorkerPool._lock:
+            if WorkerPool._executor is executor:
+                WorkerPool._executor = None
+                worker_pids, WorkerPool._worker_pids = WorkerPool._worker_pids, None
+        executor.shutdown(wait=False, cancel_futures=True)
+        if worker_pids is None:
+            return
+        while terminate and not worker_pids.empty():
+            try:
+                os.kill(worker_pids.get(), signal.SIGTERM)
+            except OSError:
+                pass
+        worker_pids.close()
+
+
+#The graphs of a worker process by source and closures, the most recently used last
+_worker_graphs: "OrderedDict[Tuple[Any, ...], Graph]" = OrderedDict()
+_worker_graph_count = 4
+
+
+def _record_worker(worker_pids):
+    worker_pids.put(os.getpid())
+
+
+def _call_worker(source: GraphSource, function, chunk, *arguments):
+    return function(_worker_graph(source), chunk, *arguments)
+
+
+#Loads the graph of the source in a worker process like the server did, raises ValueError if the building file
+#changed since the server loaded it.
+def _worker_graph(source: GraphSource) -> Graph:
+    key = (source.path, source.stamp, source.hierarchies, json.dumps(source.closures, sort_keys=True))
+    graph = _worker_graphs.get(key)
+    if graph is not None:
+        _worker_graphs.move_to_end(key)
+        return graph
+
+    stat = os.stat(source.path)
+    if (stat.st_mtime_ns, stat.st_size) != tuple(source.stamp):
+        raise ValueError(f"The building file changed: {source.path}")
+    graph = GraphSnapshot.load_graph(source.path)
+    if source.hierarchies:
+        hierarchies = HierarchyFile.load(source.path, graph)
+        if hierarchies is not None:
+            graph.set_hierarchies(hierarchies)
+    if graph.node_count() != source.node_count:
+        raise ValueError(f"The graph of {source.path} has {graph.node_count()} nodes instead of {source.node_count}")
+    graph = graph.with_closure_state(source.closures)
+    _worker_graphs[key] = graph
+    while len(_worker_graphs) > _worker_graph_count:
+        _worker_graphs.popitem(last=False)
+    return graph
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CartographerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cartographer'
+
+    #The graph building settings are applied here, so the management commands build the same graphs as the views
+    def ready(self):
+        from .Node import GraphBuilder
+        GraphBuilder.stream_threshold_bytes = getattr(settings, "GRAPH_STREAM_THRESHOLD_BYTES",
+                                                      GraphBuilder.stream_threshold_bytes)
@@ -0,0 +1,30 @@
+import os
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from cartographer.ContractionHierarchy import HierarchyFile
+
+
+#Builds the contraction hierarchies of the buildings, so map_result can answer the routes with them.
+class Command(BaseCommand):
+    help = "Builds contraction hierarchies for static/buildings/*.json, one per routing profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("datasets", nargs="*", help="JSON file names to preprocess, all of them by default.")
+        parser.add_argument("--force", action="store_true", help="Rebuild hierarchies that are still fresh.")
+
+    def handle(self, *args, **options):
+        data_path = os.path.join(apps.get_app_config("cartographer").path, "static", "buildings")
+        datasets = options["datasets"] or sorted(name for name in os.listdir(data_path) if name.endswith(".json"))
+
+        for dataset in datasets:
+            json_path = os.path.join(data_path, dataset)
+            if not os.path.isfile(json_path):
+                raise CommandError(f"Building file not found: {dataset}")
+            hierarchy_path = HierarchyFile.path_for(json_path)
+            if not options["force"] and HierarchyFile.is_fresh(hierarchy_path, json_path):
+                self.stdout.write(f"{dataset}: hierarchies are up to date")
+                continue
+            HierarchyFile.build(json_path)
+            self.stdout.write(self.style.SUCCESS(
+                f"{dataset}: built {os.path.basename(hierarchy_path)} ({os.path.getsize(hierarchy_path)} bytes)"
+            ))
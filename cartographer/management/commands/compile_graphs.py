@@ -0,0 +1,30 @@
+import os
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from cartographer.GraphSnapshot import GraphSnapshot
+
+
+#Compiles the building JSON files into binary graph snapshots, so the workers can map them instead of parsing JSON.
+class Command(BaseCommand):
+    help = "Compiles static/buildings/*.json into memory-mappable graph snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("datasets", nargs="*", help="JSON file names to compile, all of them by default.")
+        parser.add_argument("--force", action="store_true", help="Recompile snapshots that are still fresh.")
+
+    def handle(self, *args, **options):
+        data_path = os.path.join(apps.get_app_config("cartographer").path, "static", "buildings")
+        datasets = options["datasets"] or sorted(name for name in os.listdir(data_path) if name.endswith(".json"))
+
+        for dataset in datasets:
+            json_path = os.path.join(data_path, dataset)
+            if not os.path.isfile(json_path):
+                raise CommandError(f"Building file not found: {dataset}")
+            snapshot_path = GraphSnapshot.path_for(json_path)
+            if not options["force"] and GraphSnapshot.is_fresh(snapshot_path, json_path):
+                self.stdout.write(f"{dataset}: snapshot is up to date")
+                continue
+            GraphSnapshot.compile(json_path)
+            self.stdout.write(self.style.SUCCESS(
+                f"{dataset}: compiled {os.path.basename(snapshot_path)} ({os.path.getsize(snapshot_path)} bytes)"
+            ))
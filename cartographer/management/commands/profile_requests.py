@@ -0,0 +1,110 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from cartographer.SlowRequestProfiler import ProfileRing
+from cartographer.SearchStats import SearchStats
+
+
+#Lists the traces of the slow request profiler, shows their sampled stacks and replays their route queries against
+#PathFinder.find_path (find_alternatives for the queries with alternatives) under cProfile.
+class Command(BaseCommand):
+    help = "Lists, shows and replays the request traces kept by SlowRequestProfilerMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["list", "show", "replay"])
+        parser.add_argument("trace", nargs="?", help="Name of the trace for show and replay, the newest by default.")
+        parser.add_argument("--stacks", type=int, default=20, help="Number of sampled stacks shown.")
+        parser.add_argument("--repeat", type=int, default=1, help="Number of times the query is replayed.")
+        parser.add_argument("--sort", default="cumulative", help="Sort order of the profile, see pstats.")
+        parser.add_argument("--limit", type=int, default=30, help="Number of functions printed from the profile.")
+        parser.add_argument("--cached", action="store_true",
+                            help="Let the replay use the route cache, it is skipped by default.")
+
+    def handle(self, *args, **options):
+        ring = ProfileRing(getattr(settings, "PROFILE_DIRECTORY", os.path.join(settings.BASE_DIR, "profiles")),
+                           getattr(settings, "PROFILE_RING_SIZE", 100))
+        if options["action"] == "list":
+            self.list_traces(ring)
+            return
+
+        names = ring.names()
+        name = options["trace"] or (names[-1] if names else None)
+        trace = ring.read(name) if name else None
+        if trace is None:
+            raise CommandError(f"Trace not found: {name}" if name else "There are no traces")
+        if options["action"] == "show":
+            self.show(trace, options["stacks"])
+        else:
+            self.replay(trace, options)
+
+    def list_traces(self, ring):
+        for name in reversed(ring.names()):
+            trace = ring.read(name)
+            if trace is None:
+                continue
+            params = trace["params"]
+            self.stdout.write(
+                f"{name}  {datetime.fromtimestamp(trace['time']):%Y-%m-%d %H:%M:%S}  {trace['seconds'] * 1000:9.1f} ms  "
+                f"{trace['reason']:7}  {trace['status']}  {trace['path']}  {params.get('dataset', '')} "
+                f"{params.get('sourceinput', '')} -> {params.get('goalinput', '')}"
+            )
+
+    def show(self, trace, stack_count):
+        self.stdout.write(f"{trace['path']} {trace['params']}")
+        self.stdout.write(f"{trace['seconds'] * 1000:.1f} ms, {trace['samples']} samples every "
+                          f"{trace['interval'] * 1000:g} ms")
+        for stack, count in trace["stacks"][:stack_count]:
+            self.stdout.write(f"{count:6}  {stack.rsplit(';', 1)[-1]}")
+            self.stdout.write(f"        {stack}")
+
+    def replay(self, trace, options):
+        from cartographer.views import _graph_cache, DEFAULT_DATASET, MAX_ALTERNATIVES, route_algorithm
+        from cartographer.Node import PathFinder
+
+        params = trace["params"]
+        dataset = params.get("dataset", DEFAULT_DATASET)
+        source, goal = params.get("sourceinput", ""), params.get("goalinput", "")
+        avoid_stairs = params.get("avoidstairs") == "on"
+        use_closed = params.get("useclosed") == "on"
+        try:
+            alternatives = max(1, min(int(params.get("alternatives", 1)), MAX_ALTERNATIVES))
+        except ValueError:
+            alternatives = 1
+        graph = _graph_cache.get(dataset)
+        if graph is None:
+            raise CommandError(f"Graph not found: {dataset}")
+        if not source or not goal:
+            raise CommandError("The trace has no source or goal")
+        algorithm = route_algorithm(graph, avoid_stairs, use_closed, params.get("useastar") == "on")
+
+        profile = cProfile.Profile()
+        stats = SearchStats()
+        start = time.perf_counter()
+        for _ in range(max(1, options["repeat"])):
+            stats = SearchStats()
+            profile.enable()
+            if alternatives > 1:
+                path = PathFinder.find_alternatives(graph, source, goal, alternatives, avoid_stairs, use_closed, stats)
+            else:
+                path = PathFinder.find_path(graph, source, goal, avoid_stairs, use_closed, algorithm,
+                                            dataset if options["cached"] else None, stats)
+            profile.disable()
+        seconds = (time.perf_counter() - start) / max(1, options["repeat"])
+
+        if path is False:
+            outcome = "invalid identifier"
+        elif not path:
+            outcome = "no route"
+        else:
+            outcome = f"{len(path)} routes" if alternatives > 1 else f"{len(path)} points"
+        self.stdout.write(f"{dataset} {source} -> {goal} ({algorithm}): {outcome}, {seconds * 1000:.2f} ms per query, "
+                          f"{trace['seconds'] * 1000:.1f} ms in the request")
+        self.stdout.write(str(stats.to_dict()))
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats(options["sort"]).print_stats(options["limit"])
+        self.stdout.write(output.getvalue())
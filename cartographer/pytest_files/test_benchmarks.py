@@ -1,7 +1,12 @@
 import os
+import gc
+import json
+import tracemalloc
 import pytest
 from django.conf import settings
 from cartographer.Node import GraphBuilder, PathFinder
+from cartographer.ContractionHierarchy import ContractionHierarchy
+from cartographer.TourPlanner import TourPlanner
 
 
 LE_PATH = os.path.join(
@@ -16,6 +21,19 @@ def load_graphs(n):
     return graphs
 
 
+def graph_size_bytes(compact):
+    with open(LE_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph = GraphBuilder.from_json(data, compact=compact)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return graph, after - before
+
+
 def pick_nodes(graph):
     ids = list(graph.get_id_to_index().keys())
     return ids[0], ids[1]
@@ -75,3 +93,158 @@ def test_astar_speed_under_load(benchmark, graph_count):
 
     path = benchmark(run)
     assert isinstance(path, list), "The result is not a List"
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_graph_memory(benchmark, compact):
+    graph, size = graph_size_bytes(compact)
+    benchmark.extra_info["graph_bytes"] = size
+
+    with open(LE_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    result = benchmark(GraphBuilder.from_json, data, compact=compact)
+    assert result.node_count() == graph.node_count(), "The graphs are different"
+
+
+#Builds the graph by decoding the whole file and by streaming it, the peak traced memory of one load is recorded
+@pytest.mark.parametrize("loader", ["from_json", "from_stream"])
+def test_load_peak_memory(benchmark, loader):
+    def load():
+        with open(LE_PATH, "r", encoding="utf-8") as f:
+            if loader == "from_json":
+                return GraphBuilder.from_json(json.load(f))
+            return GraphBuilder.from_stream(f)
+
+    gc.collect()
+    tracemalloc.start()
+    graph = load()
+    benchmark.extra_info["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = benchmark(load)
+    assert result.node_count() == graph.node_count(), "The graphs are different"
+
+
+def search_kernel(graph, algorithm):
+    if algorithm == "astar":
+        return graph._astar_search
+    if algorithm == "alt":
+        graph.get_landmarks(False, True)
+        graph.get_landmarks(True, False)
+        return graph._alt_search
+    if algorithm == "ch":
+        graph.set_hierarchies({key: ContractionHierarchy.build(graph, *key) for key in ((False, True), (True, False))})
+        return lambda source_index, goal_index, accessible, use_closed_corridors: graph.get_hierarchy(
+            accessible, use_closed_corridors).search(graph, source_index, goal_index, accessible, use_closed_corridors)
+    if algorithm == "bidijkstra":
+        return graph._bidirectional_search
+    if algorithm == "biastar":
+        heuristic = graph.get_consistent_heuristic()
+        return lambda *args: graph._bidirectional_search(*args, heuristic)
+    return graph._dijkstra_search
+
+
+@pytest.mark.parametrize("algorithm", ["dijkstra", "astar", "alt", "ch", "bidijkstra", "biastar"])
+def test_time_per_settled_node(benchmark, algorithm):
+    graph = GraphBuilder.from_file(LE_PATH)
+    ids = list(graph.get_id_to_index().keys())
+    source_index = graph.get_index(ids[0])
+    goal_index = graph.get_index(ids[-1])
+    search = search_kernel(graph, algorithm)
+
+    _, settled = benchmark(search, source_index, goal_index, False, True)
+    benchmark.extra_info["settled_nodes"] = settled
+    if benchmark.stats is not None:
+        benchmark.extra_info["ns_per_settled_node"] = benchmark.stats.stats.mean * 1e9 / settled
+    assert settled > 0, "No node was settled"
+
+
+@pytest.mark.parametrize("algorithm", ["dijkstra", "astar", "alt", "ch", "bidijkstra", "biastar"])
+def test_settled_nodes_between_levels(benchmark, algorithm):
+    graph = GraphBuilder.from_file(LE_PATH)
+    ids = list(graph.get_id_to_index().keys())
+    pairs = [(graph.get_index(ids[i]), graph.get_index(ids[-1 - i])) for i in range(0, len(ids) // 2, len(ids) // 20)]
+    search = search_kernel(graph, algorithm)
+
+    def run():
+        return sum(search(source_index, goal_index, True, False)[1] for source_index, goal_index in pairs)
+
+    settled = benchmark(run)
+    benchmark.extra_info["pairs"] = len(pairs)
+    benchmark.extra_info["settled_nodes"] = settled
+    assert settled > 0, "No node was settled"
+
+
+@pytest.mark.parametrize("tree_cache", [False, True])
+def test_hot_source_speed(benchmark, tree_cache):
+    graph = GraphBuilder.from_file(LE_PATH)
+    graph.tree_cache.budget_bytes = graph.tree_cache.budget_bytes if tree_cache else 0
+    ids = list(graph.get_id_to_index().keys())
+    goals = ids[::len(ids) // 50]
+
+    def run():
+        return [graph.dijkstra(ids[0], goal, False, True) for goal in goals]
+
+    paths = benchmark(run)
+    benchmark.extra_info["cached_sources"] = len(graph.tree_cache)
+    assert len(paths) == len(goals), "Missing routes"
+
+
+@pytest.mark.parametrize("k", [1, 5])
+def test_nearest_speed(benchmark, k):
+    graph = GraphBuilder.from_file(LE_PATH)
+    source, _ = pick_nodes(graph)
+
+    result = benchmark(PathFinder.find_nearest, graph, source, "labor", k, False, True)
+    assert len(result) == k, "Missing matches"
+
+
+#The cost of every extra alternative route is one A* search on the penalized weights, guided by the exact distances of
+#the goal's shortest path tree that is built once
+@pytest.mark.parametrize("alternatives", [1, 2, 3, 5])
+def test_alternative_routes_speed(benchmark, alternatives):
+    graph = GraphBuilder.from_file(LE_PATH)
+    source, goal = pick_nodes(graph)
+
+    routes = benchmark(graph.alternative_routes, source, goal, alternatives, False, True)
+    assert 1 <= len(routes) <= alternatives, "Missing route"
+
+
+@pytest.mark.parametrize("stop_count", [8, 25])
+@pytest.mark.parametrize("distance_cache", [False, True])
+def test_tour_speed(benchmark, stop_count, distance_cache):
+    graph = GraphBuilder.from_file(LE_PATH)
+    profile = graph.get_profile(False, False)
+    rooms = [identifier for identifier, index in graph.get_id_to_index().items()
+             if graph._targetable[index] and profile.usable[index]]
+    start, stops = rooms[0], rooms[1::len(rooms) // stop_count][:stop_count]
+
+    def plan():
+        if not distance_cache:
+            graph.distance_cache.clear()
+        return TourPlanner.plan(graph, start, stops, False, False)
+
+    tour = benchmark(plan)
+    assert len(tour["order"]) + len(tour["unreachable"]) == stop_count
+
+
+def test_unreachable_route_speed(benchmark):
+    graph = GraphBuilder.from_file(LE_PATH)
+    profile = graph.get_profile(True, False)
+    ids = list(graph.get_id_to_index().keys())
+    source = next(identifier for identifier in ids if profile.usable[graph.get_index(identifier)])
+    goal = next(identifier for identifier in ids
+                if not graph.can_reach(graph.get_index(source), graph.get_index(identifier), True, False))
+
+    path = benchmark(PathFinder.find_path, graph, source, goal, True, False)
+    assert path == [], "The route should not exist"
+
+
+@pytest.mark.parametrize("query", ["LÉ-1", "LÉ-1-131-02-43", "labor"])
+def test_ranked_search_speed(benchmark, query):
+    graph = GraphBuilder.from_file(LE_PATH)
+    graph.get_search_index().get_fuzzy_tree()
+
+    result = benchmark(graph.rank_targetables, query)
+    assert len(result) > 0, "Invalid query"
@@ -5,5 +5,12 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('search/', views.search, name='search'),
     path('map_result/', views.map_result, name='map_result'),
-    path('help/', views.help, name='help')
+    path('help/', views.help, name='help'),
+    path('api/routes/', views.routes, name='routes'),
+    path('api/tour/', views.tour, name='tour'),
+    path('api/nearest/', views.nearest, name='nearest'),
+    path('api/within/', views.within, name='within'),
+    path('api/closures/', views.closures, name='closures'),
+    path('api/graphs/', views.graphs, name='graphs'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
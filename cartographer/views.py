@@ -4,59 +4,177 @@ from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.template import loader
+from django.conf import settings
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.middleware.csrf import CsrfViewMiddleware
 from urllib.parse import urlencode
 from .Node import *
+from .GraphSnapshot import GraphSnapshot
+from .GraphRegistry import GraphRegistry
+from .BuildingManifest import BuildingManifest
+from .ContractionHierarchy import HierarchyFile
+from .ShortestPathTreeCache import ShortestPathTreeCache
+from .BatchRouter import BatchRouter
+from .TourPlanner import TourPlanner
+from .WorkerPool import WorkerPool
+from .DistanceMatrixCache import DistanceMatrixCache
+from .SearchStats import SearchStats
+from .Metrics import MetricsRegistry
+import hmac
+import json
 import os
-import threading
+import time
 
-#Graph is loaded at the start of the server for faster search
-_graph_cache = {}
-_graph_lock = threading.Lock()
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "static/buildings")
+IMAGE_PATH = os.path.join(BASE_DIR, "productionfiles/images")
+DEFAULT_DATASET = "LE.json"
+
+PathFinder.route_cache.maxsize = getattr(settings, "ROUTE_CACHE_SIZE", PathFinder.route_cache.maxsize)
+ShortestPathTreeCache.budget_bytes = getattr(settings, "SHORTEST_PATH_TREE_CACHE_BYTES",
+                                             ShortestPathTreeCache.budget_bytes)
+ShortestPathTreeCache.min_requests = getattr(settings, "SHORTEST_PATH_TREE_MIN_REQUESTS",
+                                             ShortestPathTreeCache.min_requests)
+
+BatchRouter.parallel_threshold = getattr(settings, "ROUTE_BATCH_PARALLEL_THRESHOLD", BatchRouter.parallel_threshold)
+BatchRouter.workers = getattr(settings, "ROUTE_BATCH_WORKERS", BatchRouter.workers)
+MAX_BATCH_QUERIES = getattr(settings, "ROUTE_BATCH_MAX_QUERIES", 5000)
+
+TourPlanner.parallel_threshold = getattr(settings, "TOUR_PARALLEL_THRESHOLD", TourPlanner.parallel_threshold)
+TourPlanner.workers = getattr(settings, "ROUTE_BATCH_WORKERS", TourPlanner.workers)
+WorkerPool.workers = getattr(settings, "ROUTE_BATCH_WORKERS", WorkerPool.workers)
+WorkerPool.timeout = getattr(settings, "ROUTE_BATCH_TIMEOUT", WorkerPool.timeout)
+DistanceMatrixCache.max_entries = getattr(settings, "TOUR_DISTANCE_CACHE_ENTRIES", DistanceMatrixCache.max_entries)
+MAX_TOUR_STOPS = getattr(settings, "TOUR_MAX_STOPS", 50)
+
+SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 50
+MAX_NEAREST_RESULTS = 20
+MAX_ALTERNATIVES = 5
+WALKING_SPEED_CM_PER_S = getattr(settings, "WALKING_SPEED_CM_PER_S", 140)
+
+#The metrics of this process served at /metrics/: the latencies of the route requests, the suggestions and the graph
+#loads, with the cache and graph memory figures read when they are scraped
+_metrics = MetricsRegistry()
+_route_seconds = _metrics.histogram(
+    "cartographer_route_seconds", "Time of answering a map_result route request in seconds.",
+    ("dataset", "algorithm", "outcome"))
+_suggestion_seconds = _metrics.histogram(
+    "cartographer_suggestion_seconds", "Time of answering a search suggestion request in seconds.",
+    ("dataset", "outcome"))
+_graph_load_seconds = _metrics.histogram(
+    "cartographer_graph_load_seconds", "Time of loading a building graph in seconds.", ("dataset", "outcome"),
+    (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+#Loads a building, a fresh compiled snapshot is preferred to the JSON file. With the "shared" GRAPH_STORAGE every
+#worker maps the same snapshot instead of keeping its own copy of the graphs. Contraction hierarchies built by the
+#build_hierarchies command are attached if they are fresh.
+def load_graph(filepath):
+    start = time.perf_counter()
+    dataset = os.path.basename(filepath)
+    try:
+        if getattr(settings, "GRAPH_STORAGE", "private") == "shared":
+            graph = GraphSnapshot.load_shared(filepath)
+        else:
+            graph = GraphSnapshot.load_graph(filepath)
+        hierarchies = HierarchyFile.load(filepath, graph)
+        if hierarchies is not None:
+            graph.set_hierarchies(hierarchies)
+    except Exception:
+        _graph_load_seconds.observe(time.perf_counter() - start, dataset, "error")
+        raise
+    _graph_load_seconds.observe(time.perf_counter() - start, dataset, "ok")
+    return graph
+
+
+#The graphs by file name. A building is loaded at its first request and kept for faster search while it fits into
+#GRAPH_MEMORY_BUDGET_BYTES, the registry reloads the changed files in the background and shares the closures between
+#the worker processes through CLOSURES_PATH, see GraphRegistry.
+_graph_cache = GraphRegistry(DATA_PATH, load_graph, getattr(settings, "GRAPH_RELOAD_INTERVAL", None),
+                             getattr(settings, "GRAPH_MEMORY_BUDGET_BYTES", None),
+                             getattr(settings, "CLOSURES_PATH", None))
+#The buildings with their levels and map images, found in the data and image directories
+_buildings = BuildingManifest(DATA_PATH, IMAGE_PATH, getattr(settings, "BUILDING_NAMES", None))
+
+
+#The hits and misses of the caches as ((cache, dataset), value) samples. The route cache is shared by the datasets, its
+#dataset label is empty, the shortest path tree and route length caches belong to the loaded graphs.
+def _cache_samples(field):
+    route_cache = PathFinder.route_cache.stats()
+    samples = [(("route", ""), route_cache[field])]
+    for current in _graph_cache.versions():
+        samples.append((("tree", current.dataset), current.graph.tree_cache.stats()[field]))
+        samples.append((("distance", current.dataset), current.graph.distance_cache.stats()[field]))
+    return samples
 
-BUILDING_LEVELS = {
-    "LE.json": {
-        "levels": [-1, 0, 1, 2, 3, 4, 5, 6, 7],
-        "images": ["LE-1.png", "LE0.png", "LE1.png", "LE2.png", "LE3.png", "LE4.png", "LE5.png", "LE6.png", "LE7.png"]
-    }
-}
 
-#Loads the cache if it's still empty
+def _cache_hit_ratios():
+    return [(labels, hits / (hits + misses) if hits + misses else 0.0)
+            for (labels, hits), (_, misses) in zip(_cache_samples("hits"), _cache_samples("misses"))]
+
+
+_metrics.counter("cartographer_cache_hits_total", "Cache hits.", ("cache", "dataset"),
+                 lambda: _cache_samples("hits"))
+_metrics.counter("cartographer_cache_misses_total", "Cache misses.", ("cache", "dataset"),
+                 lambda: _cache_samples("misses"))
+_metrics.gauge("cartographer_cache_hit_ratio", "Share of the cache lookups that were hits.", ("cache", "dataset"),
+               _cache_hit_ratios)
+_metrics.gauge("cartographer_graph_memory_bytes", "Estimated memory of the loaded graph in bytes.", ("dataset",),
+               lambda: [((current.dataset,), current.graph.memory_bytes()) for current in _graph_cache.versions()])
+_metrics.gauge("cartographer_graph_memory_budget_bytes", "Memory budget of the loaded graphs in bytes, 0 for none.",
+               (), lambda: [((), _graph_cache.memory_budget_bytes or 0)])
+_metrics.gauge("cartographer_graph_nodes", "Node count of the loaded graph.", ("dataset",),
+               lambda: [((current.dataset,), current.graph.node_count()) for current in _graph_cache.versions()])
+_metrics.gauge("cartographer_graph_version", "Published version of the loaded graph.", ("dataset",),
+               lambda: [((current.dataset,), current.version) for current in _graph_cache.versions()])
+
+
+#Loads the GRAPH_PRELOAD buildings the first time and starts watching the loaded building files.
 def load_all_graphs():
-    if _graph_cache:
-        return _graph_cache
-
-    with _graph_lock:
-        if not _graph_cache:
-            for filename in os.listdir(DATA_PATH):
-                if filename.endswith(".json"):
-                    filepath = os.path.join(DATA_PATH, filename)
-                    try:
-                        _graph_cache[filename] = GraphBuilder.from_file(filepath)
-                        print(f"Loaded graph: {filename}")
-                    except Exception as e:
-                        print(f"Failed to load {filename}: {e}")
+    _graph_cache.start(getattr(settings, "GRAPH_PRELOAD", ()))
     return _graph_cache
 
 
 def index(request):
-    return render(request, 'search.html')
+    return render(request, 'search.html', {"buildings": list(_buildings.buildings().values()),
+                                           "default_dataset": DEFAULT_DATASET})
+
+#The dataset label of the metrics, "unknown" for the names that aren't buildings, so the requests can't make up labels.
+def _dataset_label(dataset):
+    return dataset if isinstance(dataset, str) and _buildings.get(dataset) is not None else "unknown"
+
+
+#The algorithm map_result routes with: A* when it was asked for, the contraction hierarchy of the profile if the graph
+#has one, Dijkstra otherwise.
+def route_algorithm(graph, avoid_stairs, use_closed, use_astar):
+    if use_astar:
+        return "astar"
+    if graph is not None and graph.get_hierarchy(avoid_stairs, use_closed) is not None:
+        return "ch"
+    return "dijkstra"
+
 
 #If the request valid map_result loads the map with the route
 def map_result(request):
-    map_names = ["LE.json"]
+    start = time.perf_counter()
     template = loader.get_template('result.html')
     source = request.GET.get("sourceinput", "")
     goal = request.GET.get("goalinput", "")
-    dataset = request.GET.get("dataset", "LE.json")
+    dataset = request.GET.get("dataset", DEFAULT_DATASET)
     avoid_stairs = request.GET.get("avoidstairs", False) == "on"
     use_closed = request.GET.get("useclosed", False) == "on"
     use_astar = request.GET.get("useastar", False) == "on"
+    debug = request.GET.get("debug") == "1"
+    try:
+        alternatives = max(1, min(int(request.GET.get("alternatives", 1)), MAX_ALTERNATIVES))
+    except ValueError:
+        alternatives = 1
 
-    if dataset not in map_names:
-        dataset = "LE.json"
+    building = _buildings.get(dataset)
+    if building is None:
+        dataset = DEFAULT_DATASET
+        building = _buildings.get(dataset)
 
     query_params = {
         "dataset": dataset,
@@ -65,62 +183,85 @@ def map_result(request):
         "avoidstairs": "on" if avoid_stairs else "",
         "useclosed": "on" if use_closed else "",
         "useastar": "on" if use_astar else "",
+        "alternatives": alternatives,
     }
 
     if source == "" or goal == "":
+        _route_seconds.observe(time.perf_counter() - start, _dataset_label(dataset), "none", "missing_input")
         messages.error(request, "Az indulási hely vagy az úti cél nincs kitöltve!")
         return redirect("/?" + urlencode(query_params))
 
-    algorithm_name = ""
-    if use_astar:
-        algorithm_name = "astar"
-    else:
-        algorithm_name = "dijkstra"
-
     load_all_graphs()
     graph = _graph_cache.get(dataset)
-    path = PathFinder.find_path(
-        graph=graph,
-        source_id=source,
-        goal_id=goal,
-        accessible=avoid_stairs,
-        use_closed_corridors=use_closed,
-        algorithm=algorithm_name,
-    )
+
+    stats = SearchStats() if debug else None
+    alternative_paths = []
+    if alternatives > 1:
+        algorithm_name = "alternatives"
+        path = PathFinder.find_alternatives(graph, source, goal, alternatives, avoid_stairs, use_closed, stats)
+        if path:
+            path, alternative_paths = path[0], path[1:]
+    else:
+        algorithm_name = route_algorithm(graph, avoid_stairs, use_closed, use_astar)
+        path = PathFinder.find_path(
+            graph=graph,
+            source_id=source,
+            goal_id=goal,
+            accessible=avoid_stairs,
+            use_closed_corridors=use_closed,
+            algorithm=algorithm_name,
+            dataset=dataset,
+            stats=stats,
+        )
 
     if path == False:
+        _route_seconds.observe(time.perf_counter() - start, _dataset_label(dataset), algorithm_name, "invalid_id")
         messages.error(request, "Az indulási hely vagy cél nem megfelelő azonosítót tartalmaz!")
         return redirect("/?" + urlencode(query_params))
 
     if len(path) == 0:
+        _route_seconds.observe(time.perf_counter() - start, _dataset_label(dataset), algorithm_name, "no_route")
         messages.error(request, "A jelenlegi beállításoknak megfelelő útvonal nem létezik!")
         return redirect("/?" + urlencode(query_params))
 
     context = {
         "path_json": path,
-        "levels": list(zip(BUILDING_LEVELS[dataset]["levels"], BUILDING_LEVELS[dataset]["images"])),
+        "alternatives_json": alternative_paths,
+        "levels": list(zip(building.levels, building.images)) if building is not None else [],
+        "debug_stats": json.dumps(stats.to_dict(), indent=2) if stats is not None else None,
     }
 
-    return HttpResponse(template.render(context, request))
+    response = HttpResponse(template.render(context, request))
+    _route_seconds.observe(time.perf_counter() - start, _dataset_label(dataset), algorithm_name, "ok")
+    return response
 
-#Loads the Targetable node suggestions if the search_text matches
+#Loads the Targetable node suggestions if the search_text matches, the best matches come first
 def search(request):
     if request.method != "GET":
         return HttpResponse(status=405)
 
+    start = time.perf_counter()
     search_text = request.GET.get("node", "").strip()
-    filename = request.GET.get("file", "LE.json")
+    filename = request.GET.get("file", DEFAULT_DATASET)
+    try:
+        limit = int(request.GET.get("limit", SUGGESTION_LIMIT))
+    except ValueError:
+        _suggestion_seconds.observe(time.perf_counter() - start, _dataset_label(filename), "invalid")
+        return HttpResponse("Invalid limit", status=400)
+    limit = max(1, min(limit, MAX_SUGGESTION_LIMIT))
 
     if not search_text:
+        _suggestion_seconds.observe(time.perf_counter() - start, _dataset_label(filename), "empty")
         return JsonResponse({"nodes": []}, status=200)
 
     load_all_graphs()
     graph = _graph_cache.get(filename)
 
     if not graph:
+        _suggestion_seconds.observe(time.perf_counter() - start, "unknown", "graph_not_found")
         return HttpResponse(f"Graph not found: {filename}", status=404)
 
-    suggestions = graph.search_for_targetables(search_text)
+    suggestions = graph.rank_targetables(search_text, limit)
     dictionarydata = []
     for node in suggestions:
         dictionarydata.append({
@@ -128,9 +269,233 @@ def search(request):
             "aliases": list(node.get_aliases()) if isinstance(node, Targetable) else []
         })
 
+    _suggestion_seconds.observe(time.perf_counter() - start, _dataset_label(filename),
+                                "ok" if dictionarydata else "no_match")
     return JsonResponse({"nodes": dictionarydata}, status=200)
 
 
+#Answers a batch of route queries posted as JSON: {"dataset": "LE.json", "queries": [{"source", "goal", "accessible",
+#"use_closed_corridors", "algorithm"}, ...]}. The results come in the order of the queries, the errors of single
+#queries are reported in their results. With ?debug=1 every result gets the search statistics of its query.
+@csrf_exempt
+def routes(request):
+    if request.method != "POST":
+        return HttpResponse(status=405)
+
+    try:
+        body = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(body, dict) or not isinstance(body.get("queries"), list):
+        return JsonResponse({"error": "The queries list is missing"}, status=400)
+    queries = body["queries"]
+    if len(queries) > MAX_BATCH_QUERIES:
+        return JsonResponse({"error": f"At most {MAX_BATCH_QUERIES} queries are allowed"}, status=400)
+
+    dataset = body.get("dataset", DEFAULT_DATASET)
+    load_all_graphs()
+    graph = _graph_cache.get(dataset) if isinstance(dataset, str) else None
+    if not graph:
+        return JsonResponse({"error": f"Graph not found: {dataset}"}, status=404)
+
+    debug = request.GET.get("debug") == "1"
+    return JsonResponse({"results": BatchRouter.find_paths(graph, queries, dataset=dataset, debug=debug)}, status=200)
+
+
+#A closure change is allowed for a staff user of a session that passes the CSRF check, and for a request that sends
+#CLOSURES_TOKEN as a bearer token (Authorization: Bearer <token>).
+def _may_change_closures(request):
+    token = getattr(settings, "CLOSURES_TOKEN", None)
+    authorization = request.headers.get("Authorization", "")
+    if token and authorization.startswith("Bearer "):
+        return hmac.compare_digest(authorization[len("Bearer "):].encode(), token.encode())
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated or not user.is_staff:
+        return False
+    return CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {}) is None
+
+
+#Lists the closed nodes and edges of a building (GET ?dataset=LE.json), or closes and reopens them at runtime (POST
+#{"dataset", "close": [...], "reopen": [...], "close_edges": [[a, b], ...], "reopen_edges": [[a, b], ...]}, staff or
+#CLOSURES_TOKEN only, see _may_change_closures). The changed graph is built next to the current one and published as a
+#new version, requests that already run keep the old one. The closures are stored in CLOSURES_PATH, the other worker
+#processes pick them up within GRAPH_RELOAD_INTERVAL seconds, and they are carried over when the building is reloaded.
+@csrf_exempt
+def closures(request):
+    if request.method == "GET":
+        dataset = request.GET.get("dataset", DEFAULT_DATASET)
+        load_all_graphs()
+        graph = _graph_cache.get(dataset)
+        if not graph:
+            return JsonResponse({"error": f"Graph not found: {dataset}"}, status=404)
+        return JsonResponse(graph.get_closures(), status=200)
+    if request.method != "POST":
+        return HttpResponse(status=405)
+    if not _may_change_closures(request):
+        return JsonResponse({"error": "Changing closures needs a staff user or the closures token"}, status=403)
+
+    try:
+        body = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(body, dict):
+        return JsonResponse({"error": "Invalid request"}, status=400)
+    changes = {}
+    for field in ("close", "reopen"):
+        nodes = body.get(field, [])
+        if not isinstance(nodes, list) or not all(isinstance(node, str) for node in nodes):
+            return JsonResponse({"error": f"{field} must be a list of identifiers"}, status=400)
+        changes[field] = nodes
+    for field in ("close_edges", "reopen_edges"):
+        edges = body.get(field, [])
+        if not isinstance(edges, list) or not all(
+                isinstance(edge, list) and len(edge) == 2 and all(isinstance(end, str) for end in edge)
+                for edge in edges):
+            return JsonResponse({"error": f"{field} must be a list of identifier pairs"}, status=400)
+        changes[field] = [tuple(edge) for edge in edges]
+
+    dataset = body.get("dataset", DEFAULT_DATASET)
+    load_all_graphs()
+    if not isinstance(dataset, str) or dataset not in _graph_cache:
+        return JsonResponse({"error": f"Graph not found: {dataset}"}, status=404)
+    try:
+        graph = _graph_cache.modify(dataset, lambda graph: PathFinder.apply_closures(
+            graph, dataset, changes["close"], changes["reopen"], changes["close_edges"], changes["reopen_edges"]))
+    except KeyError as e:
+        return JsonResponse({"error": f"Unknown node or edge: {e.args[0]}"}, status=404)
+    if graph is None:
+        return JsonResponse({"error": f"Graph not found: {dataset}"}, status=404)
+    return JsonResponse(graph.get_closures(), status=200)
+
+
+#The buildings of the manifest and the loaded graphs with their version, load time (Unix time), load duration in
+#seconds, node count, estimated memory and the error of the last failed load. A new version is published whenever a
+#building file changes or its closures change.
+def graphs(request):
+    if request.method != "GET":
+        return HttpResponse(status=405)
+    load_all_graphs()
+    return JsonResponse({
+        "buildings": [building.to_dict() for building in _buildings.buildings().values()],
+        "graphs": _graph_cache.status(),
+        "memory_bytes": _graph_cache.memory_bytes(),
+        "memory_budget_bytes": _graph_cache.memory_budget_bytes,
+    }, status=200)
+
+
+#The metrics of this process in the Prometheus text format: the latency histograms of the route requests, the
+#suggestions and the graph loads, the cache hits and misses and the memory of the loaded graphs.
+def metrics(request):
+    if request.method != "GET":
+        return HttpResponse(status=405)
+    return HttpResponse(_metrics.render(), content_type=MetricsRegistry.content_type)
+
+
+#Orders the stops of a round posted as JSON: {"dataset": "LE.json", "start", "stops": [...], "accessible",
+#"use_closed_corridors", "return_to_start"} and gives back the visiting order with the whole route, see TourPlanner.plan.
+@csrf_exempt
+def tour(request):
+    if request.method != "POST":
+        return HttpResponse(status=405)
+
+    try:
+        body = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(body, dict) or not isinstance(body.get("start"), str) or not isinstance(body.get("stops"), list):
+        return JsonResponse({"error": "The start and the stops list are required"}, status=400)
+    stops = body["stops"]
+    if not all(isinstance(stop, str) for stop in stops):
+        return JsonResponse({"error": "Stops must be strings"}, status=400)
+    if len(stops) > MAX_TOUR_STOPS:
+        return JsonResponse({"error": f"At most {MAX_TOUR_STOPS} stops are allowed"}, status=400)
+    flags = [body.get("accessible", True), body.get("use_closed_corridors", False), body.get("return_to_start", False)]
+    if not all(isinstance(flag, bool) for flag in flags):
+        return JsonResponse({"error": "Flags must be booleans"}, status=400)
+
+    dataset = body.get("dataset", DEFAULT_DATASET)
+    load_all_graphs()
+    graph = _graph_cache.get(dataset) if isinstance(dataset, str) else None
+    if not graph:
+        return JsonResponse({"error": f"Graph not found: {dataset}"}, status=404)
+
+    result = TourPlanner.plan(graph, body["start"], stops, *flags, dataset=dataset)
+    if result is False:
+        return JsonResponse({"error": "Invalid start or stop identifier"}, status=404)
+    return JsonResponse(result, status=200)
+
+
+#Finds the k nearest targetables matching the query text from the source, for example the nearest restroom. The
+#avoidstairs and useclosed settings work like in map_result.
+def nearest(request):
+    if request.method != "GET":
+        return HttpResponse(status=405)
+
+    source = request.GET.get("source", "").strip()
+    search_text = request.GET.get("query", "").strip()
+    dataset = request.GET.get("dataset", DEFAULT_DATASET)
+    avoid_stairs = request.GET.get("avoidstairs", False) == "on"
+    use_closed = request.GET.get("useclosed", False) == "on"
+    if source == "" or search_text == "":
+        return JsonResponse({"error": "The source and the query are required"}, status=400)
+    try:
+        k = int(request.GET.get("k", 1))
+    except ValueError:
+        return JsonResponse({"error": "Invalid k"}, status=400)
+    k = max(1, min(k, MAX_NEAREST_RESULTS))
+
+    load_all_graphs()
+    graph = _graph_cache.get(dataset)
+    if not graph:
+        return JsonResponse({"error": f"Graph not found: {dataset}"}, status=404)
+
+    results = PathFinder.find_nearest(graph, source, search_text, k, avoid_stairs, use_closed)
+    if results is False:
+        return JsonResponse({"error": "Invalid source identifier"}, status=404)
+    return JsonResponse({"results": results}, status=200)
+
+
+#Lists the targetables within a walking distance of the source, given in meters or in seconds of walking, with their
+#distance and level. The avoidstairs and useclosed settings work like in map_result.
+def within(request):
+    if request.method != "GET":
+        return HttpResponse(status=405)
+
+    source = request.GET.get("source", "").strip()
+    dataset = request.GET.get("dataset", DEFAULT_DATASET)
+    avoid_stairs = request.GET.get("avoidstairs", False) == "on"
+    use_closed = request.GET.get("useclosed", False) == "on"
+    try:
+        if "meters" in request.GET:
+            max_distance = float(request.GET["meters"]) * 100
+        elif "seconds" in request.GET:
+            max_distance = float(request.GET["seconds"]) * WALKING_SPEED_CM_PER_S
+        else:
+            return JsonResponse({"error": "Either meters or seconds is required"}, status=400)
+    except ValueError:
+        return JsonResponse({"error": "Invalid distance"}, status=400)
+    if not max_distance >= 0 or max_distance == float("inf"):
+        return JsonResponse({"error": "Invalid distance"}, status=400)
+
+    load_all_graphs()
+    graph = _graph_cache.get(dataset)
+    if not graph:
+        return JsonResponse({"error": f"Graph not found: {dataset}"}, status=404)
+    if source not in graph.get_id_to_index():
+        return JsonResponse({"error": "Invalid source identifier"}, status=404)
+
+    results = [
+        {
+            "identifier": node.get_identifier(),
+            "level": node.get_level(),
+            "meters": distance / 100,
+            "seconds": distance / WALKING_SPEED_CM_PER_S,
+        }
+        for node, distance in graph.targetables_within(source, max_distance, avoid_stairs, use_closed)
+    ]
+    return JsonResponse({"results": results}, status=200)
+
+
 load_all_graphs()
 
 def help(request):
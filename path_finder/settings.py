@@ -49,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'cartographer.SlowRequestProfiler.SlowRequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'path_finder.urls'
@@ -125,3 +126,93 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Route finding
+# Number of finished routes kept by PathFinder's least recently used route cache
+
+ROUTE_CACHE_SIZE = 1024
+
+# Memory budget of the complete shortest path trees kept per graph for the most requested sources, and the number of
+# requests after which a source gets a tree
+
+SHORTEST_PATH_TREE_CACHE_BYTES = 4 * 1024 * 1024
+SHORTEST_PATH_TREE_MIN_REQUESTS = 3
+
+# Walking speed used to turn seconds into distances for /api/within/, 1.4 m/s
+
+WALKING_SPEED_CM_PER_S = 140
+
+# Batch routing (POST /api/routes/): the largest accepted batch, the batch size from which the queries are spread over
+# worker processes, the number of those processes and the seconds after which a stuck run is stopped and answered in
+# the server process. The worker processes are spawned once and kept, they load the graphs from the building files
+
+ROUTE_BATCH_MAX_QUERIES = 5000
+ROUTE_BATCH_PARALLEL_THRESHOLD = 256
+ROUTE_BATCH_WORKERS = os.cpu_count() or 1
+ROUTE_BATCH_TIMEOUT = 60
+
+# Multi-stop tours (POST /api/tour/): the largest accepted number of stops, the number of uncached distance matrix rows
+# from which the searches are spread over ROUTE_BATCH_WORKERS processes, and the number of route lengths cached per graph
+
+TOUR_MAX_STOPS = 50
+TOUR_PARALLEL_THRESHOLD = 32
+TOUR_DISTANCE_CACHE_ENTRIES = 250000
+
+# How the worker processes keep the graphs: "private" loads each graph into the worker's own memory, "shared" compiles
+# the graph snapshots once and maps them read-only, so preforked workers share one copy of every graph
+
+GRAPH_STORAGE = "private"
+
+# Building files larger than this are decoded piece by piece, so the whole document is never in memory at once. The
+# smaller ones are decoded at once, which is 10-20% faster
+
+GRAPH_STREAM_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# Seconds between two checks of the building files, a changed file is loaded in the background and replaces the old
+# graph once it is ready, 0 turns the reloading off
+
+GRAPH_RELOAD_INTERVAL = 2.0
+
+# The buildings are loaded at their first request, the GRAPH_PRELOAD ones when the server starts. When the loaded graphs
+# use more memory than GRAPH_MEMORY_BUDGET_BYTES (estimated, 0 for no limit), the least recently used ones are unloaded
+
+GRAPH_PRELOAD = []
+GRAPH_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+
+# Runtime closures (POST /api/closures/): they are stored in CLOSURES_PATH, so every worker process routes with the
+# same closures (the others pick a change up within GRAPH_RELOAD_INTERVAL seconds). Changing them needs a staff user
+# or this token sent as "Authorization: Bearer <token>", without a token only staff users can change them.
+
+CLOSURES_PATH = BASE_DIR / "closures"
+CLOSURES_TOKEN = os.environ.get("CARTOGRAPHER_CLOSURES_TOKEN")
+
+# Display names of the buildings by file name, the others are shown by their file name without .json
+
+BUILDING_NAMES = {
+    "LE.json": "Lágymányosi Észak",
+}
+
+# Slow request profiling: the call stacks of the PROFILE_PATHS requests are sampled every PROFILE_SAMPLE_INTERVAL
+# seconds, the traces of the requests slower than PROFILE_SLOW_SECONDS (None for none) and of a PROFILE_SAMPLE_RATE
+# share of all of them are written with the request parameters to PROFILE_DIRECTORY, which keeps the newest
+# PROFILE_RING_SIZE traces. The profile_requests command lists them and replays their queries under cProfile.
+
+PROFILE_PATHS = ["/map_result/"]
+PROFILE_SLOW_SECONDS = 1.0
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_DIRECTORY = BASE_DIR / "profiles"
+PROFILE_RING_SIZE = 100
+
+# The graph loading and reloading messages of cartographer are written to the console
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "cartographer": {"handlers": ["console"], "level": "INFO"},
+    },
+}
@@ -1,7 +1,13 @@
 import os
+import gc
+import json
+import time
+import tempfile
+import tracemalloc
 import django
 from django.conf import settings
 from cartographer.Node import GraphBuilder
+from cartographer.GraphSnapshot import GraphSnapshot
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "path_finder.settings")
 django.setup()
@@ -16,4 +22,96 @@ def load_graphs(n):
     return graphs
 
 
+#Memory kept by one graph, measured with tracemalloc, with the object layout or the compact array layout
+def graph_size_bytes(compact):
+    with open(LE_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph = GraphBuilder.from_json(data, compact=compact)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return graph, after - before
+
+
+#Average search time divided by the number of nodes the search settled
+def time_per_settled_node(graph, repeat=50):
+    ids = list(graph.get_id_to_index().keys())
+    source_index = graph.get_index(ids[0])
+    goal_index = graph.get_index(ids[-1])
+    settled = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _, settled = graph._dijkstra_search(source_index, goal_index, False, True)
+    elapsed = time.perf_counter() - start
+    return elapsed / repeat / settled, settled
+
+
+#Average time of loading the graph from the JSON file and from a compiled snapshot
+def load_times(repeat=20):
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, "LE.graph")
+        GraphSnapshot.write(GraphBuilder.from_file(LE_PATH), snapshot_path, source_path=LE_PATH)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            GraphBuilder.from_file(LE_PATH)
+        json_seconds = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            GraphSnapshot.read(snapshot_path)
+        snapshot_seconds = (time.perf_counter() - start) / repeat
+    return json_seconds, snapshot_seconds
+
+
+#Writes a campus export of copies of the LE building (the identifiers get a prefix per copy) into a JSON file
+def write_campus(path, copies):
+    with open(LE_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    points, edges = [], []
+    for copy in range(copies):
+        prefix = f"B{copy}."
+        points.extend(dict(point, identifier=prefix + point["identifier"]) for point in data["points"])
+        edges.extend(dict(edge, **{"from": prefix + edge["from"], "to": prefix + edge["to"]}) for edge in data["edges"])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"levels": data["levels"], "points": points, "edges": edges}, f)
+
+
+#Peak traced memory and time of building the graph of a JSON file by decoding the whole document (from_json) and by
+#streaming it (from_stream)
+def peak_load_memory(path):
+    results = {}
+    for name, build in (
+        ("from_json", lambda f: GraphBuilder.from_json(json.load(f))),
+        ("from_stream", lambda f: GraphBuilder.from_stream(f)),
+    ):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(path, "r", encoding="utf-8") as f:
+            graph = build(f)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = (peak, seconds, graph.node_count())
+        del graph
+    return results
+
+
 load_graphs(1)
+
+_, object_bytes = graph_size_bytes(compact=False)
+compact_graph, compact_bytes = graph_size_bytes(compact=True)
+print(f"Graph memory, object layout: {object_bytes / 1024:.1f} KiB")
+print(f"Graph memory, compact layout: {compact_bytes / 1024:.1f} KiB")
+seconds_per_node, settled_nodes = time_per_settled_node(compact_graph)
+print(f"Dijkstra: {settled_nodes} settled nodes, {seconds_per_node * 1e9:.0f} ns per settled node")
+json_seconds, snapshot_seconds = load_times()
+print(f"Load time, JSON: {json_seconds * 1e3:.1f} ms, snapshot: {snapshot_seconds * 1e3:.1f} ms")
+
+with tempfile.TemporaryDirectory() as directory:
+    campus_path = os.path.join(directory, "campus.json")
+    write_campus(campus_path, 40)
+    for name, (peak, seconds, nodes) in peak_load_memory(campus_path).items():
+        print(f"Campus load ({nodes} nodes), {name}: peak {peak / 1024 / 1024:.1f} MiB, {seconds:.2f} s")
@@ -0,0 +1,146 @@
+import os
+import json
+import tempfile
+import time
+from django.test import TestCase
+from cartographer.Node import *
+from cartographer.BatchRouter import BatchRouter, _run_chunk
+from cartographer.WorkerPool import WorkerPool
+
+
+def corridor_graph():
+    graph = Graph()
+    for index, name in enumerate(["A", "B", "C", "D"]):
+        graph.add_node(Targetable(index, 0, name, False, name != "C", 0))
+    graph.add_edge_by_name("A", "B", 1)
+    graph.add_edge_by_name("B", "C", 1)
+    graph.add_edge_by_name("C", "D", 1)
+    graph.compact()
+    return graph
+
+
+#The corridor graph as a building file, the worker processes load it from there
+def corridor_file(directory):
+    path = os.path.join(directory, "corridor.json")
+    with open(path, "w") as f:
+        json.dump({
+            "levels": {"0": {"x": 0, "y": 0, "pixel_to_cm": 1.0}},
+            "points": [{"x": index, "y": 0, "identifier": name, "targetable": True, "level": 0,
+                        "accessible": name != "C"} for index, name in enumerate(["A", "B", "C", "D"])],
+            "edges": [{"from": "A", "to": "B", "distance": 1}, {"from": "B", "to": "C", "distance": 1},
+                      {"from": "C", "to": "D", "distance": 1}],
+        }, f)
+    return path
+
+
+def sleep_chunk(graph, seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def pid_chunk(graph, seconds):
+    return os.getpid()
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class BatchRouterTests(TestCase):
+    def test_results_keep_query_order(self):
+        graph = corridor_graph()
+        queries = [
+            {"source": "A", "goal": "D", "accessible": False},
+            {"source": "A", "goal": "B"},
+            {"source": "A", "goal": "D"},
+            {"source": "A", "goal": "C", "accessible": False, "algorithm": "astar"},
+            {"source": "A", "goal": "D", "accessible": False},
+        ]
+        results = BatchRouter.find_paths(graph, queries)
+        assert [result["goal"] for result in results] == ["D", "B", "D", "C", "D"]
+        assert results[0]["path"] == PathFinder.find_path(graph, "A", "D", False)
+        assert results[0]["path"] == results[4]["path"]
+        assert [point["x"] for point in results[1]["path"]] == [0, 1]
+        assert results[2]["path"] == []
+        assert len(results[3]["path"]) == 3
+
+    def test_errors_are_reported_inline(self):
+        graph = corridor_graph()
+        results = BatchRouter.find_paths(graph, [
+            {"source": "A", "goal": "X"},
+            {"source": "A", "goal": "B", "algorithm": "teleport"},
+            {"source": "A", "goal": "B", "accessible": "yes"},
+            {"source": 1, "goal": "B"},
+            "A-B",
+            {"source": "B", "goal": "A"},
+        ])
+        assert results[0]["error"] == "Invalid source or goal identifier"
+        assert results[1]["error"] == "Unknown algorithm: teleport"
+        assert results[2]["error"] == "Flags must be booleans"
+        assert results[3]["error"] == "Source and goal must be strings"
+        assert results[4]["error"] == "Query must be an object"
+        assert "error" not in results[5] and len(results[5]["path"]) == 2
+
+    def test_parallel_batch(self):
+        graph = corridor_graph()
+        queries = [{"source": source, "goal": goal, "accessible": False}
+                   for source in ("A", "B", "C", "D") for goal in ("A", "B", "C", "D")]
+        serial = BatchRouter.find_paths(graph, queries)
+        threshold, workers = BatchRouter.parallel_threshold, BatchRouter.workers
+        try:
+            BatchRouter.parallel_threshold, BatchRouter.workers = 1, 2
+            assert BatchRouter.find_paths(graph, queries) == serial
+        finally:
+            BatchRouter.parallel_threshold, BatchRouter.workers = threshold, workers
+
+    def test_parallel_batch_on_worker_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            graph = GraphBuilder.from_file(corridor_file(directory))
+            closed = graph.with_closures(close_nodes=["B"])
+            queries = [{"source": source, "goal": goal, "accessible": False, "use_closed_corridors": False}
+                       for source in ("A", "B", "C", "D") for goal in ("A", "B", "C", "D")]
+            workers = WorkerPool.workers
+            try:
+                WorkerPool.workers = 2
+                groups = [((source, False, False, "dijkstra"), [(0, "D")]) for source in ("A", "C")]
+                assert WorkerPool.run(graph, _run_chunk, [groups[:1], groups[1:]], None) == [
+                    BatchRouter._run_groups(graph, groups[:1], None), BatchRouter._run_groups(graph, groups[1:], None)]
+                assert WorkerPool.run(closed, _run_chunk, [groups], None) == [
+                    BatchRouter._run_groups(closed, groups, None)]
+                assert WorkerPool.run(closed, _run_chunk, [groups], None)[0][0][1]["path"] == []
+                serial = BatchRouter.find_paths(closed, queries)
+                threshold, batch_workers = BatchRouter.parallel_threshold, BatchRouter.workers
+                try:
+                    BatchRouter.parallel_threshold, BatchRouter.workers = 1, 2
+                    assert BatchRouter.find_paths(closed, queries) == serial
+                finally:
+                    BatchRouter.parallel_threshold, BatchRouter.workers = threshold, batch_workers
+            finally:
+                WorkerPool.workers = workers
+                WorkerPool.shutdown()
+
+    def test_worker_timeout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            graph = GraphBuilder.from_file(corridor_file(directory))
+            timeout, workers = WorkerPool.timeout, WorkerPool.workers
+            try:
+                WorkerPool.timeout, WorkerPool.workers = 0.5, 1
+                pid = WorkerPool.run(graph, pid_chunk, [0])[0]
+                start = time.perf_counter()
+                assert WorkerPool.run(graph, sleep_chunk, [30]) is None
+                assert time.perf_counter() - start < 10
+                while process_exists(pid) and time.perf_counter() - start < 10:
+                    time.sleep(0.05)
+                assert not process_exists(pid)
+                WorkerPool.timeout = timeout
+                assert WorkerPool.run(graph, sleep_chunk, [0]) == [0]
+            finally:
+                WorkerPool.timeout, WorkerPool.workers = timeout, workers
+                WorkerPool.shutdown()
+
+    def test_in_memory_graphs_run_in_process(self):
+        assert WorkerPool.run(corridor_graph(), sleep_chunk, [0]) is None
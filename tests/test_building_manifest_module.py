@@ -0,0 +1,54 @@
+import os
+import json
+import tempfile
+from django.test import TestCase
+from cartographer.BuildingManifest import BuildingManifest
+
+
+class BuildingManifestTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.directory.name, "buildings")
+        self.image_path = os.path.join(self.directory.name, "images")
+        os.makedirs(self.data_path)
+        os.makedirs(self.image_path)
+        for name in ("D.json", "notes.txt"):
+            open(os.path.join(self.data_path, name), "w").close()
+        self.write_building("LE.json", ["1", "-1", "0", "10", "2"], points_first=True)
+        self.write_building("LE2.json", ["1"])
+        for name in ("LE1.png", "LE-1.png", "LE0.png", "LEX.png", "LE10.png", "LE21.png", "logo.png"):
+            open(os.path.join(self.image_path, name), "w").close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_building(self, name, levels, points_first=False):
+        document = {"levels": {level: {"x": 0, "y": 0, "pixel_to_cm": 1.0} for level in levels}}
+        if points_first:
+            document = {"points": [{"x": 0, "y": 0, "identifier": "A"}], "notes": "", **document}
+        with open(os.path.join(self.data_path, name), "w") as f:
+            json.dump(document, f)
+
+    def test_discovers_buildings_and_levels(self):
+        manifest = BuildingManifest(self.data_path, self.image_path, {"LE.json": "Lágymányosi Észak"})
+        buildings = manifest.buildings()
+        assert list(buildings) == ["D.json", "LE.json", "LE2.json"]
+        assert buildings["LE.json"].to_dict() == {
+            "file": "LE.json",
+            "name": "Lágymányosi Észak",
+            "levels": [-1, 0, 1, 10],
+            "images": ["LE-1.png", "LE0.png", "LE1.png", "LE10.png"],
+        }
+        assert buildings["LE2.json"].levels == [1] and buildings["LE2.json"].images == ["LE21.png"]
+        assert buildings["D.json"].name == "D" and buildings["D.json"].levels == []
+        assert manifest.get("notes.txt") is None
+
+    def test_follows_directory_changes(self):
+        manifest = BuildingManifest(self.data_path, self.image_path)
+        assert manifest.get("Q.json") is None
+        self.write_building("Q.json", ["2", "3"])
+        open(os.path.join(self.image_path, "Q2.png"), "w").close()
+        for path in (self.data_path, self.image_path):
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        assert manifest.get("Q.json").levels == [2]
@@ -0,0 +1,103 @@
+import os
+import json
+import random
+import struct
+import tempfile
+from django.test import TestCase
+from django.core.management import call_command
+from cartographer.Node import *
+from cartographer.ContractionHierarchy import ContractionHierarchy, HierarchyFile, HIERARCHY_VERSION
+from cartographer.GraphSnapshot import PROFILE_KEYS
+
+
+def grid_data(size=6):
+    points = []
+    edges = []
+    for row in range(size):
+        for column in range(size):
+            points.append({"x": column, "y": row, "identifier": f"{row}-{column}", "targetable": True,
+                           "accessible": (row, column) != (2, 2), "closedCorridor": (row, column) == (3, 1)})
+            if column:
+                edges.append({"from": f"{row}-{column - 1}", "to": f"{row}-{column}", "distance": 1 + (row * column) % 3})
+            if row:
+                edges.append({"from": f"{row - 1}-{column}", "to": f"{row}-{column}", "distance": 1 + (row + column) % 2})
+    return {"points": points, "edges": edges}
+
+
+def route_length(graph, path):
+    length = 0.0
+    for first, second in zip(path, path[1:]):
+        first_index, second_index = graph.get_index(first.get_identifier()), graph.get_index(second.get_identifier())
+        length += min(graph._weights[edge] for edge in range(graph._offsets[first_index], graph._offsets[first_index + 1])
+                      if graph._targets[edge] == second_index)
+    return length
+
+
+class ContractionHierarchyTests(TestCase):
+    def test_routes_match_dijkstra(self):
+        graph = GraphBuilder.from_json(grid_data())
+        identifiers = list(graph.get_id_to_index())
+        pairs = [(random.Random(seed).choice(identifiers), random.Random(-seed).choice(identifiers)) for seed in range(40)]
+        for key in PROFILE_KEYS:
+            graph.set_hierarchies({key: ContractionHierarchy.build(graph, *key)})
+            for source, goal in pairs + [("2-2", "0-0"), ("0-0", "2-2"), ("3-1", "3-1")]:
+                expected = graph.dijkstra(source, goal, *key)
+                path = graph.ch(source, goal, *key)
+                assert route_length(graph, path) == route_length(graph, expected)
+                assert [node.get_identifier() for node in path[:1] + path[-1:]] == \
+                       [node.get_identifier() for node in expected[:1] + expected[-1:]]
+
+    def test_shortcuts_are_unpacked(self):
+        graph = Graph()
+        for index, name in enumerate(["A", "B", "C", "D"]):
+            graph.add_node(Targetable(index, 0, name, False, True, 0))
+        graph.add_edge_by_name("A", "B", 1)
+        graph.add_edge_by_name("B", "C", 1)
+        graph.add_edge_by_name("C", "D", 1)
+        hierarchy = ContractionHierarchy.build(graph, False, False)
+        assert sorted(hierarchy.rank) == [0, 1, 2, 3]
+        path, settled = hierarchy.search(graph, 0, 3, False, False)
+        assert path == [0, 1, 2, 3]
+        assert settled > 0
+
+    def test_without_hierarchy_falls_back_to_dijkstra(self):
+        graph = GraphBuilder.from_json(grid_data(3))
+        assert graph.get_hierarchy(True, False) is None
+        assert PathFinder.find_path(graph, "0-0", "2-2", False, False, "ch") == \
+               PathFinder.find_path(graph, "0-0", "2-2", False, False, "dijkstra")
+
+    def test_hierarchy_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "G.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(grid_data(4), f)
+            path = HierarchyFile.path_for(json_path)
+            assert HierarchyFile.load(json_path, GraphBuilder.from_json(grid_data(4))) is None
+            assert HierarchyFile.build(json_path) == path
+            graph = GraphBuilder.from_file(json_path)
+            hierarchies = HierarchyFile.load(json_path, graph)
+            assert set(hierarchies) == set(PROFILE_KEYS)
+            graph.set_hierarchies(hierarchies)
+            assert PathFinder.find_path(graph, "0-0", "3-3", True, False, "ch") == \
+                   PathFinder.find_path(graph, "0-0", "3-3", True, False, "dijkstra")
+            assert HierarchyFile.load(json_path, GraphBuilder.from_json(grid_data(3))) is None
+            assert HierarchyFile.is_fresh(path, json_path)
+            with open(path, "r+b") as f:
+                f.seek(8)
+                f.write(struct.pack("<I", HIERARCHY_VERSION - 1))
+            assert not HierarchyFile.is_fresh(path, json_path)
+            HierarchyFile.build(json_path)
+            os.utime(json_path, ns=(0, 0))
+            assert HierarchyFile.load(json_path, graph) is None
+
+    def test_build_hierarchies_command(self):
+        data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "cartographer", "static", "buildings")
+        hierarchy_path = os.path.join(data_path, "LE.ch")
+        existed = os.path.exists(hierarchy_path)
+        try:
+            call_command("build_hierarchies", "LE.json", "--force", stdout=open(os.devnull, "w"))
+            assert HierarchyFile.is_fresh(hierarchy_path, os.path.join(data_path, "LE.json"))
+        finally:
+            if not existed and os.path.exists(hierarchy_path):
+                os.remove(hierarchy_path)
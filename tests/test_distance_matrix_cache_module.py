@@ -0,0 +1,17 @@
+from django.test import TestCase
+from cartographer.DistanceMatrixCache import DistanceMatrixCache
+
+
+class DistanceMatrixCacheTests(TestCase):
+    def test_rows_are_merged_and_evicted(self):
+        cache = DistanceMatrixCache(max_entries=4)
+        assert cache.get((0, True, False), [1, 2]) == ({}, [1, 2])
+        cache.put((0, True, False), {1: 5.0, 2: float("inf")})
+        cache.put((0, True, False), {3: 7.0})
+        assert cache.get((0, True, False), [1, 2, 3, 4]) == ({1: 5.0, 2: float("inf"), 3: 7.0}, [4])
+        assert cache.get((0, False, False), [1]) == ({}, [1])
+        cache.put((1, True, False), {0: 5.0, 2: 1.0})
+        assert len(cache) == 2
+        assert cache.get((0, True, False), [1])[1] == [1]
+        stats = cache.stats()
+        assert (stats["evictions"], stats["rows"]) == (1, 1)
@@ -0,0 +1,173 @@
+import json
+import os
+import tempfile
+import threading
+from django.test import TestCase
+from cartographer.Node import *
+from cartographer.GraphRegistry import GraphRegistry
+
+
+#Builds a corridor of the listed node names from a small test file: {"nodes": ["A", "B", ...]}
+def load_corridor(path):
+    with open(path) as f:
+        names = json.load(f)["nodes"]
+    graph = Graph()
+    for position, name in enumerate(names):
+        graph.add_node(Targetable(position, 0, name, False, True, 0))
+    for first, second in zip(names, names[1:]):
+        graph.add_edge_by_name(first, second, 1)
+    graph.compact()
+    return graph
+
+
+class GraphRegistryTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "B.json")
+        self.write(["A", "B", "C"])
+        self.registry = GraphRegistry(self.directory.name, load_corridor, poll_interval=0)
+
+    def tearDown(self):
+        self.registry.stop_watching()
+        self.directory.cleanup()
+
+    def write(self, names, mtime_ns=None):
+        with open(self.path, "w") as f:
+            json.dump({"nodes": names}, f)
+        stat = os.stat(self.path)
+        mtime_ns = mtime_ns if mtime_ns is not None else stat.st_mtime_ns + 1000000000
+        os.utime(self.path, ns=(stat.st_atime_ns, mtime_ns))
+
+    def test_load_and_reload(self):
+        self.registry.start()
+        assert len(self.registry) == 0 and "B.json" in self.registry and "../B.json" not in self.registry
+        graph = self.registry["B.json"]
+        assert graph.node_count() == 3
+        status = self.registry.status()["B.json"]
+        assert status["version"] == 1 and status["nodes"] == 3 and status["error"] is None
+        assert self.registry.check() == []
+
+        self.write(["A", "B", "C", "D"], os.stat(self.path).st_mtime_ns + 2000000000)
+        assert self.registry.check() == ["B.json"]
+        assert self.registry["B.json"].node_count() == 4
+        assert self.registry.version("B.json").version == 2
+        assert graph.node_count() == 3
+
+        os.remove(self.path)
+        self.registry.check()
+        assert "B.json" not in self.registry
+
+    def test_lazy_loading_with_one_load(self):
+        loads = []
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_loader(path):
+            loads.append(path)
+            loading.set()
+            release.wait(5)
+            return load_corridor(path)
+
+        self.registry.loader = slow_loader
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.registry.get("B.json"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        assert loading.wait(5)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(loads) == 1
+        assert len(results) == 4 and all(graph is results[0] for graph in results)
+        assert self.registry.get("Missing.json") is None
+
+    def test_memory_budget_evicts_least_recently_used(self):
+        for name in ("C.json", "D.json"):
+            with open(os.path.join(self.directory.name, name), "w") as f:
+                json.dump({"nodes": ["A", "B", "C"]}, f)
+        size = self.registry["B.json"].memory_bytes()
+        self.registry.memory_budget_bytes = 2 * size + size // 2
+        self.registry["C.json"]
+        self.registry["B.json"]
+        self.registry["D.json"]
+        assert sorted(self.registry) == ["B.json", "D.json"]
+        assert self.registry.memory_bytes() <= self.registry.memory_budget_bytes
+
+        self.registry.modify("B.json", lambda graph: graph.with_closures(close_nodes=["B"]))
+        self.registry["C.json"]
+        self.registry["D.json"]
+        assert sorted(self.registry) == ["B.json", "D.json"]
+        assert self.registry.version("B.json").version == 2
+        self.registry["C.json"]
+        assert self.registry.version("C.json").version == 3
+
+    def test_failed_reload_keeps_version(self):
+        self.registry.start()
+        graph = self.registry["B.json"]
+        with open(self.path, "w") as f:
+            f.write("{")
+        with self.assertLogs("cartographer.GraphRegistry", level="ERROR"):
+            assert self.registry.check() == []
+        assert self.registry["B.json"] is graph
+        assert self.registry.status()["B.json"]["error"] is not None
+        assert self.registry.check() == []
+
+        self.write(["A", "B"])
+        assert self.registry.check() == ["B.json"]
+        assert self.registry.status()["B.json"]["error"] is None
+
+    def test_closures_survive_reload(self):
+        self.registry.start(["B.json"])
+        self.registry.modify("B.json", lambda graph: graph.with_closures(close_nodes=["B"], close_edges=[("C", "B")]))
+        assert self.registry.version("B.json").version == 2
+        self.write(["A", "B", "D", "C"], os.stat(self.path).st_mtime_ns + 2000000000)
+        self.registry.check()
+        assert self.registry["B.json"].get_closures() == {"closed_nodes": ["B"], "closed_edges": []}
+        assert self.registry.version("B.json").base.get_closures()["closed_nodes"] == []
+
+    def test_closures_are_shared_through_the_closures_path(self):
+        closures_path = os.path.join(self.directory.name, "closures")
+        self.registry.closures_path = closures_path
+        other = GraphRegistry(self.directory.name, load_corridor, poll_interval=0, closures_path=closures_path)
+        other["B.json"]
+        self.registry.modify("B.json", lambda graph: graph.with_closures(close_nodes=["B"]))
+        assert other.check() == ["B.json"]
+        assert other["B.json"].get_closures()["closed_nodes"] == ["B"]
+        assert other.check() == []
+
+        other.modify("B.json", lambda graph: graph.with_closures(close_nodes=["C"]))
+        graph = self.registry.modify("B.json", lambda graph: graph.with_closures(reopen_nodes=["B"]))
+        assert graph.get_closures()["closed_nodes"] == ["C"]
+        third = GraphRegistry(self.directory.name, load_corridor, poll_interval=0, closures_path=closures_path)
+        assert third["B.json"].get_closures()["closed_nodes"] == ["C"]
+
+    def test_reads_during_reload(self):
+        self.registry.start()
+        graph = self.registry["B.json"]
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_loader(path):
+            loading.set()
+            release.wait(5)
+            return load_corridor(path)
+
+        self.registry.loader = slow_loader
+        self.write(["A", "B", "C", "D"], os.stat(self.path).st_mtime_ns + 2000000000)
+        reload = threading.Thread(target=self.registry.check)
+        reload.start()
+        assert loading.wait(5)
+        assert self.registry["B.json"] is graph
+        self.registry["B.json"] = graph.with_closures(close_nodes=["C"])
+        release.set()
+        reload.join()
+        assert self.registry["B.json"].node_count() == 4
+        assert self.registry["B.json"].get_closures()["closed_nodes"] == ["C"]
+
+    def test_watcher_reloads_in_background(self):
+        self.registry.poll_interval = 0.01
+        self.registry.start(["B.json"])
+        self.write(["A", "B"], os.stat(self.path).st_mtime_ns + 2000000000)
+        for _ in range(500):
+            if self.registry["B.json"].node_count() == 2:
+                break
+            threading.Event().wait(0.01)
+        assert self.registry["B.json"].node_count() == 2
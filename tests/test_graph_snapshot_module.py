@@ -0,0 +1,119 @@
+import os
+import tempfile
+import json
+from django.test import TestCase
+from django.core.management import call_command
+from cartographer.Node import *
+from cartographer.GraphSnapshot import GraphSnapshot, SnapshotError, IdentifierIndex, StringTable
+
+DATA = {
+    "levels": {"0": {"x": 10, "y": 10, "pixel_to_cm": 2.0}, "1": {"x": 0, "y": 0, "pixel_to_cm": 1.0}},
+    "points": [
+        {"x": 0, "y": 0, "identifier": "A", "targetable": True, "level": 0, "aliases": ["Lab", "Office"]},
+        {"x": 1, "y": 0, "identifier": "B", "targetable": False, "level": 0, "closedCorridor": True},
+        {"x": 2, "y": 0, "identifier": "C", "targetable": True, "level": 1, "accessible": False},
+    ],
+    "edges": [
+        {"from": "A", "to": "B", "distance": 5},
+        {"from": "B", "to": "C", "distance": 7.5},
+        {"from": "A", "to": "C", "distance": 20},
+    ],
+}
+
+
+class GraphSnapshotTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.json_path = os.path.join(self.directory.name, "T.json")
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(DATA, f)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        graph = GraphBuilder.from_json(DATA)
+        path = GraphSnapshot.path_for(self.json_path)
+        GraphSnapshot.write(graph, path, source_path=self.json_path)
+        loaded = GraphSnapshot.read(path)
+
+        assert loaded.node_count() == 3
+        assert loaded.count_edges() == graph.count_edges()
+        assert loaded.levels[0]["pixel_to_cm"] == 2.0
+        assert loaded.node_real_coords_cm(0) == graph.node_real_coords_cm(0)
+        assert loaded.get_node(0).get_aliases() == ("Lab", "Office")
+        assert loaded.get_node(1).is_closed_corridor() is True
+        assert loaded.get_node(2).is_accessible() is False
+        for accessible in (True, False):
+            for use_closed in (True, False):
+                assert (PathFinder.find_path(loaded, "A", "C", accessible, use_closed) ==
+                        PathFinder.find_path(graph, "A", "C", accessible, use_closed))
+        assert [node.get_identifier() for node in loaded.search_for_targetables("off")] == ["A"]
+        for key in ((False, False), (True, False)):
+            assert list(loaded.get_profile(*key).components) == list(graph.get_profile(*key).components)
+        assert loaded.can_reach(0, 2, True, False) is False
+        assert list(loaded.get_landmarks(False, True).landmarks) == list(graph.get_landmarks(False, True).landmarks)
+        assert PathFinder.find_path(loaded, "A", "C", False, True, "alt") == PathFinder.find_path(graph, "A", "C", False, True)
+
+    def test_freshness_and_fallback(self):
+        path = GraphSnapshot.path_for(self.json_path)
+        assert GraphSnapshot.is_fresh(path, self.json_path) is False
+        GraphSnapshot.compile(self.json_path)
+        assert GraphSnapshot.is_fresh(path, self.json_path) is True
+        assert hasattr(GraphSnapshot.load_graph(self.json_path), "snapshot_mapping")
+
+        os.utime(self.json_path, ns=(0, 0))
+        assert GraphSnapshot.is_fresh(path, self.json_path) is False
+        assert not hasattr(GraphSnapshot.load_graph(self.json_path), "snapshot_mapping")
+
+    def test_shared_storage(self):
+        graph = GraphBuilder.from_json(DATA)
+        shared = GraphSnapshot.load_shared(self.json_path)
+        assert GraphSnapshot.is_fresh(GraphSnapshot.path_for(self.json_path), self.json_path)
+        assert isinstance(shared.get_id_to_index(), IdentifierIndex)
+        assert dict(shared.get_id_to_index()) == graph.get_id_to_index()
+        assert shared.get_node(0).get_aliases() == ("Lab", "Office")
+        assert shared.get_profile(True, False).targets.obj is shared.snapshot_mapping
+        for accessible in (True, False):
+            for use_closed in (True, False):
+                assert (PathFinder.find_path(shared, "A", "C", accessible, use_closed) ==
+                        PathFinder.find_path(graph, "A", "C", accessible, use_closed))
+        assert PathFinder.find_path(shared, "A", "X") is False
+        assert [node.get_identifier() for node in shared.search_for_targetables("off")] == ["A"]
+        assert [node.get_identifier() for node in shared.rank_targetables("Ofice")] == ["A"]
+
+    def test_identifier_index(self):
+        strings = [s.encode("utf-8") for s in ["b", "a", "é", "b", "c"]]
+        offsets = [0]
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        order = sorted(range(len(strings)), key=lambda index: (strings[index], index))
+        index = IdentifierIndex(StringTable(offsets, b"".join(strings)), order)
+
+        assert index["a"] == 1
+        assert index["b"] == 3
+        assert index["é"] == 2
+        assert "d" not in index
+        assert index.get(5) is None
+        assert list(index) == ["b", "a", "é", "c"]
+        assert len(index) == 4
+
+    def test_invalid_snapshot(self):
+        path = GraphSnapshot.path_for(self.json_path)
+        with open(path, "wb") as f:
+            f.write(b"not a snapshot" * 10)
+        with self.assertRaises(SnapshotError):
+            GraphSnapshot.read(path)
+        assert GraphSnapshot.load_graph(self.json_path).node_count() == 3
+
+    def test_compile_command(self):
+        data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "cartographer", "static", "buildings")
+        snapshot_path = os.path.join(data_path, "LE.graph")
+        existed = os.path.exists(snapshot_path)
+        try:
+            call_command("compile_graphs", "LE.json", "--force", stdout=open(os.devnull, "w"))
+            assert GraphSnapshot.is_fresh(snapshot_path, os.path.join(data_path, "LE.json"))
+        finally:
+            if not existed and os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
@@ -0,0 +1,31 @@
+import io
+from django.test import TestCase
+from cartographer.JsonStream import JsonStream
+
+
+class JsonStreamTests(TestCase):
+    def test_walks_document(self):
+        text = '{"a": 123456789, "list": [1, {"b": "x y"}, [2, 3]], "empty": [], "object": {}, "c": "end"}'
+        for chunk_size in (1, 4, 1000):
+            stream = JsonStream(io.StringIO(text), chunk_size)
+            values = {}
+            for key in stream.members():
+                if key == "list":
+                    values[key] = list(stream.elements())
+                elif key == "object":
+                    values[key] = list(stream.members())
+                else:
+                    values[key] = stream.value()
+            stream.expect_end()
+            assert values == {"a": 123456789, "list": [1, {"b": "x y"}, [2, 3]], "empty": [], "object": [], "c": "end"}
+
+    def test_invalid_documents(self):
+        for text in ('{"a" 1}', '{"a": [1 2]}', '{"a": "unterminated', '{1: 2}', '[]'):
+            with self.assertRaises(ValueError):
+                stream = JsonStream(io.StringIO(text), 2)
+                for _ in stream.members():
+                    stream.value()
+        stream = JsonStream(io.StringIO('{} {}'))
+        list(stream.members())
+        with self.assertRaises(ValueError):
+            stream.expect_end()
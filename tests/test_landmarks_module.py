@@ -0,0 +1,49 @@
+import math
+from django.test import TestCase
+from cartographer.Node import *
+from cartographer.Landmarks import LandmarkTable
+
+
+def line_graph():
+    graph = Graph()
+    for index, name in enumerate(["A", "B", "C", "D", "E"]):
+        graph.add_node(Targetable(index, 0, name, False, name != "C", 0))
+    graph.add_node(Targetable(9, 9, "Island", False, True, 0))
+    graph.add_edge_by_name("A", "B", 1)
+    graph.add_edge_by_name("B", "C", 2)
+    graph.add_edge_by_name("C", "D", 3)
+    graph.add_edge_by_name("D", "E", 4)
+    graph.add_edge_by_name("A", "E", 20)
+    return graph
+
+
+class LandmarkTableTests(TestCase):
+    def test_farthest_point_selection(self):
+        graph = line_graph()
+        table = LandmarkTable.build(graph, False, False, count=2)
+        assert list(table.landmarks) == [4, 0]
+        assert len(table.distances) == 2 * graph.node_count()
+        assert table.distances[2 * 2] == 7
+        assert math.isinf(table.distances[5 * 2])
+
+    def test_estimates_are_lower_bounds(self):
+        graph = line_graph()
+        for accessible in (True, False):
+            table = graph.get_landmarks(accessible, False)
+            assert graph.get_landmarks(accessible, False) is table
+            for goal in range(5):
+                if not graph.is_usable_index(goal, accessible, False):
+                    continue
+                distances, _ = graph._shortest_path_tree(goal, accessible, False)
+                for node in range(5):
+                    if graph.is_usable_index(node, accessible, False):
+                        assert table.estimate(node, goal) <= distances[node]
+        assert table.estimate(0, 5) == 0.0
+
+    def test_alt_search(self):
+        graph = line_graph()
+        assert [n.get_identifier() for n in graph.alt("A", "E", False)] == ["A", "B", "C", "D", "E"]
+        assert [n.get_identifier() for n in graph.alt("A", "E", True)] == ["A", "E"]
+        assert graph.alt("A", "Island") == []
+        assert PathFinder.find_path(graph, "E", "B", True, False, "alt") == \
+               PathFinder.find_path(graph, "E", "B", True, False, "dijkstra")
@@ -0,0 +1,48 @@
+import threading
+from django.test import TestCase
+from cartographer.Metrics import MetricsRegistry, Histogram
+
+
+class MetricsTests(TestCase):
+    def test_histogram_buckets(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("dataset",), (0.1, 1.0))
+        histogram.observe(0.05, "A.json")
+        histogram.observe(0.1, "A.json")
+        histogram.observe(0.5, "A.json")
+        histogram.observe(5, "A.json")
+        assert histogram.get("A.json") == (4, 5.65)
+        assert histogram.get("B.json") == (0, 0.0)
+        lines = histogram.render()
+        assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+        assert 'latency_seconds_bucket{dataset="A.json",le="0.1"} 2' in lines
+        assert 'latency_seconds_bucket{dataset="A.json",le="1"} 3' in lines
+        assert 'latency_seconds_bucket{dataset="A.json",le="+Inf"} 4' in lines
+        assert 'latency_seconds_count{dataset="A.json"} 4' in lines
+        with self.assertRaises(ValueError):
+            histogram.observe(1.0)
+
+    def test_concurrent_observations(self):
+        histogram = Histogram("latency_seconds", "Latency.", ("outcome",))
+
+        def observe():
+            for _ in range(2000):
+                histogram.observe(0.001, "ok")
+
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert histogram.get("ok")[0] == 16000
+
+    def test_registry_render(self):
+        registry = MetricsRegistry()
+        registry.histogram("latency_seconds", "Latency.")
+        registry.gauge("memory_bytes", "Memory.", ("dataset",), lambda: [(('a"b\\c',), 1024)])
+        registry.counter("hits_total", "Hits.", (), lambda: [((), 3)])
+        text = registry.render()
+        assert text.endswith("\n")
+        assert "# TYPE memory_bytes gauge\nmemory_bytes{dataset=\"a\\\"b\\\\c\"} 1024\n" in text
+        assert "# TYPE hits_total counter\nhits_total 3\n" in text
+        with self.assertRaises(ValueError):
+            registry.gauge("memory_bytes", "Memory.", (), lambda: [])
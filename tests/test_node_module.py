@@ -1,3 +1,7 @@
+import io
+import os
+import json
+import tempfile
 from django.test import TestCase
 from cartographer.Node import *
 
@@ -84,6 +88,40 @@ class NodeGraphTests(TestCase):
         assert [n.get_identifier() for n in path] == ["A","B","C"]
 
 
+    def test_routing_profiles(self):
+        graph = Graph()
+        graph.add_node(Targetable(0,0,"A", False, True, 0))
+        graph.add_node(NotTargetable(1,0,"Stairs", False, False, 0))
+        graph.add_node(NotTargetable(1,1,"Closed", True, True, 0))
+        graph.add_node(Targetable(2,0,"B", False, True, 0))
+        graph.add_edge_by_name("A", "Stairs", 1)
+        graph.add_edge_by_name("Stairs", "B", 1)
+        graph.add_edge_by_name("A", "Closed", 2)
+        graph.add_edge_by_name("Closed", "B", 2)
+        profile = graph.get_profile(True, False)
+        assert graph.get_profile(True, False) is profile
+        assert profile.usable == bytes([1, 0, 0, 1])
+        assert len(profile.targets) == 4
+        assert graph.dijkstra("A", "B", True, False) == []
+        assert [n.get_identifier() for n in graph.dijkstra("A", "B", False, False)] == ["A", "Stairs", "B"]
+        assert [n.get_identifier() for n in graph.astar("A", "B", True, True)] == ["A", "Closed", "B"]
+
+        share_fraction = RoutingProfile.share_fraction
+        try:
+            RoutingProfile.share_fraction = 0.5
+            graph.add_edge_by_name("A", "B", 5)
+            profile = graph.get_profile(True, False)
+            assert profile.targets is graph.get_compact_data()["targets"] and len(profile.targets) == 10
+            assert list(profile.components) == [0, -1, -1, 0]
+            for search in (graph.dijkstra, graph.astar, graph.alt, graph.bidijkstra, graph.biastar):
+                assert [n.get_identifier() for n in search("A", "B", True, False)] == ["A", "B"]
+                assert [n.get_identifier() for n in search("A", "B", False, False)] == ["A", "Stairs", "B"]
+                assert [n.get_identifier() for n in search("Closed", "B", True, False)] == ["Closed", "B"]
+            assert graph.route_lengths(0, [1, 3], True, False) == {1: math.inf, 3: 5}
+        finally:
+            RoutingProfile.share_fraction = share_fraction
+
+
     def test_astar(self):
         graph = Graph()
         node1 = Targetable(0,0,"A", False, True, 0)
@@ -95,6 +133,179 @@ class NodeGraphTests(TestCase):
         assert [n.get_identifier() for n in path] == ["A","B"]
 
 
+    def test_connected_components(self):
+        graph = Graph()
+        graph.add_node(Targetable(0,0,"A", False, True, 0))
+        graph.add_node(NotTargetable(1,0,"Stairs", False, False, 0))
+        graph.add_node(Targetable(2,0,"B", False, True, 0))
+        graph.add_node(Targetable(5,5,"Island", False, True, 0))
+        graph.add_edge_by_name("A", "Stairs", 1)
+        graph.add_edge_by_name("Stairs", "B", 1)
+        assert list(graph.get_profile(False, False).components) == [0, 0, 0, 1]
+        assert list(graph.get_profile(True, False).components) == [0, -1, 1, 2]
+        assert graph.can_reach(0, 2, False, False) is True
+        assert graph.can_reach(0, 2, True, False) is False
+        assert graph.can_reach(1, 2, True, False) is True
+        assert graph.can_reach(0, 1, True, False) is False
+        assert graph.can_reach(3, 3, True, False) is True
+        assert PathFinder.find_path(graph, "A", "B", True, False) == []
+        assert len(PathFinder.find_path(graph, "Stairs", "B", True, False)) == 2
+
+        graph.add_edge_by_name("A", "Island", 1)
+        assert list(graph.get_profile(True, False).components) == [0, -1, 1, 0]
+
+
+    def test_nearest_targetables(self):
+        graph = Graph()
+        graph.add_node(NotTargetable(0,0,"Hall", False, True, 0))
+        graph.add_node(Targetable(1,0,"R1", False, True, 0, "Restroom"))
+        graph.add_node(Targetable(2,0,"R2", False, False, 0, "Restroom"))
+        graph.add_node(Targetable(3,0,"R3", False, True, 0, "Restroom"))
+        graph.add_node(Targetable(4,0,"Office", False, True, 0))
+        graph.add_edge_by_name("Hall", "R1", 5)
+        graph.add_edge_by_name("Hall", "R2", 1)
+        graph.add_edge_by_name("Hall", "R3", 3)
+        graph.add_edge_by_name("R3", "Office", 1)
+        graph.compact()
+        nearest = graph.nearest_targetables("Hall", "restroom", 2, False)
+        assert [(node.get_identifier(), distance) for node, distance, _ in nearest] == [("R2", 1), ("R3", 3)]
+        assert [n.get_identifier() for n in nearest[1][2]] == ["Hall", "R3"]
+        nearest = graph.nearest_targetables("Office", "restroom", 5, True)
+        assert [(node.get_identifier(), distance) for node, distance, _ in nearest] == [("R3", 1), ("R1", 9)]
+        assert graph.nearest_targetables("Hall", "kitchen") == []
+        results = PathFinder.find_nearest(graph, "Hall", "restroom", 1, True)
+        assert results[0]["identifier"] == "R3" and results[0]["distance"] == 3
+        assert [point["x"] for point in results[0]["path"]] == [0, 3]
+        assert PathFinder.find_nearest(graph, "Nowhere", "restroom") is False
+
+
+    def test_targetables_within(self):
+        graph = Graph()
+        graph.add_node(NotTargetable(0,0,"Hall", False, True, 0))
+        graph.add_node(Targetable(1,0,"R1", False, True, 0))
+        graph.add_node(Targetable(2,0,"R2", False, False, 0))
+        graph.add_node(Targetable(3,0,"R3", False, True, 0))
+        graph.add_node(NotTargetable(4,0,"Corridor", False, True, 0))
+        graph.add_node(Targetable(5,0,"Office", False, True, 0))
+        graph.add_edge_by_name("Hall", "R1", 6)
+        graph.add_edge_by_name("Hall", "R2", 1)
+        graph.add_edge_by_name("Hall", "R3", 3)
+        graph.add_edge_by_name("R3", "Corridor", 1)
+        graph.add_edge_by_name("Corridor", "Office", 1)
+        graph.compact()
+        within = graph.targetables_within("Hall", 6, False)
+        assert [(node.get_identifier(), distance) for node, distance in within] == [("R2", 1), ("R3", 3),
+                                                                                  ("Office", 5), ("R1", 6)]
+        within = graph.targetables_within("Hall", 4.5, True)
+        assert [(node.get_identifier(), distance) for node, distance in within] == [("R3", 3)]
+        assert list(graph.targetables_within("R3", 0)) == []
+        search = graph._bounded_search(graph.get_index("Hall"), 100, False, False)
+        assert next(search) == (graph.get_index("Hall"), 0)
+        assert next(search) == (graph.get_index("R2"), 1)
+
+
+    def test_bidirectional_search(self):
+        graph = Graph()
+        graph.add_level_metadata(0, 0, 0, 100.0)
+        graph.add_level_metadata(1, 0, 0, 100.0)
+        graph.add_node(NotTargetable(0,0,"A", True, True, 0))
+        graph.add_node(NotTargetable(1,0,"B", False, True, 0))
+        graph.add_node(NotTargetable(2,0,"Stairs", False, True, 0))
+        graph.add_node(NotTargetable(2,0,"Landing", False, True, 1))
+        graph.add_node(NotTargetable(1,1,"Lift", False, False, 0))
+        graph.add_node(Targetable(3,0,"C", False, True, 1))
+        graph.add_edge_by_name("A", "B", 100)
+        graph.add_edge_by_name("B", "Stairs", 100)
+        graph.add_edge_by_name("Stairs", "Landing", 150)
+        graph.add_edge_by_name("Landing", "C", 100)
+        graph.add_edge_by_name("B", "Lift", 50)
+        graph.add_edge_by_name("Lift", "C", 150)
+        assert graph.get_consistent_heuristic() == (0.5, 100.0)
+        for algorithm in (graph.bidijkstra, graph.biastar):
+            assert [n.get_identifier() for n in algorithm("A", "C", False)] == ["A", "B", "Lift", "C"]
+            assert [n.get_identifier() for n in algorithm("C", "A", True)] == []
+            assert [n.get_identifier() for n in algorithm("A", "C", True, True)] == ["A", "B", "Stairs", "Landing", "C"]
+            assert [n.get_identifier() for n in algorithm("C", "A", True, True)] == ["C", "Landing", "Stairs", "B", "A"]
+            assert [n.get_identifier() for n in algorithm("C", "C")] == ["C"]
+        assert PathFinder.find_path(graph, "A", "C", False, False, "bidijkstra") == \
+               PathFinder.find_path(graph, "A", "C", False, False, "dijkstra")
+
+
+    def test_alternative_routes(self):
+        graph = Graph()
+        for index, name in enumerate(["A", "B", "C", "D", "E", "F"]):
+            graph.add_node(NotTargetable(index, 0, name, False, name != "E", 0))
+        graph.add_edge_by_name("A", "B", 1)
+        graph.add_edge_by_name("B", "F", 1)
+        graph.add_edge_by_name("A", "C", 1)
+        graph.add_edge_by_name("C", "F", 1.2)
+        graph.add_edge_by_name("A", "D", 1)
+        graph.add_edge_by_name("D", "F", 1.3)
+        graph.add_edge_by_name("A", "E", 1)
+        graph.add_edge_by_name("E", "F", 1.1)
+        graph.compact()
+        routes = graph.alternative_routes("A", "F", 3, False)
+        assert [[n.get_identifier() for n in route] for route in routes] == [["A", "B", "F"], ["A", "E", "F"],
+                                                                            ["A", "C", "F"]]
+        routes = graph.alternative_routes("A", "F", 5, True, max_stretch=1.1)
+        assert [[n.get_identifier() for n in route] for route in routes] == [["A", "B", "F"], ["A", "C", "F"]]
+        assert graph.alternative_routes("A", "E", 2, True) == []
+        paths = PathFinder.find_alternatives(graph, "A", "F", 2, False)
+        assert [[point["x"] for point in path] for path in paths] == [[0, 1, 5], [0, 4, 5]]
+        assert PathFinder.find_path(graph, "A", "F", False) == paths[0]
+        assert PathFinder.find_alternatives(graph, "A", "F", 1, False) == [paths[0]]
+        assert PathFinder.find_alternatives(graph, "A", "Z", 2) is False
+
+    def test_memory_bytes(self):
+        graph = Graph()
+        for index in range(100):
+            graph.add_node(Targetable(index, 0, f"N{index}", False, True, 0))
+        for index in range(99):
+            graph.add_edge_by_name(f"N{index}", f"N{index + 1}", 1)
+        graph.compact()
+        size = graph.memory_bytes()
+        assert size > 100 * 8
+        graph.get_profile(True, False)
+        assert graph.with_closures(close_nodes=["N5"]).memory_bytes() > size
+
+    def test_with_closures(self):
+        graph = Graph()
+        for index, name in enumerate(["A", "B", "C", "D", "E"]):
+            graph.add_node(Targetable(index, 0, name, False, True, 0))
+        graph.add_edge_by_name("A", "B", 1)
+        graph.add_edge_by_name("B", "C", 1)
+        graph.add_edge_by_name("A", "D", 2)
+        graph.add_edge_by_name("D", "C", 2)
+        graph.add_node(Targetable(9, 0, "Far", False, True, 0))
+        graph.add_edge_by_name("E", "Far", 1)
+        graph.compact()
+        graph.tree_cache = ShortestPathTreeCache(min_requests=1)
+        for source in ("A", "E"):
+            for use_closed in (False, True):
+                graph.dijkstra(source, "C" if source == "A" else "Far", False, use_closed)
+        graph.get_landmarks(False, False)
+
+        closed = graph.with_closures(close_nodes=["B"])
+        cached = sorted((source["source"], source["use_closed_corridors"])
+                        for source in closed.tree_cache_stats()["sources"])
+        assert cached == [("A", True), ("E", False), ("E", True)]
+        assert [n.get_identifier() for n in closed.dijkstra("A", "C", False)] == ["A", "D", "C"]
+        assert [n.get_identifier() for n in closed.dijkstra("A", "C", False, True)] == ["A", "B", "C"]
+        assert [n.get_identifier() for n in graph.dijkstra("A", "C", False)] == ["A", "B", "C"]
+        assert closed.get_profile(False, True) is graph.get_profile(False, True)
+        assert closed.get_landmarks(False, False) is graph.get_landmarks(False, False)
+        assert closed.get_closures() == {"closed_nodes": ["B"], "closed_edges": []}
+
+        reopened = closed.with_closures(reopen_nodes=["B"], close_edges=[("C", "D")])
+        assert reopened.get_closures() == {"closed_nodes": [], "closed_edges": [["C", "D"]]}
+        assert sorted(source["use_closed_corridors"] for source in reopened.tree_cache_stats()["sources"]) == \
+            [True, True]
+        assert reopened.get_landmarks(False, False) is not graph.get_landmarks(False, False)
+        assert PathFinder.find_path(reopened.with_closures(close_nodes=["B"]), "A", "C", False) == []
+        assert len(PathFinder.find_path(reopened.with_closures(close_nodes=["B"]), "A", "C", False, True)) == 3
+        with self.assertRaises(KeyError):
+            graph.with_closures(close_edges=[("A", "C")])
+
     def test_real_coordinates(self):
         graph = Graph()
         graph.add_level_metadata(0, 10, 10, 2.0)
@@ -120,6 +331,48 @@ class NodeGraphTests(TestCase):
         assert graph.count_edges() == 2
 
 
+    def test_from_stream(self):
+        data = {
+            "levels": {"0": {"x": 0, "y": 0, "pixel_to_cm": 1.0}, "1": {"x": 5, "y": 5, "pixel_to_cm": 2.5}},
+            "points": [
+                {"x": 0, "y": 0, "identifier": "A", "targetable": True, "level": 0, "aliases": ["Lab 1"]},
+                {"x": 12345, "y": 1, "identifier": "B", "targetable": False, "level": 0},
+                {"x": 2, "y": 67890, "identifier": "C", "targetable": True, "level": 1, "closedCorridor": True},
+            ],
+            "edges": [
+                {"from": "A", "to": "B", "distance": 5},
+                {"from": "B", "to": "C", "distance": 7.25},
+                {"from": "C", "to": "Missing", "distance": 1},
+                {"from": "A", "to": "C"},
+            ]
+        }
+        expected = GraphBuilder.from_json(data).get_compact_data()
+        edges_first = {"edges": data["edges"], "notes": [{"text": "ignored"}], "points": data["points"],
+                       "levels": data["levels"]}
+        for document in (data, edges_first):
+            for chunk_size in (3, 65536):
+                graph = GraphBuilder.from_stream(io.StringIO(json.dumps(document, indent=2)), chunk_size=chunk_size)
+                assert {name: list(values) for name, values in graph.get_compact_data().items()} == \
+                    {name: list(values) for name, values in expected.items()}
+                assert graph.levels == GraphBuilder.from_json(data).levels
+        with self.assertRaises(ValueError):
+            GraphBuilder.from_stream(io.StringIO(json.dumps(data) + " []"))
+        with self.assertRaises(ValueError):
+            GraphBuilder.from_stream(io.StringIO(json.dumps(data)[:-20]))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "building.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+            threshold = GraphBuilder.stream_threshold_bytes
+            try:
+                for GraphBuilder.stream_threshold_bytes, stream in ((threshold, None), (0, None), (threshold, True)):
+                    graph = GraphBuilder.from_file(path, stream=stream)
+                    assert {name: list(values) for name, values in graph.get_compact_data().items()} == \
+                        {name: list(values) for name, values in expected.items()}
+            finally:
+                GraphBuilder.stream_threshold_bytes = threshold
+
+
     def test_pathfinder_success(self):
         graph = Graph()
         node1 = Targetable(0,0,"A", False, True, 0)
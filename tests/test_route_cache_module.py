@@ -0,0 +1,102 @@
+import threading
+from django.test import TestCase
+from cartographer.Node import *
+from cartographer.RouteCache import RouteCache
+
+
+def build_graph():
+    graph = Graph()
+    graph.add_node(Targetable(0,0,"A", False, True, 0))
+    graph.add_node(Targetable(1,0,"B", False, True, 0))
+    graph.add_node(Targetable(2,0,"C", False, True, 0))
+    graph.add_edge_by_name("A", "B", 1)
+    graph.add_edge_by_name("B", "C", 1)
+    return graph
+
+
+class RouteCacheTests(TestCase):
+    def test_hit_and_miss(self):
+        cache = RouteCache(maxsize=4)
+        graph = build_graph()
+        key = ("G", "A", "C", True, False, "dijkstra")
+        assert cache.get(graph, key) is None
+        cache.put(graph, key, [{"x": 0, "y": 0, "level": 0}])
+        path = cache.get(graph, key)
+        assert path == [{"x": 0, "y": 0, "level": 0}]
+        path[0]["x"] = 5
+        assert cache.get(graph, key)[0]["x"] == 0
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+
+    def test_lru_eviction(self):
+        cache = RouteCache(maxsize=2)
+        graph = build_graph()
+        cache.put(graph, ("G", 1), [])
+        cache.put(graph, ("G", 2), [])
+        cache.get(graph, ("G", 1))
+        cache.put(graph, ("G", 3), [])
+        assert cache.get(graph, ("G", 2)) is None
+        assert cache.get(graph, ("G", 1)) == []
+        assert cache.stats()["evictions"] == 1
+
+
+    def test_replaced_graph_invalidates_dataset(self):
+        cache = RouteCache(maxsize=4)
+        old_graph = build_graph()
+        new_graph = build_graph()
+        cache.put(old_graph, ("G", 1), [])
+        cache.put(old_graph, ("H", 1), [])
+        assert cache.get(new_graph, ("G", 1)) is None
+        assert cache.get(old_graph, ("H", 1)) == []
+        assert cache.stats()["invalidations"] == 1
+
+
+    def test_closures_keep_unaffected_routes(self):
+        graph = build_graph()
+        graph.add_node(Targetable(1,1,"D", False, True, 0))
+        graph.add_edge_by_name("A", "D", 1)
+        graph.add_edge_by_name("D", "C", 1)
+        graph.compact()
+        cache = PathFinder.route_cache
+        cache.clear()
+        for goal in ("B", "C", "D"):
+            for use_closed in (False, True):
+                PathFinder.find_path(graph, "A", goal, True, use_closed, dataset="G")
+        closed = PathFinder.apply_closures(graph, "G", close_nodes=["B"])
+        assert len(cache) == 4
+        assert PathFinder.find_path(closed, "A", "B", True, False, dataset="G") == []
+        assert cache.stats()["invalidations"] == 2
+        reopened = PathFinder.apply_closures(closed, "G", reopen_nodes=["B"])
+        assert len(cache) == 3
+        assert len(PathFinder.find_path(reopened, "A", "B", True, False, dataset="G")) == 2
+        cache.clear()
+
+    def test_find_path_uses_cache(self):
+        graph = build_graph()
+        PathFinder.route_cache.clear()
+        first = PathFinder.find_path(graph, "A", "C", dataset="test.json")
+        hits = PathFinder.route_cache.stats()["hits"]
+        second = PathFinder.find_path(graph, "A", "C", dataset="test.json")
+        assert first == second
+        assert PathFinder.route_cache.stats()["hits"] == hits + 1
+
+
+    def test_concurrent_access(self):
+        cache = RouteCache(maxsize=8)
+        graph = build_graph()
+
+        def worker(offset):
+            for i in range(200):
+                key = ("G", (i + offset) % 16)
+                if cache.get(graph, key) is None:
+                    cache.put(graph, key, [])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        assert stats["size"] <= 8
+        assert stats["hits"] + stats["misses"] == 800
@@ -0,0 +1,64 @@
+from django.test import TestCase
+from cartographer.SearchIndex import BKTree, SearchIndex, edit_distance, fold_text, text_grams
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        identifiers = ["LÉ-1-131", "LÉ-1-134A", "EF.-1.1", "Kitchen", "RoomB"]
+        aliases = [("Labor",), (), (), ("Első", "Second"), ()]
+        targetable = [1, 1, 0, 1, 1]
+        self.index = SearchIndex(identifiers, aliases, targetable)
+
+    def test_fold_text(self):
+        assert fold_text("LÉ-1") == "le-1"
+        assert fold_text("Első") == "elso"
+        assert text_grams("abcd") == {"abc", "bcd"}
+
+    def test_candidates_are_accent_insensitive(self):
+        assert list(self.index.candidates("le-1")) == [0, 1]
+        assert list(self.index.candidates("ELSO")) == [2]
+        assert list(self.index.candidates("missing")) == []
+
+    def test_search_keeps_substring_semantics(self):
+        assert self.index.search("lé-1") == [0, 1]
+        assert self.index.search("le-1") == []
+        assert self.index.search("134a") == [1]
+        assert self.index.search("sec") == [3]
+        assert self.index.search("ef.") == []
+        assert self.index.search("") == []
+
+    def test_search_limit(self):
+        assert self.index.search("o", limit=2) == [0, 3]
+
+    def test_edit_distance(self):
+        assert edit_distance("kitten", "sitting") == 3
+        assert edit_distance("", "abc") == 3
+        assert edit_distance("le-1-131", "le-1-131") == 0
+        assert edit_distance("le-1-131", "le-1-113") == 2
+
+    def test_bk_tree(self):
+        tree = BKTree()
+        for value, word in enumerate(["room", "rooms", "broom", "kitchen", "room"]):
+            tree.add(word, value)
+        found = {word: (distance, values) for distance, word, values in tree.search("roam", 1)}
+        assert found == {"room": (1, [0, 4])}
+
+    def test_rank_orders_match_types(self):
+        index = SearchIndex(
+            ["LAB-2", "XLAB", "LAB", "ROOM-1", "ROOM-2"],
+            [(), (), (), ("Big lab",), ()],
+            [1, 1, 1, 1, 1],
+        )
+        assert index.rank("lab") == [2, 0, 1, 3]
+        assert index.rank("lab", limit=2) == [2, 0]
+        assert index.rank("ROOM-3") == [3, 4]
+        assert index.rank("  ") == []
+
+    def test_arrays_are_compact(self):
+        arrays = self.index.get_arrays()
+        assert arrays["postings"].typecode == "H"
+        assert arrays["folded"] == "le-1-131\0labor\0le-1-134a\0kitchen\0elso\0second\0roomb\0"
+        assert list(arrays["folded_offsets"]) == [0, 15, 25, 45, 51]
+        copy = SearchIndex.from_arrays(arrays, self.index._identifiers, self.index._aliases)
+        assert copy.search("lé-1") == [0, 1]
+        assert copy.rank("elso") == [3]
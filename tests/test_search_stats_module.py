@@ -0,0 +1,56 @@
+import heapq
+from django.test import TestCase
+from cartographer.Node import *
+from cartographer.SearchStats import SearchStats
+
+
+def build_graph():
+    graph = Graph()
+    graph.add_node(Targetable(0,0,"A", False, True, 0))
+    graph.add_node(Targetable(1,0,"B", False, True, 0))
+    graph.add_node(Targetable(2,0,"C", False, True, 0))
+    graph.add_node(Targetable(3,0,"D", False, True, 0))
+    graph.add_node(Targetable(9,0,"E", False, True, 0))
+    graph.add_edge_by_name("A", "B", 1)
+    graph.add_edge_by_name("B", "C", 1)
+    graph.add_edge_by_name("A", "C", 3)
+    graph.add_edge_by_name("C", "D", 1)
+    return graph
+
+
+class SearchStatsTests(TestCase):
+    def test_heap_functions(self):
+        assert SearchStats.heap_functions(None) == (heapq.heappop, heapq.heappush)
+        stats = SearchStats()
+        heappop, heappush = SearchStats.heap_functions(stats)
+        heap = []
+        heappush(heap, 2)
+        heappush(heap, 1)
+        assert heappop(heap) == 1
+        assert stats.heap_pushes == 2 and stats.heap_pops == 1 and stats.edges_relaxed == 2
+
+    def test_find_path_statistics(self):
+        graph = build_graph()
+        for algorithm in ("dijkstra", "astar", "bidijkstra", "biastar"):
+            PathFinder.route_cache.clear()
+            stats = SearchStats()
+            path = PathFinder.find_path(graph, "A", "D", algorithm=algorithm, stats=stats)
+            assert path == PathFinder.find_path(graph, "A", "D", algorithm=algorithm)
+            result = stats.to_dict()
+            assert result["algorithm"] == algorithm and result["answered_by"] == "search"
+            assert result["settled"] > 0 and result["heap_pops"] >= result["stale_pops"]
+            assert result["path_nodes"] == 4 and result["path_length"] == 3
+            assert "search" in result["timings_ms"] and "total" in result["timings_ms"]
+
+    def test_answered_by(self):
+        graph = build_graph()
+        PathFinder.route_cache.clear()
+        PathFinder.find_path(graph, "A", "D", dataset="stats.json")
+        stats = SearchStats()
+        PathFinder.find_path(graph, "A", "D", dataset="stats.json", stats=stats)
+        assert stats.answered_by == "route_cache" and stats.settled == 0
+
+        stats = SearchStats()
+        assert PathFinder.find_path(graph, "A", "E", stats=stats) == []
+        assert stats.answered_by == "unreachable"
+        PathFinder.route_cache.clear()
@@ -0,0 +1,65 @@
+from django.test import TestCase
+from cartographer.Node import *
+from cartographer.ShortestPathTreeCache import ShortestPathTreeCache
+
+
+def line_graph():
+    graph = Graph()
+    for index, name in enumerate(["A", "B", "C", "D"]):
+        graph.add_node(Targetable(index, 0, name, False, name != "D", 0))
+    graph.add_edge_by_name("A", "B", 1)
+    graph.add_edge_by_name("B", "C", 1)
+    graph.add_edge_by_name("C", "D", 1)
+    return graph
+
+
+class ShortestPathTreeCacheTests(TestCase):
+    def test_frequent_source_gets_tree(self):
+        cache = ShortestPathTreeCache(min_requests=2)
+        key = (0, True, False)
+        assert cache.get(key) is None
+        assert cache.wants(key, 4) is False
+        assert cache.get(key) is None
+        assert cache.wants(key, 4) is True
+        cache.put(key, [0.0, 1.0, 2.0, float("inf")], [None, 0, 1, None])
+        distances, previous = cache.get(key)
+        assert list(previous) == [-1, 0, 1, -1]
+        assert distances[2] == 2.0
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 2)
+        assert stats["sources"][0]["hit_rate"] == 1 / 3
+        assert stats["size_bytes"] == ShortestPathTreeCache.tree_bytes(4)
+
+    def test_budget_evicts_least_requested(self):
+        cache = ShortestPathTreeCache(budget_bytes=ShortestPathTreeCache.tree_bytes(2) * 2, min_requests=1)
+        tree = ([0.0, 1.0], [None, 0])
+        for source, requests in ((0, 2), (1, 3)):
+            for _ in range(requests):
+                cache.get((source, True, False))
+            cache.put((source, True, False), *tree)
+        cache.get((2, True, False))
+        assert cache.wants((2, True, False), 2) is False
+        for _ in range(4):
+            cache.get((2, True, False))
+        assert cache.wants((2, True, False), 2) is True
+        cache.put((2, True, False), *tree)
+        assert [source["source_index"] for source in cache.stats()["sources"]] == [2, 1]
+        assert cache.evictions == 1
+        cache.put((3, True, False), [0.0] * 10, [None] * 10)
+        assert len(cache) == 2
+
+    def test_graph_answers_from_tree(self):
+        graph = line_graph()
+        graph.tree_cache = ShortestPathTreeCache(min_requests=2)
+        expected = [node.get_identifier() for node in graph.dijkstra("A", "C")]
+        for goal in ("C", "B", "A", "D"):
+            graph.dijkstra("A", goal)
+        assert [node.get_identifier() for node in graph.dijkstra("A", "C")] == expected == ["A", "B", "C"]
+        assert graph.dijkstra("A", "D") == []
+        assert [node.get_identifier() for node in graph.dijkstra("A", "A")] == ["A"]
+        stats = graph.tree_cache_stats()
+        assert stats["sources"][0]["source"] == "A"
+        assert (stats["sources"][0]["requests"], stats["sources"][0]["hits"]) == (8, 6)
+
+        graph.add_node(Targetable(9, 9, "E", False, True, 0))
+        assert len(graph.tree_cache) == 0
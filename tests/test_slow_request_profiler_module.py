@@ -0,0 +1,77 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from cartographer.SlowRequestProfiler import ProfileRing, StackSampler, SlowRequestProfilerMiddleware
+from cartographer.views import _graph_cache
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class SlowRequestProfilerTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_ring_keeps_the_newest_traces(self):
+        ring = ProfileRing(self.directory.name, capacity=3)
+        names = [ring.write({"index": index}) for index in range(5)]
+        assert ring.names() == names[2:]
+        assert ring.read(names[4])["index"] == 4 and ring.read(names[4])["id"] == names[4]
+        assert ring.read(names[0]) is None
+        assert ring.read("../" + names[4]) is None
+
+    def test_sampler_counts_stacks(self):
+        sampler = StackSampler(0.001)
+        thread_id = threading.get_ident()
+        sampler.start(thread_id)
+        busy_wait(0.1)
+        stacks = sampler.stop(thread_id)
+        assert sum(stacks.values()) > 0
+        assert any("busy_wait" in stack for stack in stacks)
+        assert sampler.stop(thread_id) == {}
+
+    def test_disabled_without_threshold_and_rate(self):
+        with override_settings(PROFILE_SLOW_SECONDS=None, PROFILE_SAMPLE_RATE=0.0):
+            with self.assertRaises(MiddlewareNotUsed):
+                SlowRequestProfilerMiddleware(lambda request: None)
+
+    def test_slow_requests_are_kept_and_replayed(self):
+        graph = _graph_cache["LE.json"]
+        source, goal = list(graph.get_id_to_index())[:2]
+        params = {"sourceinput": source, "goalinput": goal, "dataset": "LE.json", "avoidstairs": "on"}
+        with override_settings(PROFILE_SLOW_SECONDS=0, PROFILE_DIRECTORY=self.directory.name, PROFILE_RING_SIZE=5):
+            client = Client()
+            client.get(reverse("map_result"), params)
+            client.get(reverse("search"), {"node": "a"})
+            ring = ProfileRing(self.directory.name)
+            assert len(ring.names()) == 1
+            trace = ring.read(ring.names()[0])
+            assert trace["reason"] == "slow" and trace["status"] == 200 and trace["params"] == params
+
+            output = io.StringIO()
+            call_command("profile_requests", "list", stdout=output)
+            assert ring.names()[0] in output.getvalue() and f"{source} -> {goal}" in output.getvalue()
+            output = io.StringIO()
+            call_command("profile_requests", "replay", ring.names()[0], "--limit", "5", stdout=output)
+            assert "points" in output.getvalue() and "find_path" in output.getvalue()
+            call_command("profile_requests", "show", stdout=io.StringIO())
+            with self.assertRaises(Exception):
+                call_command("profile_requests", "show", "missing", stdout=io.StringIO())
+
+        with override_settings(PROFILE_SLOW_SECONDS=60, PROFILE_SAMPLE_RATE=1.0,
+                               PROFILE_DIRECTORY=self.directory.name):
+            Client().get(reverse("map_result"), params)
+            ring = ProfileRing(self.directory.name)
+            assert ring.read(ring.names()[-1])["reason"] == "sampled"
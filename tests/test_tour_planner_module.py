@@ -0,0 +1,96 @@
+import os
+import json
+import math
+import random
+import tempfile
+from django.test import TestCase
+from cartographer.Node import *
+from cartographer.TourPlanner import TourPlanner, _search_rows
+from cartographer.WorkerPool import WorkerPool
+
+
+def corridor_graph():
+    graph = Graph()
+    for index, name in enumerate(["A", "B", "C", "D", "E", "F"]):
+        graph.add_node(Targetable(index, 0, name, False, name != "F", 0))
+    for first, second in (("A", "B"), ("B", "C"), ("C", "D"), ("D", "E"), ("E", "F")):
+        graph.add_edge_by_name(first, second, 1)
+    graph.compact()
+    return graph
+
+
+class TourPlannerTests(TestCase):
+    def test_plan_orders_stops(self):
+        graph = corridor_graph()
+        tour = TourPlanner.plan(graph, "B", ["E", "A", "D", "A", "B"], accessible=False)
+        assert tour["order"] == ["A", "D", "E"]
+        assert tour["distance"] == 5
+        assert tour["unreachable"] == []
+        assert [point["x"] for point in tour["path"]] == [1, 0, 1, 2, 3, 4]
+        assert [(point["x"], point["stop"], point["stop_number"]) for point in tour["path"] if "stop" in point] == \
+            [(1, "B", 0), (0, "A", 1), (3, "D", 2), (4, "E", 3)]
+        assert all(set(point) >= {"x", "y", "level"} for point in tour["path"])
+
+    def test_plan_returns_to_start(self):
+        graph = corridor_graph()
+        tour = TourPlanner.plan(graph, "C", ["A", "E", "F"], accessible=True, return_to_start=True)
+        assert tour["unreachable"] == ["F"]
+        assert tour["distance"] == 8
+        assert tour["path"][-1]["stop"] == "C" and tour["path"][-1]["stop_number"] == 0
+        assert TourPlanner.plan(graph, "C", ["X"]) is False
+
+    def test_distance_matrix_is_cached_per_profile(self):
+        graph = corridor_graph()
+        nodes = [graph.get_index(name) for name in ("A", "C", "F")]
+        assert TourPlanner.distance_matrix(graph, nodes, False, False) == [[0, 2, 5], [2, 0, 3], [5, 3, 0]]
+        assert graph.distance_cache.stats()["misses"] == 9
+        TourPlanner.distance_matrix(graph, nodes, False, False)
+        assert graph.distance_cache.stats()["misses"] == 9
+        assert TourPlanner.distance_matrix(graph, nodes, True, False)[0] == [0, 2, math.inf]
+        threshold, workers = TourPlanner.parallel_threshold, TourPlanner.workers
+        try:
+            TourPlanner.parallel_threshold, TourPlanner.workers = 1, 2
+            graph.distance_cache.clear()
+            assert TourPlanner.distance_matrix(graph, nodes, False, True)[2] == [5, 3, 0]
+        finally:
+            TourPlanner.parallel_threshold, TourPlanner.workers = threshold, workers
+
+    def test_distance_matrix_on_worker_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "corridor.json")
+            names = ["A", "B", "C", "D", "E", "F"]
+            with open(path, "w") as f:
+                json.dump({
+                    "levels": {"0": {"x": 0, "y": 0, "pixel_to_cm": 1.0}},
+                    "points": [{"x": index, "y": 0, "identifier": name, "targetable": True, "level": 0}
+                               for index, name in enumerate(names)],
+                    "edges": [{"from": first, "to": second, "distance": 1} for first, second in zip(names, names[1:])],
+                }, f)
+            graph = GraphBuilder.from_file(path).with_closures(close_nodes=["D"])
+            nodes = [graph.get_index(name) for name in ("A", "C", "F")]
+            workers, threshold, pool_workers = TourPlanner.workers, TourPlanner.parallel_threshold, WorkerPool.workers
+            try:
+                TourPlanner.parallel_threshold, TourPlanner.workers, WorkerPool.workers = 1, 2, 2
+                assert WorkerPool.run(graph, _search_rows, [nodes[:1]], nodes, False, False) == [
+                    [(nodes[0], {nodes[0]: 0, nodes[1]: 2, nodes[2]: math.inf})]]
+                assert TourPlanner.distance_matrix(graph, nodes, False, True) == [[0, 2, 5], [2, 0, 3], [5, 3, 0]]
+                assert graph.distance_cache.stats()["misses"] == 0
+            finally:
+                TourPlanner.parallel_threshold, TourPlanner.workers = threshold, workers
+                WorkerPool.workers = pool_workers
+                WorkerPool.shutdown()
+
+    def test_heuristic_order_close_to_exact(self):
+        generator = random.Random(7)
+        points = [(generator.random(), generator.random()) for _ in range(10)]
+        matrix = [[math.dist(a, b) for b in points] for a in points]
+        exact = TourPlanner.tour_length(matrix, TourPlanner.order_stops(matrix, True), True)
+        limit = TourPlanner.exact_limit
+        try:
+            TourPlanner.exact_limit = 0
+            order = TourPlanner.order_stops(matrix, True)
+        finally:
+            TourPlanner.exact_limit = limit
+        assert sorted(order) == list(range(1, 10))
+        nearest_neighbour = TourPlanner.tour_length(matrix, TourPlanner._nearest_neighbour(matrix), True)
+        assert exact <= TourPlanner.tour_length(matrix, order, True) <= nearest_neighbour
@@ -1,25 +1,41 @@
-from django.test import TestCase, Client
+import json
+import tempfile
+from django.contrib.auth.models import User
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.messages import get_messages
-from cartographer.views import _graph_cache, load_all_graphs
+from cartographer.views import _graph_cache, _metrics, load_all_graphs
+from cartographer.Node import PathFinder
 
 
+@override_settings(CLOSURES_TOKEN="test-token")
 class ViewIntegrationTests(TestCase):
 
     def setUp(self):
-        self.client = Client()
+        self.client = Client(HTTP_AUTHORIZATION="Bearer test-token")
         load_all_graphs()
         self.dataset = "LE.json"
         self.graph = _graph_cache[self.dataset]
         node_ids = list(self.graph.get_id_to_index().keys())
         self.source = node_ids[0]
         self.goal = node_ids[1]
+        self.closures = tempfile.TemporaryDirectory()
+        self.closures_path, _graph_cache.closures_path = _graph_cache.closures_path, self.closures.name
+
+    def tearDown(self):
+        _graph_cache.closures_path = self.closures_path
+        self.closures.cleanup()
 
     def test_render_index_template(self):
         response = self.client.get(reverse("index"))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "search.html")
 
+    def test_index_lists_buildings(self):
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, '<option value="LE.json"')
+        self.assertContains(response, "Lágymányosi Észak")
+
     def test_result_with_missing_fields(self):
         response = self.client.get(reverse("map_result"), {
             "sourceinput": "",
@@ -43,6 +59,23 @@ class ViewIntegrationTests(TestCase):
         self.assertIn("levels", response.context)
         self.assertTrue(len(response.context["path_json"]) >= 1)
 
+    def test_result_with_alternatives(self):
+        histogram = _metrics.get("cartographer_route_seconds")
+        ok = histogram.get(self.dataset, "alternatives", "ok")[0]
+        response = self.client.get(reverse("map_result"), {
+            "sourceinput": self.source,
+            "goalinput": self.goal,
+            "dataset": self.dataset,
+            "alternatives": 3,
+            "debug": "1",
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(len(response.context["alternatives_json"]) <= 2)
+        self.assertNotIn(response.context["path_json"], response.context["alternatives_json"])
+        self.assertEqual(json.loads(response.context["debug_stats"])["algorithm"], "alternatives")
+        self.assertEqual(histogram.get(self.dataset, "alternatives", "ok")[0], ok + 1)
+
     def test_result_with_invalid_ids(self):
         response = self.client.get(reverse("map_result"), {
             "sourceinput": "invalid",
@@ -91,6 +124,175 @@ class ViewIntegrationTests(TestCase):
         self.assertTemplateUsed(response, "result.html")
 
 
+    def test_result_uses_contraction_hierarchy(self):
+        from cartographer.ContractionHierarchy import ContractionHierarchy
+        from cartographer.Node import PathFinder
+        hierarchies = self.graph._hierarchies
+        try:
+            self.graph.set_hierarchies({(False, False): ContractionHierarchy.build(self.graph, False, False)})
+            PathFinder.route_cache.clear()
+            response = self.client.get(reverse("map_result"), {
+                "sourceinput": self.source,
+                "goalinput": self.goal,
+                "dataset": self.dataset,
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["path_json"],
+                             PathFinder.find_path(self.graph, self.source, self.goal, False, False, "dijkstra"))
+            self.assertTrue(any(key[-1] == "ch" for key in PathFinder.route_cache._entries))
+        finally:
+            self.graph.set_hierarchies(hierarchies)
+            PathFinder.route_cache.clear()
+
+
+    def test_batch_routes(self):
+        node_ids = list(self.graph.get_id_to_index().keys())
+        queries = [{"source": self.source, "goal": goal, "accessible": False} for goal in node_ids[1:6]]
+        queries.append({"source": self.source, "goal": "invalid"})
+        response = self.client.post(reverse("routes"), {"dataset": self.dataset, "queries": queries},
+                                    content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[0]["path"], PathFinder.find_path(self.graph, self.source, node_ids[1], False))
+        self.assertIn("error", results[5])
+
+    def test_batch_routes_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse("routes")).status_code, 405)
+        response = self.client.post(reverse("routes"), "not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("routes"), {"queries": "A-B"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("routes"), {"dataset": "invalid.json", "queries": []},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_tour(self):
+        targetables = [identifier for identifier, index in self.graph.get_id_to_index().items()
+                       if self.graph.is_usable_index(index, False, False) and self.graph._targetable[index]]
+        start, stops = targetables[0], targetables[1:6]
+        response = self.client.post(reverse("tour"), {"dataset": self.dataset, "start": start, "stops": stops,
+                                                      "accessible": False}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        tour = response.json()
+        self.assertEqual(sorted(tour["order"] + tour["unreachable"]), sorted(stops))
+        markers = [point["stop"] for point in tour["path"] if "stop" in point]
+        self.assertEqual(markers, [start] + tour["order"])
+
+    def test_tour_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse("tour")).status_code, 405)
+        response = self.client.post(reverse("tour"), {"start": self.source}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("tour"), {"start": self.source, "stops": [self.goal],
+                                                      "return_to_start": "yes"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("tour"), {"start": self.source, "stops": ["invalid"]},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+
+
+    def test_closures(self):
+        node_ids = list(self.graph.get_id_to_index().keys())
+        route = PathFinder.find_path(self.graph, self.source, node_ids[5], False, False)
+        try:
+            response = self.client.post(reverse("closures"), {"dataset": self.dataset, "close": [node_ids[3]]},
+                                        content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(node_ids[3], response.json()["closed_nodes"])
+            self.assertIsNot(_graph_cache[self.dataset], self.graph)
+            self.assertIn(node_ids[3], self.client.get(reverse("closures")).json()["closed_nodes"])
+            response = self.client.post(reverse("closures"), {"reopen": [node_ids[3]]},
+                                        content_type="application/json")
+            self.assertNotIn(node_ids[3], response.json()["closed_nodes"])
+            self.assertEqual(PathFinder.find_path(_graph_cache[self.dataset], self.source, node_ids[5], False, False),
+                             route)
+        finally:
+            _graph_cache[self.dataset] = self.graph
+
+    def test_graphs(self):
+        response = self.client.get(reverse("graphs"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn({"file": "LE.json", "name": "Lágymányosi Észak", "levels": [-1, 0, 1, 2, 3, 4, 5, 6, 7],
+                       "images": ["LE-1.png", "LE0.png", "LE1.png", "LE2.png", "LE3.png", "LE4.png", "LE5.png",
+                                  "LE6.png", "LE7.png"]}, response.json()["buildings"])
+        status = response.json()["graphs"][self.dataset]
+        self.assertEqual(status["nodes"], self.graph.node_count())
+        self.assertGreater(status["memory_bytes"], 0)
+        self.assertIsNone(status["error"])
+        version = status["version"]
+        try:
+            self.client.post(reverse("closures"), {"close": [self.source]}, content_type="application/json")
+            self.assertEqual(self.client.get(reverse("graphs")).json()["graphs"][self.dataset]["version"], version + 1)
+        finally:
+            _graph_cache[self.dataset] = self.graph
+        self.assertEqual(self.client.post(reverse("graphs")).status_code, 405)
+
+    def test_closures_invalid_requests(self):
+        self.assertEqual(self.client.put(reverse("closures")).status_code, 405)
+        response = self.client.post(reverse("closures"), {"close": "A"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("closures"), {"close_edges": [["A"]]}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("closures"), {"close": ["invalid"]}, content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+        self.assertIs(_graph_cache[self.dataset], self.graph)
+
+    def test_closures_need_staff_or_token(self):
+        body = {"close": [self.source]}
+        for client in (Client(), Client(HTTP_AUTHORIZATION="Bearer wrong-token")):
+            response = client.post(reverse("closures"), body, content_type="application/json")
+            self.assertEqual(response.status_code, 403)
+        user = User.objects.create_user("visitor", password="password")
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(user)
+        self.assertEqual(client.post(reverse("closures"), body, content_type="application/json").status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(client.post(reverse("closures"), body, content_type="application/json").status_code, 403)
+        self.assertIs(_graph_cache[self.dataset], self.graph)
+        try:
+            client = Client()
+            client.force_login(user)
+            self.assertEqual(client.post(reverse("closures"), body, content_type="application/json").status_code, 200)
+        finally:
+            _graph_cache[self.dataset] = self.graph
+
+    def test_nearest(self):
+        response = self.client.get(reverse("nearest"), {"source": self.source, "query": "labor", "k": 3})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 3)
+        self.assertEqual([result["distance"] for result in results],
+                         sorted(result["distance"] for result in results))
+        self.assertEqual(results[0]["path"],
+                         PathFinder.find_path(self.graph, self.source, results[0]["identifier"], False))
+
+    def test_nearest_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse("nearest"), {"source": self.source}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("nearest"), {"source": self.source, "query": "labor",
+                                                              "k": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("nearest"), {"source": "invalid", "query": "labor"}).status_code,
+                         404)
+
+    def test_within(self):
+        response = self.client.get(reverse("within"), {"source": self.source, "meters": 30})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertTrue(len(results) > 0)
+        self.assertTrue(all(result["meters"] <= 30 for result in results))
+        self.assertEqual([result["meters"] for result in results], sorted(result["meters"] for result in results))
+        walked = self.client.get(reverse("within"), {"source": self.source, "seconds": 30 / 1.4}).json()["results"]
+        self.assertEqual([result["identifier"] for result in walked], [result["identifier"] for result in results])
+
+    def test_within_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse("within"), {"source": self.source}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("within"), {"source": self.source, "meters": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("within"), {"source": self.source, "meters": -1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("within"), {"source": "invalid", "meters": 10}).status_code, 404)
+
+
     def test_search_without_text(self):
         response = self.client.get(reverse("search"), {"node": ""})
         self.assertEqual(response.status_code, 200)
@@ -112,6 +314,22 @@ class ViewIntegrationTests(TestCase):
         first = data["nodes"][0]
         self.assertIn("identifier", first)
 
+    def test_search_ranks_and_limits_suggestions(self):
+        response = self.client.get(reverse("search"), {
+            "node": "LÉ-1",
+            "file": self.dataset,
+            "limit": "3",
+        })
+
+        self.assertEqual(response.status_code, 200)
+        nodes = response.json()["nodes"]
+        self.assertEqual(len(nodes), 3)
+        self.assertTrue(all(node["identifier"].startswith("LÉ-1") for node in nodes))
+
+    def test_search_invalid_limit(self):
+        response = self.client.get(reverse("search"), {"node": "EF", "limit": "many"})
+        self.assertEqual(response.status_code, 400)
+
     def test_search_invalid_file(self):
         response = self.client.get(reverse("search"), {
             "node": "EF",
@@ -125,3 +343,47 @@ class ViewIntegrationTests(TestCase):
         response = self.client.get(reverse("help"))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "help.html")
+
+    def test_debug_statistics(self):
+        response = self.client.get(reverse("map_result"), {
+            "sourceinput": self.source,
+            "goalinput": self.goal,
+            "dataset": self.dataset,
+            "debug": "1",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('id="debug-stats"', response.content.decode())
+        self.assertIn("answered_by", response.context["debug_stats"])
+
+        queries = [{"source": self.source, "goal": self.goal}]
+        response = self.client.post(reverse("routes") + "?debug=1", {"dataset": self.dataset, "queries": queries},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("settled", response.json()["results"][0]["stats"])
+        response = self.client.post(reverse("routes"), {"dataset": self.dataset, "queries": queries},
+                                    content_type="application/json")
+        self.assertNotIn("stats", response.json()["results"][0])
+
+    def test_metrics(self):
+        histogram = _metrics.get("cartographer_route_seconds")
+        algorithm = "ch" if self.graph.get_hierarchy(False, False) is not None else "dijkstra"
+        ok = histogram.get(self.dataset, algorithm, "ok")[0]
+        invalid = histogram.get(self.dataset, algorithm, "invalid_id")[0]
+        self.client.get(reverse("map_result"), {"sourceinput": self.source, "goalinput": self.goal,
+                                                "dataset": self.dataset})
+        self.client.get(reverse("map_result"), {"sourceinput": "invalid", "goalinput": self.goal,
+                                                "dataset": self.dataset})
+        self.assertEqual(histogram.get(self.dataset, algorithm, "ok")[0], ok + 1)
+        self.assertEqual(histogram.get(self.dataset, algorithm, "invalid_id")[0], invalid + 1)
+        self.client.get(reverse("search"), {"node": "a", "file": "invalid.json"})
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertIn(f'cartographer_route_seconds_count{{dataset="{self.dataset}",algorithm="{algorithm}",'
+                      f'outcome="ok"}}', text)
+        self.assertIn('cartographer_suggestion_seconds_count{dataset="unknown",outcome="graph_not_found"}', text)
+        self.assertIn('cartographer_cache_hit_ratio{cache="route",dataset=""}', text)
+        self.assertIn(f'cartographer_graph_memory_bytes{{dataset="{self.dataset}"}}', text)
+        self.assertEqual(self.client.post(reverse("metrics")).status_code, 405)